@@ -0,0 +1,81 @@
+"""Near-duplicate index: insert rate, on-disk size and lookup latency (hits and misses) as the index grows.
+
+    python -m benchmarks.bench_dedup --size 100000 --path /tmp/dedup.sqlite
+
+The filler documents are random word salads of resume length, so they spread over the LSH buckets like
+unrelated resumes do; lookups are timed for edited copies of indexed documents and for unseen ones.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import render_text, synthetic_resume
+from rtk.dedup import NearDuplicateIndex
+
+
+def word_salad(rng, vocab, words=400):
+    lines = [" ".join(rng.choices(vocab, k=10)) for _ in range(words // 10)]
+    return "\n".join(lines)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def time_queries(index, texts):
+    latencies = []
+    found = 0
+    for text in texts:
+        t1 = time.perf_counter()
+        found += index.query(text) is not None
+        latencies.append(time.perf_counter() - t1)
+    latencies.sort()
+    return found, latencies
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size", type=int, default=20000, help="documents to index")
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--path", help="SQLite file (default: a temporary file)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = [f"w{i}" for i in range(20000)]
+    tmp = None
+    path = args.path
+    if path is None:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "dedup.sqlite")
+    index = NearDuplicateIndex(path)
+
+    indexed = []
+    t1 = time.perf_counter()
+    for i in range(args.size):
+        if i < args.queries:
+            resume = synthetic_resume(seed=i)
+            text = render_text(resume)
+            indexed.append(text)
+        else:
+            text = word_salad(rng, vocab)
+        index.add(text, resume)
+    elapsed = time.perf_counter() - t1
+    print(f"indexed {args.size} docs in {elapsed:.1f} s ({args.size / elapsed:.0f} docs/s), "
+          f"{os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+    edited = [text.replace("+1 555 010 0000", "+1 555 999 1234") for text in indexed]
+    unseen = [word_salad(rng, vocab) for _ in range(args.queries)]
+    for name, texts in (("edited copies", edited), ("unseen", unseen)):
+        found, latencies = time_queries(index, texts)
+        print(f"  {name:<14} found {found}/{len(texts)}  p50 {percentile(latencies, 0.5) * 1000:.3f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.3f} ms")
+    index.close()
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Parse-path cost of logging under an error storm: every request fails with a 400 whose body echoes a large
+payload, so every parse logs an error carrying it.
+
+    python -m benchmarks.bench_logging --parses 2000 --payload-chars 200000
+
+"unbounded" is what the parser modules used to do at import: DEBUG level, a synchronous stderr-style handler
+(here a file), every event written with its full payload. The other modes keep the default sampling and
+clipping of rtk.log and differ in where records go. Reported per mode: microseconds per parse on the calling
+thread (fastest of `--repeat` runs), records written and bytes written.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from benchmarks.synthetic import render_text, synthetic_resume
+from rtk import OAiParser, log
+from rtk.retry import RetryPolicy
+
+MODES = ("silent", "unbounded", "sync", "background", "background-json")
+
+
+class StormClient:
+    """OpenAI client stand-in whose every request fails with a 400 echoing `payload_chars` of the prompt."""
+
+    def __init__(self, payload_chars):
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        body = {"message": "Invalid schema for response_format", "param": "x" * payload_chars}
+        self.error = openai.BadRequestError(f"Error code: 400 - {body}", response=httpx.Response(400, request=request),
+                                            body=body)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self._create)))
+
+    def with_options(self, **options):
+        return self
+
+    def _create(self, **kwargs):
+        raise self.error
+
+
+def install(mode, path):
+    """Handler for `mode` on the rtk logger (None when nothing is attached)."""
+    if mode == "silent":
+        log.configure_sampling()
+        return None
+    if mode == "unbounded":
+        log.configure_sampling(burst=None, max_chars=None)
+        return log.configure(logging.DEBUG, handler=logging.FileHandler(path, mode="w"))
+    log.configure_sampling()
+    return log.configure(logging.WARNING, handler=logging.FileHandler(path, mode="w"),
+                         structured=mode == "background-json", background=mode != "sync")
+
+
+def run(mode, parser, text, parses, tmp):
+    path = os.path.join(tmp, f"{mode}.log")
+    handler = install(mode, path)
+    records = []
+    counter = logging.Handler()
+    counter.emit = records.append
+    logging.getLogger("rtk").addHandler(counter)
+    try:
+        t1 = time.perf_counter()
+        for _ in range(parses):
+            parser.parse(text)
+        elapsed = time.perf_counter() - t1
+    finally:
+        logger = logging.getLogger("rtk")
+        logger.removeHandler(counter)
+        if handler is not None:
+            logger.removeHandler(handler)
+            handler.close()
+        logger.setLevel(logging.NOTSET)
+        log.configure_sampling()
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    written = len(records) if handler is not None else 0
+    return elapsed / parses, written, size
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--parses", type=int, default=2000)
+    ap.add_argument("--payload-chars", type=int, default=200000)
+    ap.add_argument("--repeat", type=int, default=3, help="runs per mode, the fastest is reported")
+    args = ap.parse_args()
+
+    parser = OAiParser("sk-bench", {}, retry_policy=RetryPolicy(max_attempts=1))
+    parser.client = StormClient(args.payload_chars)
+    # a short text keeps the rest of the parse path small next to what logging costs
+    text = render_text(synthetic_resume(seed=0, num_work=1))[:300]
+    parser.parse(text)
+    print(f"{args.parses} failing parses, {args.payload_chars} char error payload")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            seconds, records, size = min(run(mode, parser, text, args.parses, tmp) for _ in range(args.repeat))
+            print(f"  {mode:<16} {seconds * 1e6:>9.1f} us/parse  {records:>6} records  {size / 2 ** 20:>9.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""End-to-end throughput of the parse paths against the mock server: resumes/sec, p50/p95/p99 latency and
+peak RSS for parse, parse_standalone, parse_batch and AsyncOAiParser.parse_many, written as JSON so runs can
+be compared across commits.
+
+    python -m benchmarks.bench_parse --size 200 --latency 0.2 --tokens-per-second 2000 --output bench.json
+
+Each path runs in a fresh interpreter so its peak RSS is its own.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.mock_openai import MockOpenAIServer
+from benchmarks.synthetic import synthetic_corpus
+
+PATHS = ("parse", "parse_standalone", "batch", "async")
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_path(path, base_url, texts, workers):
+    # runs in the child process; per-call log lines are silenced so they do not dominate the measurement
+    from rtk import AsyncOAiParser, OAiParser
+    for name in ("rtk.openai_parser", "rtk.async_parser", "rtk.retry", "rtk.validation"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    latencies = []
+    parser_cls = AsyncOAiParser if path == "async" else OAiParser
+    parser = parser_cls("sk-mock", {}, base_url=base_url)
+    # per-call wall time, queueing in a batch excluded; batch and async pick up the instance attribute
+    if path == "async":
+        parse = parser.parse
+
+        async def timed(text, priority="interactive", backend=None):
+            t1 = time.perf_counter()
+            try:
+                return await parse(text, priority, backend)
+            finally:
+                latencies.append(time.perf_counter() - t1)
+    else:
+        parse = parser.parse_standalone if path == "parse_standalone" else parser.parse
+
+        def timed(text, priority="interactive", backend=None):
+            t1 = time.perf_counter()
+            try:
+                return parse(text, priority, backend)
+            finally:
+                latencies.append(time.perf_counter() - t1)
+    t1 = time.perf_counter()
+    if path == "async":
+        parser.parse = timed
+        results = asyncio.run(parser.parse_many(texts, max_concurrency=workers))
+    elif path == "batch":
+        parser.parse = timed
+        results = parser.parse_batch(texts, workers=workers)
+        parser.close()
+    else:
+        results = [timed(text) for text in texts]
+    elapsed = time.perf_counter() - t1
+    latencies.sort()
+    return {
+        "resumes": len(texts),
+        "seconds": elapsed,
+        "resumes_per_sec": len(texts) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "invalid": sum(not r["is_valid_jsonresume"] for r in results),
+        "attempts": sum(r.get("attempts", 1) for r in results),
+        "prompt_tokens": sum(r.get("prompt_tokens", 0) for r in results),
+        # kilobytes on Linux, bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin"
+                                                                              else 1024 * 1024),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size", type=int, default=100, help="number of synthetic resumes")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency", type=float, default=0.05, help="mock server latency per request, seconds")
+    ap.add_argument("--tokens-per-second", type=float, default=0, help="mock completion token rate (0: instant)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of mock requests failing with 429/5xx")
+    ap.add_argument("--workers", type=int, default=16, help="concurrency of the batch and async paths")
+    ap.add_argument("--paths", default=",".join(PATHS), help=f"comma-separated subset of {','.join(PATHS)}")
+    ap.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+
+    texts = [text for text, _ in synthetic_corpus(args.size, seed=args.seed)]
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+        "corpus_chars": sum(map(len, texts)),
+        "results": {},
+    }
+    server = MockOpenAIServer(latency=args.latency, tokens_per_second=args.tokens_per_second or None,
+                              error_rate=args.error_rate, seed=args.seed)
+    with server:
+        context = multiprocessing.get_context("spawn")
+        for path in args.paths.split(","):
+            with context.Pool(1) as pool:
+                result = pool.apply(run_path, (path, server.base_url, texts, args.workers))
+            report["results"][path] = result
+            print(f"{path:<17} {result['resumes_per_sec']:>8.1f} resumes/s  p50 {result['p50'] * 1000:>7.1f} ms  "
+                  f"p95 {result['p95'] * 1000:>7.1f} ms  p99 {result['p99'] * 1000:>7.1f} ms  "
+                  f"rss {result['peak_rss_mb']:>6.1f} MB", file=sys.stderr)
+    report["server"] = {"requests": server.requests, "errors": server.errors, "connections": server.connections}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
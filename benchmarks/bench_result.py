@@ -0,0 +1,53 @@
+"""Encode throughput of ParseResult.to_bytes against json.dumps of the same result dict.
+
+    python -m benchmarks.bench_result
+
+"before" builds the dict, lets compute_statuscode add its keys and encodes it with json.dumps, as a service
+wrapping parse_standalone did; "after" builds a ParseResult and encodes it once with `to_bytes()`.
+"""
+import json
+import timeit
+
+from benchmarks.synthetic import synthetic_resume
+from rtk.resume_dataclass import ResumeSerializer
+from rtk.result import ParseResult, orjson
+
+TIMINGS = {"preprocess": 0.0012, "request": 1.8, "ttfb": 0.9, "deserialize": 0.004, "serialize": 0.0002,
+           "validate": 0.00001, "statuscode": 0.000004}
+
+
+def fields(jsonresume):
+    return dict(parser="openai", is_valid_json=True, is_valid_jsonresume=True, generation_time=1.81, num_chars=4200,
+                num_tokens=2300, prompt_tokens=1500, estimated_prompt_tokens=1480, cached_tokens=1024,
+                prompt_cache_hit_rate=0.68, jsonresume=jsonresume, sop="0.1.3", cache=None, near_duplicate=None,
+                attempts=1, hedged=False, error=None, timings=dict(TIMINGS))
+
+
+def before(jsonresume):
+    response = fields(jsonresume)
+    response["jsonresume"] = response["jsonresume"] if isinstance(response["jsonresume"], dict) else None
+    response["statuscode"] = 200
+    response["var"] = ""
+    return json.dumps(response).encode("utf-8")
+
+
+def after(jsonresume):
+    response = ParseResult(**fields(jsonresume))
+    response["statuscode"] = 200
+    response["var"] = ""
+    return response.to_bytes()
+
+
+def main(number=2000):
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}")
+    for num_work in (2, 10, 50):
+        jsonresume = ResumeSerializer().to_json_resume(synthetic_resume(num_work=num_work))
+        assert json.loads(before(jsonresume)) == json.loads(after(jsonresume))
+        print(f"work entries: {num_work}")
+        for name, fn in (("dict + json.dumps (before)", before), ("ParseResult.to_bytes (after)", after)):
+            seconds = min(timeit.repeat(lambda: fn(jsonresume), number=number, repeat=3)) / number
+            print(f"  {name:<30} {seconds * 1e6:>8.1f} us  {1 / seconds:>10.0f} results/s")
+
+
+if __name__ == "__main__":
+    main()
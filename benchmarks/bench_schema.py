@@ -0,0 +1,53 @@
+"""Client-side overhead per structured-output call: the SDK's `parse` helper, which rebuilds the strict schema
+from Resume on every request, versus the cached response_format payload and type adapter. The HTTP layer is an
+in-memory transport returning a canned completion, so only client-side work is measured.
+
+    python -m benchmarks.bench_schema
+"""
+import json
+import timeit
+
+import httpx
+import openai
+
+from benchmarks.synthetic import synthetic_resume
+from rtk.resume_dataclass import Resume
+from rtk.schema import parse_completion, response_format
+
+
+def canned_client(resume):
+    body = json.dumps({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "bench",
+        "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                     "message": {"role": "assistant", "content": resume.model_dump_json(), "refusal": None}}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }).encode("utf-8")
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, content=body, headers={"content-type": "application/json"}))
+    return openai.OpenAI(api_key="sk-bench", http_client=httpx.Client(transport=transport), max_retries=0)
+
+
+def main(number=200):
+    client = canned_client(synthetic_resume(num_work=10))
+    messages = [{"role": "user", "content": "resume text"}]
+
+    def sdk_parse():
+        return client.beta.chat.completions.parse(model="bench", messages=messages, response_format=Resume)
+
+    def cached_schema():
+        completion = client.chat.completions.create(model="bench", messages=messages,
+                                                    extra_body={"response_format": response_format(Resume)})
+        return parse_completion(completion, Resume)
+
+    assert sdk_parse().choices[0].message.parsed == cached_schema().choices[0].message.parsed
+    cases = {
+        "beta.chat.completions.parse (before)": sdk_parse,
+        "cached response_format (after)": cached_schema,
+    }
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print(f"{name:<38} {seconds * 1e6:>10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
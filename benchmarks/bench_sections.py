@@ -0,0 +1,33 @@
+"""Wall-clock latency of single-call versus section-split extraction of long resumes, against the mock server
+simulating per-token generation latency.
+
+    python -m benchmarks.bench_sections
+"""
+import time
+
+from benchmarks.mock_openai import MockOpenAIServer
+from benchmarks.synthetic import render_text, synthetic_resume
+from rtk import OAiParser
+
+
+def main(seconds_per_token=0.0002, repeat=3):
+    for num_work, num_publications in ((5, 0), (20, 0), (20, 40)):
+        resume = synthetic_resume(num_work=num_work, num_publications=num_publications)
+        expected = resume.model_dump()
+        text = render_text(resume)
+        with MockOpenAIServer(seconds_per_token=seconds_per_token, resume_factory=lambda t: expected) as server:
+            single = OAiParser("sk-mock", {}, base_url=server.base_url)
+            split = OAiParser("sk-mock", {}, base_url=server.base_url, split_sections=True)
+            print(f"work: {num_work}, publications: {num_publications}, chars: {len(text)}")
+            for name, parser in (("single call", single), ("section split", split)):
+                timings = []
+                for _ in range(repeat):
+                    t1 = time.time()
+                    parser.parse(text)
+                    timings.append(time.time() - t1)
+                print(f"  {name:<14} {min(timings) * 1000:>8.1f} ms")
+            split.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Time and peak allocation of ResumeSerializer against the previous deepcopy + __dict__ implementation.
+
+    python -m benchmarks.bench_serializer
+"""
+import copy
+import json
+import timeit
+import tracemalloc
+
+from benchmarks.synthetic import synthetic_resume
+from rtk.resume_dataclass import Location, ResumeSerializer
+
+
+def legacy_to_json_resume(resume0):
+    resume = copy.deepcopy(resume0)
+    basics = resume.basics
+    j_basics = basics.__dict__
+    if basics.location:
+        j_basics["location"] = basics.location.__dict__
+    else:
+        j_basics["location"] = Location(city='', address='', region='', countryCode='', postalCode='').__dict__
+    j_basics["profiles"] = []
+    j_resume = {"basics": j_basics}
+    for section in ResumeSerializer.SECTIONS:
+        j_resume[section] = [x.__dict__ for x in getattr(resume, section)]
+    return j_resume
+
+
+def _peak_kib(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main(number=50):
+    serializer = ResumeSerializer()
+    for num_work in (10, 50, 200):
+        resume = synthetic_resume(num_work=num_work, num_publications=num_work // 2)
+        assert serializer.to_json_resume(resume) == legacy_to_json_resume(resume)
+        cases = {
+            "deepcopy + __dict__ (before)": lambda: legacy_to_json_resume(resume),
+            "before + json.dumps": lambda: json.dumps(legacy_to_json_resume(resume)).encode("utf-8"),
+            "to_json_resume (after)": lambda: serializer.to_json_resume(resume),
+            "to_json_bytes (after)": lambda: serializer.to_json_bytes(resume),
+        }
+        print(f"work entries: {num_work}")
+        for name, fn in cases.items():
+            seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+            print(f"  {name:<30} {seconds * 1e6:>10.1f} us   peak {_peak_kib(fn):>8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
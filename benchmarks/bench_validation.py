@@ -0,0 +1,34 @@
+"""Per-resume validation cost: jsonschema.validate() + pydantic re-validation versus the precompiled validator.
+
+    python -m benchmarks.bench_validation
+"""
+import timeit
+
+import jsonschema
+
+from benchmarks.synthetic import synthetic_resume
+from rtk.resume_dataclass import ResumeSerializer
+from rtk.validation import Validation
+
+
+def main(number=200):
+    validation = Validation()
+    resume = ResumeSerializer().to_json_resume(synthetic_resume(num_work=10))
+    # the JSON Resume schema requires `courses`, which the Resume model does not carry
+    for education in resume["education"]:
+        education["courses"] = []
+    schema = validation.resume_schema
+
+    cases = {
+        "jsonschema.validate (before)": lambda: jsonschema.validate(instance=resume, schema=schema),
+        "compiled validator": lambda: validation._is_valid_json_resume(resume),
+        "pydantic re-validation (before)": lambda: validation.validate_json_w_pydantic(resume),
+        "pydantic, from_resume (after)": lambda: validation.validate_json_w_pydantic(resume, from_resume=True),
+    }
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print(f"{name:<36} {seconds * 1e6:>10.1f} us/resume")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Local stand-in for the OpenAI chat-completions endpoint, for offline tests and benchmarks.
+
+    with MockOpenAIServer(latency=0.05, tokens_per_second=200, error_rate=0.01) as server:
+        parser = OAiParser("sk-mock", {}, base_url=server.base_url)
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import synthetic_resume
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.mock.on_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        status, body, headers = self.server.mock.respond(self.path, request)
+        if isinstance(body, dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        # server-sent events, written as they are produced
+        self.send_response(status)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in body:
+            data = f"data: {event}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class MockOpenAIServer:
+    """`latency` is paid per request and `seconds_per_token` (or `tokens_per_second`) per completion token.
+    A share `error_rate` of requests fails with one of `error_statuses`; 429s carry a Retry-After header.
+    Payloads come from `resume_factory(text)`, else from the canned `payloads` (picked by hash of the text),
+    else from a synthetic resume named after the text. Like the provider's prompt cache, a request whose prefix
+    (schema plus every message before the last) was seen before reports that prefix as `cached_tokens`, in
+    128-token steps once it reaches 1024 tokens."""
+    ERROR_STATUSES = (429, 500, 503)
+
+    def __init__(self, latency=0.0, seconds_per_token=0.0, resume_factory=None, stream_chunk_chars=16,
+                 stream_chunk_delay=0.0, host="127.0.0.1", port=0, tokens_per_second=None, error_rate=0.0,
+                 error_statuses=ERROR_STATUSES, retry_after=0.05, payloads=None, seed=0):
+        self.latency = latency
+        self.seconds_per_token = 1.0 / tokens_per_second if tokens_per_second else seconds_per_token
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_chunk_delay = stream_chunk_delay
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.payloads = [p if isinstance(p, dict) else p.model_dump() for p in payloads or []]
+        self.resume_factory = resume_factory or (self._canned_resume if self.payloads else self._default_resume)
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._prefixes = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def on_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def respond(self, path, request):
+        with self._lock:
+            self.requests += 1
+            failing = self.error_rate and self._rng.random() < self.error_rate
+            status = self._rng.choice(self.error_statuses) if failing else 200
+            if failing:
+                self.errors += 1
+        if not path.endswith("/chat/completions"):
+            return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}, {}
+        if status != 200:
+            if self.latency:
+                time.sleep(self.latency)
+            headers = {"retry-after": str(self.retry_after)} if status == 429 else {}
+            return status, {"error": {"message": "Mock failure", "type": "server_error", "code": None}}, headers
+        text = request["messages"][-1]["content"]
+        resume = self.resume_factory(text)
+        # answer section sub-schemas (e.g. {"work": [...]}) with just the requested fields
+        schema = (request.get("response_format") or {}).get("json_schema", {}).get("schema", {})
+        fields = [f for f in schema.get("properties", {}) if f in resume]
+        if fields:
+            resume = {f: resume[f] for f in fields}
+        content = json.dumps(resume)
+        if self.latency or self.seconds_per_token:
+            time.sleep(self.latency + self.seconds_per_token * (len(content) // 4))
+        prefix = json.dumps([request.get("response_format"), request["messages"][:-1]], sort_keys=True)
+        prefix_tokens = len(prefix) // 4
+        with self._lock:
+            cached = prefix in self._prefixes
+            self._prefixes.add(prefix)
+        cached_tokens = prefix_tokens // 128 * 128 if cached and prefix_tokens >= 1024 else 0
+        prompt_tokens = prefix_tokens + len(text) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "total_tokens": prompt_tokens + len(content) // 4,
+                 "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+        head = {"id": f"chatcmpl-mock-{self.requests}", "created": int(time.time()),
+                "model": request.get("model", "mock")}
+        if request.get("stream"):
+            return 200, self._stream(head, content, usage, request.get("stream_options") or {}), {}
+        return 200, {
+            **head,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                         "message": {"role": "assistant", "content": content, "refusal": None}}],
+            "usage": usage,
+        }, {}
+
+    def _stream(self, head, content, usage, stream_options):
+        head = {**head, "object": "chat.completion.chunk"}
+        for i in range(0, len(content), self.stream_chunk_chars):
+            if self.stream_chunk_delay:
+                time.sleep(self.stream_chunk_delay)
+            delta = {"content": content[i:i + self.stream_chunk_chars]}
+            if i == 0:
+                delta["role"] = "assistant"
+            yield json.dumps({**head, "choices": [{"index": 0, "delta": delta, "finish_reason": None,
+                                                   "logprobs": None}]})
+        yield json.dumps({**head, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop", "logprobs": None}]})
+        if stream_options.get("include_usage"):
+            yield json.dumps({**head, "choices": [], "usage": usage})
+        yield "[DONE]"
+
+    def _canned_resume(self, text):
+        payload = self.payloads[zlib.crc32(text.encode("utf-8")) % len(self.payloads)]
+        return {**payload, "basics": {**payload["basics"], "name": text[:40]}}
+
+    def _default_resume(self, text):
+        resume = synthetic_resume(seed=len(text)).model_dump()
+        resume["basics"]["name"] = text[:40]
+        return resume
@@ -0,0 +1,106 @@
+import random
+
+from rtk.resume_dataclass import (Award, Basics, Certificate, Education, Interest, Language, Location, Profile,
+                                  Project, Publication, Reference, Resume, Skill, Volunteer, Work)
+
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises", "Vandelay"]
+POSITIONS = ["Software Engineer", "Data Scientist", "Product Manager", "Staff Engineer", "Research Scientist"]
+SCHOOLS = ["State University", "Institute of Technology", "City College", "Polytechnic School"]
+SKILLS = ["Python", "SQL", "Kubernetes", "PyTorch", "Go", "Rust", "Terraform", "Spark", "React", "Postgres"]
+FIRST = ["Jane", "John", "Maria", "Wei", "Aisha", "Lucas", "Priya", "Omar"]
+LAST = ["Doe", "Smith", "Garcia", "Chen", "Okafor", "Silva", "Patel", "Haddad"]
+
+
+def _sentence(rng, words=12):
+    vocab = ["built", "led", "scaled", "designed", "migrated", "reduced", "latency", "pipeline", "platform",
+             "customers", "team", "service", "by", "30%", "across", "regions", "data", "models", "revenue"]
+    return " ".join(rng.choice(vocab) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_resume(num_work=5, num_education=2, num_publications=0, seed=0):
+    rng = random.Random(seed)
+    name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+    handle = name.lower().replace(" ", "")
+    basics = Basics(name=name, label=rng.choice(POSITIONS), email=f"{handle}@example.com", phone="+1 555 010 0000",
+                    url=f"https://{handle}.dev", summary=_sentence(rng, 30),
+                    profiles=[Profile(url=f"https://github.com/{handle}", username=handle, network="GitHub")],
+                    location=Location(address="1 Main St", city="Boston", region="MA", countryCode="US",
+                                      postalCode="02110"))
+    work = [Work(position=rng.choice(POSITIONS), name=rng.choice(COMPANIES), location="Remote",
+                 description=_sentence(rng), startDate=f"{2000 + i}-01", endDate=f"{2001 + i}-06",
+                 summary=_sentence(rng, 20), highlights=[_sentence(rng) for _ in range(4)],
+                 url=f"https://example.com/{i}")
+            for i in range(num_work)]
+    education = [Education(institution=rng.choice(SCHOOLS), area="Computer Science", studyType="BSc",
+                           startDate=f"{1990 + i}-09", endDate=f"{1994 + i}-06", url="https://example.edu",
+                           score="3.8")
+                 for i in range(num_education)]
+    publications = [Publication(name=_sentence(rng, 8), publisher="ACM", summary=_sentence(rng, 25),
+                                releaseDate=f"{2010 + i % 10}-05", url="https://doi.org/10.1/x")
+                    for i in range(num_publications)]
+    return Resume(
+        basics=basics,
+        education=education,
+        work=work,
+        projects=[Project(name="rtk", endDate="2024-01", startDate="2023-01", description=_sentence(rng),
+                          highlights=[_sentence(rng)], url="https://example.com/rtk", roles=["maintainer"])],
+        skills=[Skill(name=s, level="Advanced", keywords=[s.lower()]) for s in rng.sample(SKILLS, 6)],
+        publications=publications,
+        awards=[Award(title="Best Paper", date="2019", awarder="ACM", summary=_sentence(rng))],
+        certificates=[Certificate(name="CKA", date="2021", url="https://cncf.io", issuer="CNCF")],
+        volunteer=[Volunteer(organization="Code Club", startDate="2018", endDate="2020", position="Mentor",
+                             summary=_sentence(rng), highlights=[_sentence(rng)], url="https://codeclub.org")],
+        languages=[Language(language="English", fluency="Native"), Language(language="Spanish", fluency="B2")],
+        interests=[Interest(name="Climbing")],
+        references=[Reference(name="Alex Roe", reference="Great engineer.")],
+    )
+
+
+def render_text(resume):
+    """Plain-text rendering of a Resume, laid out like text extracted from a PDF or DOCX resume."""
+    b = resume.basics
+    lines = [b.name, b.label, f"{b.email} | {b.phone} | {b.url}", f"{b.location.city}, {b.location.region}", "",
+             "Summary", b.summary, ""]
+    if resume.work:
+        lines.append("Experience")
+        for w in resume.work:
+            lines += [f"{w.position}, {w.name} ({w.location})", f"{w.startDate} - {w.endDate}", w.summary]
+            lines += [f"- {h}" for h in w.highlights or []]
+            lines.append("")
+    if resume.education:
+        lines.append("Education")
+        for e in resume.education:
+            lines += [f"{e.studyType} {e.area}, {e.institution}", f"{e.startDate} - {e.endDate}, GPA {e.score}", ""]
+    if resume.projects:
+        lines.append("Projects")
+        for p in resume.projects:
+            lines += [f"{p.name} ({p.startDate} - {p.endDate})", p.description, ""]
+    if resume.skills:
+        lines += ["Skills", ", ".join(s.name for s in resume.skills), ""]
+    if resume.publications:
+        lines.append("Publications")
+        for p in resume.publications:
+            lines += [f"{p.name} {p.publisher}, {p.releaseDate}.", p.summary, ""]
+    if resume.awards:
+        lines.append("Awards")
+        lines += [f"{a.title}, {a.awarder} ({a.date})" for a in resume.awards]
+        lines.append("")
+    if resume.certificates:
+        lines.append("Certifications")
+        lines += [f"{c.name}, {c.issuer} ({c.date})" for c in resume.certificates]
+        lines.append("")
+    if resume.languages:
+        lines += ["Languages", ", ".join(f"{l.language} ({l.fluency})" for l in resume.languages), ""]
+    if resume.interests:
+        lines += ["Interests", ", ".join(i.name for i in resume.interests), ""]
+    return "\n".join(line for line in lines if line is not None)
+
+
+def synthetic_corpus(size, seed=0, max_work=12, max_publications=10):
+    """Yields `size` (text, resume) pairs with a realistic spread of lengths, deterministic for a seed."""
+    rng = random.Random(seed)
+    for i in range(size):
+        resume = synthetic_resume(num_work=rng.randint(1, max_work), num_education=rng.randint(0, 3),
+                                  num_publications=rng.choice([0, 0, 0, rng.randint(1, max_publications)]),
+                                  seed=seed * 1_000_003 + i)
+        yield render_text(resume), resume
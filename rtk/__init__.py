@@ -1 +1,24 @@
-from rtk.openai_parser import OAiParser
\ No newline at end of file
+import importlib
+
+# exports are resolved on first access (PEP 562) so that `import rtk` does not pull in openai, pydantic
+# or jsonschema until a parser is actually used
+_EXPORTS = {
+    "OAiParser": "rtk.openai_parser",
+    "AsyncOAiParser": "rtk.async_parser",
+    "ParseCache": "rtk.cache",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'rtk' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+
+from rtk.backends import OpenAIBackend
+from rtk.log import clip, event
+from rtk.openai_parser import OAiParser, ParseCall, _OpenStream, _Request, _Stream
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOAiParser(OAiParser):
+    """asyncio flavour of OAiParser built on AsyncOpenAI.
+
+    Returns the same result dicts as OAiParser; `parse_many` keeps at most
+    `max_concurrency` requests in flight on the running event loop.
+    """
+    DEFAULT_MAX_CONCURRENCY = 16
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._shadow_tasks = set()
+
+    def _make_client(self, openai_key):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=openai_key, base_url=self.base_url)
+
+    def _get_shared_client(self, openai_key):
+        from rtk.clients import get_async_client
+        return get_async_client(openai_key, self.base_url)
+
+    async def parse(self, text, priority="interactive", backend=None):
+        return await self._parse(text, ParseCall(priority, self._resolve_backend(backend)))
+
+    async def _parse(self, text, call):
+        valid_key = self._validate_key(call)
+        if not valid_key:
+            return self._key_error_response()
+        self._log_request(text)
+        prompt_text = self._prepare_text(text, call)
+        resume, prompt_tokens, completion_tokens, generation_time = await self._query_openai(prompt_text, call)
+        return self._build_response(text, resume, prompt_tokens, completion_tokens, generation_time, call)
+
+    async def parse_standalone(self, text, priority="interactive", backend=None):
+        call = ParseCall(priority, self._resolve_backend(backend))
+        text = self._perturb_text(text, call)
+        response = await self._parse(text, call)
+        return self._finalize_standalone(response, call)
+
+    async def parse_many(self, texts, max_concurrency=DEFAULT_MAX_CONCURRENCY, standalone=False, priority="batch",
+                         backend=None):
+        texts = list(texts)
+        results = [None] * len(texts)
+        parse = self.parse_standalone if standalone else self.parse
+        backend = self._resolve_backend(backend)
+        # a fixed set of workers drains a shared iterator, so only `max_concurrency`
+        # coroutines (and responses) are alive at any one time
+        items = iter(enumerate(texts))
+
+        async def worker():
+            for i, text in items:
+                results[i] = await parse(text, priority, backend)
+
+        num_workers = max(1, min(max_concurrency, len(texts)))
+        workers = [asyncio.create_task(worker()) for _ in range(num_workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+        return results
+
+    def parse_batch(self, texts, *args, **kwargs):
+        raise TypeError("AsyncOAiParser has no parse_batch, use `await parser.parse_many(texts)`")
+
+    def iter_parse(self, texts, *args, **kwargs):
+        raise TypeError("AsyncOAiParser has no iter_parse, use `await parser.parse_many(texts)`")
+
+    async def parse_stream(self, text, priority="interactive", backend=None):
+        from rtk.streaming import SectionStream
+        call = ParseCall(priority, self._resolve_backend(backend))
+        valid_key = self._validate_key(call)
+        if not valid_key:
+            yield self._result_event(self._key_error_response())
+            return
+        self._log_request(text)
+        sections = SectionStream(self.serializer, self.pre_extract, time.time())
+        flow = self._query_flow(self._prepare_text(text, call), call, stream=True)
+        answer = error = None
+        while True:
+            try:
+                step = flow.send(answer) if error is None else flow.throw(error)
+            except StopIteration as stop:
+                resume, prompt_tokens, completion_tokens, generation_time = stop.value
+                break
+            try:
+                if isinstance(step, _Stream) and self._call_backend(step.call).streams:
+                    opened = await self._open_stream(step, sections)
+                    async with opened.stream as stream:
+                        async for chunk in stream:
+                            for section_event in sections.feed(chunk):
+                                yield section_event
+                            opened.check_deadline()
+                    answer, error = self._finish_stream(step, sections, opened), None
+                else:
+                    answer, error = await self._perform(step), None
+            except Exception as e:
+                answer, error = None, e
+        for section_event in sections.replay(resume):
+            yield section_event
+        response = self._build_response(text, resume, prompt_tokens, completion_tokens, generation_time, call)
+        response["time_to_first_section"] = sections.time_to_first_section
+        yield self._result_event(response)
+
+    def _perturb_text(self, text, call):
+        if self.experiment is None or not self.experiment.shadow:
+            return super()._perturb_text(text, call)
+        t1 = time.perf_counter()
+        variant = self.experiment.assign(text)
+        call.variant = "n"
+        if variant != "n" and self.experiment.acquire_shadow_slot():
+            # shadow parses share the caller's event loop; the task set keeps them referenced until done
+            task = asyncio.get_running_loop().create_task(self._parse_shadow(text, variant))
+            self._shadow_tasks.add(task)
+            task.add_done_callback(self._shadow_done)
+        call.add_timing("perturb", time.perf_counter() - t1)
+        return text
+
+    def _shadow_done(self, task):
+        self._shadow_tasks.discard(task)
+        self.experiment.release_shadow_slot()
+
+    async def _parse_shadow(self, text, variant):
+        try:
+            call = ParseCall("batch", self.backend)
+            text, call.variant = self.experiment.perturb(text, variant)
+            self.experiment.report(self._finalize_standalone(await self._parse(text, call), call))
+        except Exception as e:
+            event(logger, logging.ERROR, "shadow.failed", "(AsyncOAiParser) Shadow parse failed: %(error)s",
+                  error_type=type(e).__name__, error=clip(e))
+
+    async def _query_openai(self, text, call):
+        return await self._run(self._query_flow(text, call))
+
+    async def _get_completion(self, text, call):
+        return await self._run(self._completion_flow(text, call))
+
+    async def _run(self, flow):
+        """Drives `flow` to its result on the running event loop; gathered sub-flows run as concurrent tasks."""
+        answer = error = None
+        while True:
+            try:
+                step = flow.send(answer) if error is None else flow.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                answer, error = await self._perform(step), None
+            except Exception as e:
+                answer, error = None, e
+
+    async def _perform(self, step):
+        if isinstance(step, _Request):
+            return await self._request(step.call, step.messages, step.response_format)
+        return list(await asyncio.gather(*(self._run(sub) for sub in step.flows)))
+
+    async def _request(self, call, messages, response_format):
+        backend = self._call_backend(call)
+        if isinstance(backend, OpenAIBackend):
+            return await self._request_openai(call, messages, response_format)
+        attempts = call.attempts
+        t1 = time.perf_counter()
+        try:
+            return await backend.acomplete(self, call, messages, response_format)
+        finally:
+            # a backend that went on to _request_openai (a recording ReplayBackend) has accounted for it already
+            if call.attempts == attempts:
+                call.attempts += 1
+                call.add_timing("request", time.perf_counter() - t1)
+
+    async def _request_openai(self, call, messages, response_format):
+        from rtk.retry import acall_with_retries
+        client, model, limiter, tokens, request = self._openai_request(call, messages, response_format)
+
+        async def send(timeout):
+            if limiter is not None:
+                waited = await limiter.aacquire(model, tokens, call.priority, timeout)
+                call.add_timing("admission", waited)
+                timeout -= waited
+            t1 = time.perf_counter()
+            try:
+                raw = await client.chat.completions.with_raw_response.create(timeout=timeout, **request)
+            except Exception as e:
+                self._request_failed(call, limiter, model, e)
+                raise
+            self._update_limits(limiter, model, raw)
+            return raw, t1
+
+        t1 = time.perf_counter()
+        raw, t_sent = await acall_with_retries(send, self.retry_policy, call, model)
+        call.add_timing("request", time.perf_counter() - t1)
+        return self._read_openai_response(raw, t_sent, call, response_format, limiter, tokens)
+
+    async def _open_stream(self, step, sections):
+        from rtk.retry import acall_with_retries
+        call = step.call
+        client, model, limiter, tokens, request = self._openai_request(call, step.messages, step.response_format)
+        policy = self._stream_policy()
+
+        async def send(timeout):
+            if limiter is not None:
+                waited = await limiter.aacquire(model, tokens, call.priority, timeout)
+                call.add_timing("admission", waited)
+                timeout -= waited
+            t1 = time.perf_counter()
+            try:
+                stream = await client.chat.completions.create(stream=True, stream_options={"include_usage": True},
+                                                              timeout=timeout, **request)
+            except Exception as e:
+                self._request_failed(call, limiter, model, e)
+                raise
+            self._update_limits(limiter, model, stream)
+            return stream, t1
+
+        t1 = time.perf_counter()
+        deadline = time.monotonic() + policy.deadline
+        stream, t_sent = await acall_with_retries(send, policy, call, model)
+        sections.start(step.prefill)
+        return _OpenStream(stream, limiter, tokens, t1, t_sent, deadline)
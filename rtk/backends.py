@@ -0,0 +1,309 @@
+import abc
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+# Extraction backends: what answers a structured-output request once the parser has built the messages and
+# picked the response format. Every backend returns a completion shaped like the OpenAI SDK's (choices[0].message
+# with content, parsed and refusal, finish_reason, usage) with `parsed` filled in, or raises InvalidCompletion,
+# so caching, repair, validation and metrics work the same whichever backend answered.
+
+
+class ReplayMiss(KeyError):
+    """A request that is not in the recording of a ReplayBackend without a backend to record from."""
+
+
+def make_completion(content, prompt_tokens, completion_tokens, finish_reason="stop"):
+    message = SimpleNamespace(content=content, parsed=None, refusal=None)
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)], usage=usage)
+
+
+def request_key(model, messages, response_format):
+    from rtk.schema import schema_fingerprint
+    payload = json.dumps([model, messages, schema_fingerprint(response_format)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Backend(abc.ABC):
+    """Base class of extraction backends; subclasses implement `complete`.
+
+    `model` is the model answers are reported and cached under (None: the parser's model, and its model cascade
+    applies); `streams` tells whether `parse_stream` can stream from it (otherwise the answer is produced in one
+    piece and replayed section by section); `requires_key` whether parsing needs the OpenAI key.
+    """
+    name = None
+    model = None
+    streams = False
+    requires_key = False
+
+    @abc.abstractmethod
+    def complete(self, parser, call, messages, response_format):
+        """The completion for `messages` in `response_format`, `message.parsed` filled in."""
+
+    async def acomplete(self, parser, call, messages, response_format):
+        import asyncio
+        return await asyncio.to_thread(self.complete, parser, call, messages, response_format)
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class OpenAIBackend(Backend):
+    """The OpenAI chat completions API through the parser's client, retry policy and rate limiter."""
+    name = "openai"
+    streams = True
+    requires_key = True
+
+    def complete(self, parser, call, messages, response_format):
+        return parser._request_openai(call, messages, response_format)
+
+    async def acomplete(self, parser, call, messages, response_format):
+        return await parser._request_openai(call, messages, response_format)
+
+
+class ReplayBackend(Backend):
+    """Answers requests from a recording: a JSONL file with one answer per line, keyed by model, messages and
+    schema. With `record` (another backend), requests missing from the recording go to it and its answers are
+    appended to the file; without, they raise ReplayMiss. Replays are reported under the recorded model."""
+    name = "replay"
+
+    def __init__(self, path, record=None):
+        self.path = path
+        self.record = record
+        self.requires_key = record is not None and record.requires_key
+        self._answers = None
+        self._lock = threading.Lock()
+
+    @property
+    def num_answers(self):
+        return len(self._load())
+
+    def complete(self, parser, call, messages, response_format):
+        from rtk.schema import InvalidCompletion
+        key = request_key(call.model or parser.model, messages, response_format)
+        answer = self._lookup(key)
+        if answer is not None:
+            return self._replay(answer, response_format)
+        try:
+            completion = self.record.complete(parser, call, messages, response_format)
+        except InvalidCompletion as e:
+            # an invalid answer is replayed as invalid too, so repair runs the same way
+            self._store(key, e.completion)
+            raise
+        self._store(key, completion)
+        return completion
+
+    async def acomplete(self, parser, call, messages, response_format):
+        from rtk.schema import InvalidCompletion
+        key = request_key(call.model or parser.model, messages, response_format)
+        answer = self._lookup(key)
+        if answer is not None:
+            return self._replay(answer, response_format)
+        try:
+            completion = await self.record.acomplete(parser, call, messages, response_format)
+        except InvalidCompletion as e:
+            self._store(key, e.completion)
+            raise
+        self._store(key, completion)
+        return completion
+
+    def _load(self):
+        with self._lock:
+            if self._answers is None:
+                self._answers = {}
+                if os.path.exists(self.path):
+                    with open(self.path, encoding="utf-8") as f:
+                        for line in f:
+                            if line.strip():
+                                answer = json.loads(line)
+                                self._answers[answer["key"]] = answer
+            return self._answers
+
+    def _lookup(self, key):
+        answer = self._load().get(key)
+        if answer is None and self.record is None:
+            raise ReplayMiss(key)
+        return answer
+
+    @staticmethod
+    def _replay(answer, response_format):
+        from rtk.schema import parse_completion
+        completion = make_completion(answer["content"], answer["prompt_tokens"], answer["completion_tokens"],
+                                     answer["finish_reason"])
+        return parse_completion(completion, response_format)
+
+    def _store(self, key, completion):
+        choice = completion.choices[0]
+        answer = {"key": key, "content": choice.message.content, "finish_reason": choice.finish_reason,
+                  "prompt_tokens": completion.usage.prompt_tokens,
+                  "completion_tokens": completion.usage.completion_tokens}
+        with self._lock:
+            self._answers[key] = answer
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(answer, ensure_ascii=False) + "\n")
+
+
+class LocalBackend(Backend):
+    """A small instruction-tuned model run on CPU with transformers, decoding constrained to the response
+    format's schema (rtk.constrained), so every answer that finishes is a document of the schema.
+
+    Requests arriving together (parse_batch and iter_parse workers, parse_many coroutines, the sections of a
+    split parse) are answered by one batched `generate` call: a request waits at most `max_wait` seconds for
+    others to join it, up to `batch_size` per batch. The model is loaded on first use; with `quantize` its
+    linear layers are dynamically quantized to int8. Subclasses can override `generate` to run another runtime.
+    """
+    name = "local"
+    DEFAULT_MODEL = "Qwen/Qwen2.5-0.5B-Instruct"
+
+    def __init__(self, model=DEFAULT_MODEL, quantize=True, batch_size=8, max_wait=0.05, max_new_tokens=2048,
+                 threads=None):
+        self.model = model
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_new_tokens = max_new_tokens
+        self.threads = threads
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._token_texts = None
+        self._automata = {}
+
+    def complete(self, parser, call, messages, response_format):
+        from rtk.schema import parse_completion
+        return parse_completion(self._submit(messages, response_format).result(), response_format)
+
+    async def acomplete(self, parser, call, messages, response_format):
+        import asyncio
+
+        from rtk.schema import parse_completion
+        completion = await asyncio.wrap_future(self._submit(messages, response_format))
+        return parse_completion(completion, response_format)
+
+    def close(self):
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    def _submit(self, messages, response_format):
+        future = Future()
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="rtk-local-backend", daemon=True)
+                self._worker.start()
+            self._queue.put((messages, response_format, future))
+        return future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._answer(batch)
+
+    def _answer(self, batch):
+        # one generate call per response format: whole resumes and sections are constrained differently
+        groups = {}
+        for messages, response_format, future in batch:
+            if future.set_running_or_notify_cancel():
+                groups.setdefault(response_format, []).append((messages, future))
+        for response_format, requests in groups.items():
+            self.batches += 1
+            try:
+                outputs = self.generate([messages for messages, _ in requests], response_format)
+            except BaseException as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            for (_, future), output in zip(requests, outputs):
+                future.set_result(make_completion(*output))
+
+    def generate(self, batch, response_format):
+        """Answers every message list in `batch` in one go: a list of
+        (content, prompt_tokens, completion_tokens, finish_reason) in the same order."""
+        import torch
+        from transformers import LogitsProcessorList
+
+        from rtk.constrained import SchemaLogitsProcessor
+        tokenizer, model = self._load()
+        prompts = [tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+                   for messages in batch]
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+        processor = SchemaLogitsProcessor(self._automaton(response_format), self._token_texts,
+                                          tokenizer.eos_token_id, len(batch))
+        with torch.inference_mode():
+            output = model.generate(**inputs, max_new_tokens=self.max_new_tokens, do_sample=False,
+                                    logits_processor=LogitsProcessorList([processor]),
+                                    pad_token_id=tokenizer.pad_token_id)
+        generated = output[:, inputs["input_ids"].shape[1]:].tolist()
+        results = []
+        for row, tokens in enumerate(generated):
+            if tokenizer.eos_token_id in tokens:
+                tokens = tokens[:tokens.index(tokenizer.eos_token_id) + 1]
+            content = tokenizer.decode(tokens, skip_special_tokens=True)
+            finish_reason = "stop" if processor.complete[row] else "length"
+            results.append((content, int(inputs["attention_mask"][row].sum()), len(tokens), finish_reason))
+        return results
+
+    def _automaton(self, response_format):
+        from rtk.constrained import SchemaAutomaton
+        automaton = self._automata.get(response_format)
+        if automaton is None:
+            automaton = self._automata[response_format] = SchemaAutomaton.for_response_format(response_format)
+        return automaton
+
+    def _load(self):
+        if self._loaded is None:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            tokenizer = AutoTokenizer.from_pretrained(self.model)
+            # left padding keeps the prompts of a batch flush against the tokens generated after them
+            tokenizer.padding_side = "left"
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            model = AutoModelForCausalLM.from_pretrained(self.model, torch_dtype=torch.float32)
+            model.eval()
+            if self.quantize:
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self._token_texts = self._decode_vocabulary(tokenizer)
+            self._loaded = tokenizer, model
+        return self._loaded
+
+    @staticmethod
+    def _decode_vocabulary(tokenizer):
+        # decoded after an anchor token, as sentencepiece tokenizers drop the leading space of a lone token
+        special = set(tokenizer.all_special_ids)
+        anchor = tokenizer.encode("a", add_special_tokens=False)[-1:]
+        prefix = len(tokenizer.decode(anchor))
+        texts = []
+        for token_id in range(len(tokenizer)):
+            text = None if token_id in special else tokenizer.decode(anchor + [token_id])[prefix:]
+            texts.append(text if text and "�" not in text else None)
+        return texts
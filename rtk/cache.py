@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from rtk.schema import schema_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def make_cache_key(text, model, system_prompt, version):
+    h = hashlib.sha256()
+    for part in (normalize_text(text), model, system_prompt, schema_fingerprint(), version):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Tiers
+# ----------------------------------------------------------------------------------------------------------------------
+class MemoryCache:
+    """Bounded in-process LRU of parsed Resume objects."""
+    name = "memory"
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def close(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Persistent tier; entries expire after `ttl` seconds and the least recently used ones are
+    dropped once the table grows past `max_entries`."""
+    name = "disk"
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl=None, max_entries=100_000):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS parse_cache ("
+                           "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS parse_cache_accessed ON parse_cache (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM parse_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            self._conn.execute("UPDATE parse_cache SET accessed = ? WHERE key = ?", (now, key))
+        return self._decode(value)
+
+    def set(self, key, entry):
+        now = time.time()
+        value = self._encode(entry)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO parse_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                               (key, value, now, now))
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+    def prune(self):
+        with self._lock:
+            self._prune(time.time())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+
+    def _prune(self, now):
+        if self.ttl is not None:
+            cur = self._conn.execute("DELETE FROM parse_cache WHERE created < ?", (now - self.ttl,))
+            self.evictions += cur.rowcount
+        cur = self._conn.execute("DELETE FROM parse_cache WHERE key IN (SELECT key FROM parse_cache "
+                                 "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        self.evictions += cur.rowcount
+
+    def _encode(self, entry):
+        resume_obj, num_tokens = entry
+        return json.dumps({"resume": resume_obj.model_dump(mode="json"), "num_tokens": num_tokens})
+
+    def _decode(self, value):
+        from rtk.resume_dataclass import Resume
+        d = json.loads(value)
+        return Resume.model_validate(d["resume"]), d["num_tokens"]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Parse Cache
+# ----------------------------------------------------------------------------------------------------------------------
+class ParseCache:
+    """Content-addressed cache of structured-output completions, consulted before the OpenAI call.
+
+    Tiers are checked in order (memory, then disk); a hit in a slower tier is promoted into the faster ones.
+    """
+
+    def __init__(self, memory_entries=1024, path=None, ttl=None, max_disk_entries=100_000):
+        self.tiers = []
+        if memory_entries:
+            self.tiers.append(MemoryCache(max_entries=memory_entries))
+        if path is not None:
+            self.tiers.append(SQLiteCache(path, ttl=ttl, max_entries=max_disk_entries))
+        self.hits = {tier.name: 0 for tier in self.tiers}
+        self.misses = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, count_miss=True):
+        """(resume_obj, tier name) of the entry under `key`, or (None, None). A caller trying several keys for
+        one text passes count_miss=False and calls `miss()` once none of them hit."""
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is None:
+                continue
+            for faster in self.tiers[:i]:
+                faster.set(key, entry)
+            resume_obj, num_tokens = entry
+            with self._lock:
+                self.hits[tier.name] += 1
+                self.tokens_saved += num_tokens
+            return resume_obj, tier.name
+        if count_miss:
+            self.miss()
+        return None, None
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def set(self, key, resume_obj, num_tokens):
+        for tier in self.tiers:
+            tier.set(key, (resume_obj, num_tokens))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "evictions": {tier.name: tier.evictions for tier in self.tiers},
+                "tokens_saved": self.tokens_saved,
+            }
+
+    def close(self):
+        for tier in self.tiers:
+            tier.close()
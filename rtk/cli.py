@@ -0,0 +1,246 @@
+"""`rtk` command: parse a directory, a JSONL file or stdin into a JSONL file of results.
+
+    rtk resumes/ -o results.jsonl --workers 32
+    rtk inputs.jsonl -o results.jsonl --text-field body --id-field uuid
+    cat inputs.jsonl | rtk - -o results.jsonl
+
+Inputs are streamed and at most `--workers` documents are in flight, so memory does not grow with the corpus.
+Every written result is recorded in `<output>.ckpt` together with the output offset it ends at; running the
+same command again skips finished documents and drops any partially written tail of the output. A JSONL line
+that is not a JSON object with the text field gets an error row of its own and does not stop the run.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from rtk.result import ParseResult, encode
+
+TEXT_SUFFIXES = (".txt", ".md", ".text")
+
+
+def iter_directory(path):
+    root = Path(path)
+    for file in sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in TEXT_SUFFIXES):
+        yield str(file.relative_to(root)), file.read_text(encoding="utf-8", errors="replace")
+
+
+class BadRecord:
+    """Stands in for the text of an input record that can not be parsed; `reason` tells why."""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def response(self):
+        return ParseResult(error=self.reason, is_valid_json=False, is_valid_jsonresume=False, jsonresume={})
+
+
+def iter_jsonl(lines, id_field, text_field):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield str(number), BadRecord(f"invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield str(number), BadRecord("not a JSON object")
+            continue
+        doc_id = str(record.get(id_field, number))
+        text = record.get(text_field)
+        if not isinstance(text, str):
+            yield doc_id, BadRecord(f"no {text_field!r} string field")
+            continue
+        yield doc_id, text
+
+
+def iter_inputs(source, id_field="id", text_field="text"):
+    """Yields (id, text) pairs lazily from a directory, a JSONL file or "-" for JSONL on stdin."""
+    if source == "-":
+        yield from iter_jsonl(sys.stdin, id_field, text_field)
+    elif os.path.isdir(source):
+        yield from iter_directory(source)
+    else:
+        with open(source, encoding="utf-8") as f:
+            yield from iter_jsonl(f, id_field, text_field)
+
+
+class Checkpoint:
+    """Append-only log of "<output offset>\\t<json id>" lines, one per result written to the output."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.offset = 0
+        self._file = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                offset, _, doc_id = line.rstrip("\n").partition("\t")
+                if not doc_id:
+                    # torn last line of an interrupted run
+                    continue
+                self.done.add(json.loads(doc_id))
+                self.offset = max(self.offset, int(offset))
+        return self
+
+    def record(self, offset, doc_id):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(f"{offset}\t{json.dumps(doc_id)}\n")
+        self._file.flush()
+        self.done.add(doc_id)
+        self.offset = offset
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Progress:
+
+    def __init__(self, stream=sys.stderr, interval=2.0):
+        self.stream = stream
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last = 0.0
+        self.done = self.errors = self.tokens = self.skipped = 0
+
+    def update(self, response):
+        self.done += 1
+        self.tokens += response.get("num_tokens", 0)
+        if not response.get("is_valid_jsonresume"):
+            self.errors += 1
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        error_rate = self.errors / self.done if self.done else 0.0
+        line = (f"done {self.done} (skipped {self.skipped}) | {self.done / elapsed:.1f} docs/s | "
+                f"errors {self.errors} ({error_rate:.1%}) | tokens {self.tokens}")
+        end = "\n" if final or not self.stream.isatty() else "\r"
+        self.stream.write(line + end)
+        self.stream.flush()
+
+
+def build_parser(args):
+    from rtk import OAiParser
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+    cache = None
+    if args.cache:
+        from rtk import ParseCache
+        cache = ParseCache(path=args.cache)
+    return OAiParser(args.api_key, config, cache=cache, base_url=args.base_url, split_sections=args.split_sections)
+
+
+def run(args, parser=None, progress=None):
+    parser = parser or build_parser(args)
+    progress = progress or Progress(interval=args.progress_interval)
+    to_stdout = args.output == "-"
+    checkpoint = None
+    if to_stdout:
+        out = sys.stdout.buffer
+    else:
+        checkpoint_path = args.output + ".ckpt"
+        if args.overwrite:
+            for path in (args.output, checkpoint_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        elif os.path.exists(args.output) and os.path.getsize(args.output) and not os.path.exists(checkpoint_path):
+            raise SystemExit(f"rtk: {args.output} exists without a checkpoint; pass --overwrite to start over")
+        checkpoint = Checkpoint(checkpoint_path).load()
+        out = open(args.output, "ab")
+        # anything past the last checkpointed offset was written without its checkpoint entry
+        out.truncate(checkpoint.offset)
+        out.seek(checkpoint.offset)
+
+    # ids of the documents in flight, by the index iter_parse reports them under
+    ids = {}
+    offset = checkpoint.offset if checkpoint else 0
+
+    def write(doc_id, response):
+        nonlocal offset
+        line = encode(response.to_dict(id=doc_id), newline=True)
+        out.write(line)
+        out.flush()
+        offset += len(line)
+        if checkpoint is not None:
+            checkpoint.record(offset, doc_id)
+        progress.update(response)
+
+    def texts():
+        i = 0
+        for doc_id, text in iter_inputs(args.input, args.id_field, args.text_field):
+            if checkpoint is not None and doc_id in checkpoint.done:
+                progress.skipped += 1
+                continue
+            if isinstance(text, BadRecord):
+                # written (and checkpointed) at once, so a rerun gets past it too
+                write(doc_id, text.response())
+                continue
+            ids[i] = doc_id
+            i += 1
+            yield text
+
+    try:
+        for i, response in parser.iter_parse(texts(), workers=args.workers, standalone=args.standalone):
+            write(ids.pop(i), response)
+    except KeyboardInterrupt:
+        sys.stderr.write("\nrtk: interrupted, run the same command again to resume\n")
+    finally:
+        parser.close()
+        if not to_stdout:
+            out.close()
+            checkpoint.close()
+        progress.report(final=True)
+    return progress
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="rtk", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("input", help="directory of .txt/.md files, a JSONL file, or - for JSONL on stdin")
+    ap.add_argument("-o", "--output", default="-", help="JSONL output, - for stdout (default; no checkpoint)")
+    ap.add_argument("-w", "--workers", type=int, default=8, help="requests in flight (default 8)")
+    ap.add_argument("--id-field", default="id", help="JSONL field holding the document id (default: line number)")
+    ap.add_argument("--text-field", default="text", help="JSONL field holding the resume text")
+    ap.add_argument("--no-standalone", dest="standalone", action="store_false",
+                    help="use parse() instead of parse_standalone() (no statuscode/var)")
+    ap.add_argument("--config", help="JSON parser config (flags, current_env)")
+    ap.add_argument("--api-key", default=None, help="defaults to $OPENAI_API_KEY")
+    ap.add_argument("--base-url", default=None)
+    ap.add_argument("--cache", help="SQLite parse cache shared across runs")
+    ap.add_argument("--split-sections", action="store_true")
+    ap.add_argument("--overwrite", action="store_true", help="discard an existing output and checkpoint")
+    ap.add_argument("--progress-interval", type=float, default=2.0, help="seconds between progress lines")
+    ap.add_argument("-v", "--verbose", action="store_true", help="keep the per-call log lines")
+    ap.add_argument("--log-json", action="store_true", help="log one JSON object per line on stderr")
+    args = ap.parse_args(argv)
+    from rtk import log
+    # log lines are written from a background thread so that stderr never holds up the workers
+    handler = log.configure(logging.DEBUG if args.verbose else logging.WARNING, structured=args.log_json,
+                            background=True)
+    try:
+        progress = run(args)
+    finally:
+        logging.getLogger("rtk").removeHandler(handler)
+        handler.close()
+    return 1 if progress.done and progress.errors == progress.done else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import threading
+import weakref
+
+# Process-wide registry of OpenAI clients keyed by (api key, base URL). Parsers share a client, and with it the
+# httpx connection pool, instead of paying a fresh TLS handshake per parser instance.
+DEFAULT_SETTINGS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "timeout": 120.0,
+    "connect_timeout": 5.0,
+}
+
+_settings = dict(DEFAULT_SETTINGS)
+_clients = {}
+# AsyncOpenAI connections belong to the event loop that opened them, so async clients are kept per loop
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def configure(**settings):
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {sorted(unknown)}")
+    with _lock:
+        _settings.update(settings)
+
+
+def get_client(api_key, base_url=None):
+    key = (api_key, base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _build_client(api_key, base_url, is_async=False)
+            _clients[key] = client
+        return client
+
+
+def get_async_client(api_key, base_url=None):
+    import asyncio
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = _build_client(api_key, base_url, is_async=True)
+            clients[key] = client
+        return client
+
+
+def reset():
+    """Closes and forgets every shared client and restores the default settings.
+
+    An async client is closed on its own event loop: there and then when the loop is idle, scheduled on it when
+    the loop is running (reset() called from a coroutine, or from another thread). An idle loop is run on a
+    helper thread when reset() is called from a coroutine of another loop, which rules out running it here. One
+    whose loop has already been closed can not be closed any more and is only dropped; its sockets are freed
+    when it is collected.
+    """
+    with _lock:
+        clients = list(_clients.values())
+        async_clients = [(loop, client) for loop, by_key in _async_clients.items() for client in by_key.values()]
+        _clients.clear()
+        _async_clients.clear()
+        _settings.clear()
+        _settings.update(DEFAULT_SETTINGS)
+    for client in clients:
+        client.close()
+    for loop, client in async_clients:
+        _close_async_client(loop, client)
+
+
+def _close_async_client(loop, client):
+    import asyncio
+    if loop.is_closed():
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.close(), loop)
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        loop.run_until_complete(client.close())
+        return
+    # a thread runs one loop at a time, so the idle loop is run on a thread of its own
+    closer = threading.Thread(target=loop.run_until_complete, args=(client.close(),), name="rtk-close-client")
+    closer.start()
+    closer.join()
+
+
+def _build_client(api_key, base_url, is_async):
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+    from rtk.metrics import astamp_first_byte, stamp_first_byte
+
+    limits = httpx.Limits(max_connections=_settings["max_connections"],
+                          max_keepalive_connections=_settings["max_keepalive_connections"],
+                          keepalive_expiry=_settings["keepalive_expiry"])
+    timeout = httpx.Timeout(_settings["timeout"], connect=_settings["connect_timeout"])
+    if is_async:
+        http_client = DefaultAsyncHttpxClient(limits=limits, timeout=timeout,
+                                              event_hooks={"response": [astamp_first_byte]})
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, http_client=http_client)
+    http_client = DefaultHttpxClient(limits=limits, timeout=timeout, event_hooks={"response": [stamp_first_byte]})
+    return OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, http_client=http_client)
@@ -0,0 +1,226 @@
+import json
+
+# Schema-constrained decoding for local models. SchemaAutomaton accepts, character by character, exactly the
+# compact JSON documents of a strict structured-outputs schema (every property required, no additional
+# properties, nullable fields as anyOf [..., null]) with object keys in schema order; keys and punctuation are
+# forced, so a model only ever chooses values. SchemaLogitsProcessor applies it to generation one token at a
+# time: the highest-scoring tokens are tried in order and the first one the automaton accepts is the only one
+# left open, which is greedy decoding restricted to valid documents.
+
+_VALUE, _LITERAL, _STRING, _NUMBER, _ARRAY = range(5)
+_HEX = frozenset("0123456789abcdefABCDEF")
+_DIGITS = frozenset("0123456789")
+_ESCAPES = frozenset('"\\/bfnrt')
+_NUMBER_ENDS = frozenset(("zero", "int", "frac", "exp"))
+_STARTS = {"string": '"', "object": "{", "array": "[", "number": "-0123456789", "integer": "-0123456789",
+           "boolean": "tf", "null": "n"}
+
+
+def _number_step(phase, c, integer):
+    if c in _DIGITS:
+        if phase in ("start", "sign"):
+            return "zero" if c == "0" else "int"
+        if phase == "int":
+            return "int"
+        if phase in ("dot", "frac"):
+            return "frac"
+        if phase in ("e", "esign", "exp"):
+            return "exp"
+        return None
+    if c == "-" and phase == "start":
+        return "sign"
+    if integer:
+        return None
+    if c == "." and phase in ("zero", "int"):
+        return "dot"
+    if c in "eE" and phase in ("zero", "int", "frac"):
+        return "e"
+    if c in "+-" and phase == "e":
+        return "esign"
+    return None
+
+
+class SchemaAutomaton:
+    """Accepts the compact JSON documents of `schema` (a JSON schema dict, `$defs` and `$ref` resolved).
+
+    States are tuples and never mutated, so one state can be tried against many continuations.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.defs = schema.get("$defs", {})
+
+    @classmethod
+    def for_response_format(cls, model_cls):
+        from rtk.schema import response_format
+        return cls(response_format(model_cls)["json_schema"]["schema"])
+
+    def start(self):
+        return ((_VALUE, self.schema),)
+
+    @staticmethod
+    def is_complete(state):
+        return not state
+
+    def feed(self, state, text):
+        """The state after `text`, or None when no document of the schema continues that way."""
+        stack = list(state)
+        for c in text:
+            if not self._step(stack, c):
+                return None
+        return tuple(stack)
+
+    def accepts(self, text):
+        state = self.feed(self.start(), text)
+        return state is not None and self.is_complete(state)
+
+    def _step(self, stack, c):
+        while stack:
+            frame = stack[-1]
+            kind = frame[0]
+            if kind == _LITERAL:
+                _, literal, pos = frame
+                if c != literal[pos]:
+                    return False
+                if pos + 1 == len(literal):
+                    stack.pop()
+                else:
+                    stack[-1] = (_LITERAL, literal, pos + 1)
+                return True
+            if kind == _STRING:
+                escape = frame[1]
+                if escape == 0:
+                    if c == '"':
+                        stack.pop()
+                    elif c == "\\":
+                        stack[-1] = (_STRING, -1)
+                    elif c < " ":
+                        return False
+                    return True
+                if escape == -1:
+                    if c == "u":
+                        stack[-1] = (_STRING, 4)
+                    elif c in _ESCAPES:
+                        stack[-1] = (_STRING, 0)
+                    else:
+                        return False
+                    return True
+                if c not in _HEX:
+                    return False
+                stack[-1] = (_STRING, escape - 1)
+                return True
+            if kind == _NUMBER:
+                _, phase, integer = frame
+                phase_after = _number_step(phase, c, integer)
+                if phase_after is not None:
+                    stack[-1] = (_NUMBER, phase_after, integer)
+                    return True
+                if phase not in _NUMBER_ENDS:
+                    return False
+                # the number ends here and `c` belongs to whatever follows it
+                stack.pop()
+                continue
+            if kind == _ARRAY:
+                _, items, started = frame
+                if c == "]":
+                    stack.pop()
+                    return True
+                if started:
+                    if c != ",":
+                        return False
+                    stack.append((_VALUE, items))
+                    return True
+                stack[-1] = (_ARRAY, items, True)
+                stack.append((_VALUE, items))
+                continue
+            stack.pop()
+            if not self._expand(stack, frame[1], c):
+                return False
+        return False
+
+    def _resolve(self, schema):
+        ref = schema.get("$ref")
+        if ref is None:
+            return schema
+        if not ref.startswith("#/$defs/"):
+            raise ValueError(f"Unsupported $ref {ref!r}")
+        return self.defs[ref[len("#/$defs/"):]]
+
+    def _alternatives(self, schema):
+        schema = self._resolve(schema)
+        if "anyOf" in schema:
+            for option in schema["anyOf"]:
+                yield from self._alternatives(option)
+            return
+        types = schema.get("type")
+        for type_ in types if isinstance(types, list) else [types]:
+            yield type_, schema
+
+    def _expand(self, stack, schema, c):
+        """Pushes the frames of a value of `schema` starting with `c` (consumed by the caller's next step)."""
+        for type_, option in self._alternatives(schema):
+            if c not in _STARTS.get(type_, ""):
+                continue
+            if type_ == "string":
+                stack += [(_STRING, 0), (_LITERAL, '"', 0)]
+            elif type_ == "object":
+                properties = list(option.get("properties", {}).items())
+                frames = [(_LITERAL, "}", 0)]
+                for i in range(len(properties) - 1, -1, -1):
+                    key, value = properties[i]
+                    frames += [(_VALUE, value), (_LITERAL, ("{" if i == 0 else ",") + json.dumps(key) + ":", 0)]
+                stack += frames if properties else [(_LITERAL, "{}", 0)]
+            elif type_ == "array":
+                stack += [(_ARRAY, option.get("items", {}), False), (_LITERAL, "[", 0)]
+            elif type_ in ("number", "integer"):
+                stack.append((_NUMBER, "start", type_ == "integer"))
+            elif type_ == "boolean":
+                stack.append((_LITERAL, "true" if c == "t" else "false", 0))
+            else:
+                stack.append((_LITERAL, "null", 0))
+            return True
+        return False
+
+
+class SchemaLogitsProcessor:
+    """Logits processor (a plain callable, as `generate` accepts) keeping every row of a batch on a document of
+    `automaton`. `token_texts[i]` is the text token `i` adds, None for tokens never allowed (special tokens,
+    partial characters); rows with a complete document are held on `eos_token_id`."""
+
+    def __init__(self, automaton, token_texts, eos_token_id, batch_size, top_k=64):
+        self.automaton = automaton
+        self.token_texts = token_texts
+        self.eos_token_id = eos_token_id
+        self.top_k = top_k
+        self.states = [automaton.start()] * batch_size
+        self.complete = [False] * batch_size
+
+    def choose(self, state, ranked_ids):
+        """The first of `ranked_ids` the automaton accepts after `state`, and the state after it."""
+        for token_id in ranked_ids:
+            text = self.token_texts[token_id] if token_id < len(self.token_texts) else None
+            if not text:
+                continue
+            state_after = self.automaton.feed(state, text)
+            if state_after is not None:
+                return token_id, state_after
+        return None, state
+
+    def __call__(self, input_ids, scores):
+        import torch
+        allowed = torch.full_like(scores, float("-inf"))
+        top_k = min(self.top_k, scores.shape[1])
+        for row in range(scores.shape[0]):
+            state = self.states[row]
+            token_id = None
+            if not self.complete[row]:
+                token_id, state = self.choose(state, scores[row].topk(top_k).indices.tolist())
+                if token_id is None:
+                    # rarely needed: everything the model ranks highest breaks the document
+                    token_id, state = self.choose(state, scores[row].argsort(descending=True).tolist())
+            if token_id is None:
+                token_id = self.eos_token_id
+            self.states[row] = state
+            self.complete[row] = self.automaton.is_complete(state)
+            allowed[row, token_id] = 0.0
+        return scores + allowed
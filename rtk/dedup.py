@@ -0,0 +1,160 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from rtk.cache import normalize_text
+
+# Near-duplicate detection: a resume re-submitted with a new phone number or one more bullet should not cost a
+# full extraction. Texts are fingerprinted with MinHash over word shingles and indexed with banded LSH in SQLite,
+# so a lookup is a handful of primary-key seeks through the memory-mapped database whatever the index size.
+
+SHINGLE_WORDS = 5
+_SHIFT = np.uint64(32)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+NearDuplicate = namedtuple("NearDuplicate", ["id", "similarity", "resume", "text"])
+
+
+class MinHasher:
+    """`num_perm` MinHash values of the word shingles of whitespace-normalized, lower-cased text."""
+
+    def __init__(self, num_perm=64, seed=1, shingle_words=SHINGLE_WORDS):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing: the high 32 bits of (a * x + b) mod 2**64 for odd a, which needs no division
+        self._a = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+
+    def shingle_hashes(self, text):
+        # one crc32 per word, combined over each window of `shingle_words` words; duplicate shingles do not
+        # change a minimum, so there is no need for a set
+        words = normalize_text(text).lower().split(" ")
+        word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+        k = min(self.shingle_words, len(words))
+        n = len(words) - k + 1
+        hashes = np.zeros(n, dtype=np.uint64)
+        for i in range(k):
+            hashes = hashes * _MIX + word_hashes[i:i + n]
+        return hashes
+
+    def signature(self, text):
+        hashes = self.shingle_hashes(text)
+        return ((self._a * hashes + self._b) >> _SHIFT).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig1, sig2):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(sig1 == sig2)) / len(sig1)
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of parsed resumes in SQLite.
+
+    A text is a candidate when all rows of at least one of the `bands` signature bands match a stored text;
+    candidates are then ranked on the full signature and the best one at or above `threshold` is returned with
+    its Resume and the text it was parsed from. With the defaults (64 permutations, 8 bands of 8 rows), pairs
+    above 0.9 similarity are found with probability of about 0.99 and pairs below 0.5 rarely become candidates.
+    `namespace` keeps entries of different models or prompts apart. `path=None` keeps the index in memory.
+    """
+    MAX_CANDIDATES = 32
+
+    def __init__(self, path=None, num_perm=64, bands=8, threshold=0.9, seed=1, mmap_size=1 << 30):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:" if path is None else str(path), check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # reads go through the OS page cache instead of SQLite's own buffers
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, signature BLOB NOT NULL, "
+                           "resume BLOB NOT NULL, text BLOB NOT NULL, created REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS lsh (band INTEGER NOT NULL, doc INTEGER NOT NULL, "
+                           "PRIMARY KEY (band, doc)) WITHOUT ROWID")
+        self._check_params(f"{num_perm}:{bands}:{seed}:{self.hasher.shingle_words}")
+
+    def query(self, text, namespace=""):
+        """Best stored match for `text` at or above the threshold, as a NearDuplicate, or None."""
+        signature = self.hasher.signature(text)
+        keys = self._band_keys(signature, namespace)
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            # the candidates sharing the most bands are the likeliest to be the most similar
+            rows = self._conn.execute(f"SELECT doc FROM lsh WHERE band IN ({placeholders}) "
+                                      "GROUP BY doc ORDER BY COUNT(*) DESC LIMIT ?",
+                                      (*keys, self.MAX_CANDIDATES)).fetchall()
+            if not rows:
+                return None
+            docs = [doc for doc, in rows]
+            candidates = self._conn.execute(
+                f"SELECT id, signature FROM docs WHERE id IN ({','.join('?' * len(docs))})", docs).fetchall()
+            best_id, best = None, 0.0
+            for doc, blob in candidates:
+                score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+                if score > best:
+                    best_id, best = doc, score
+            if best_id is None or best < self.threshold:
+                return None
+            resume, stored = self._conn.execute("SELECT resume, text FROM docs WHERE id = ?", (best_id,)).fetchone()
+        from rtk.resume_dataclass import Resume
+        return NearDuplicate(best_id, best, Resume.model_validate_json(zlib.decompress(resume)),
+                             zlib.decompress(stored).decode("utf-8"))
+
+    def add(self, text, resume_obj, namespace=""):
+        signature = self.hasher.signature(text)
+        keys = self._band_keys(signature, namespace)
+        resume = zlib.compress(resume_obj.model_dump_json().encode("utf-8"), 1)
+        stored = zlib.compress(text.encode("utf-8"), 1)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                doc = self._conn.execute("INSERT INTO docs (signature, resume, text, created) VALUES (?, ?, ?, ?)",
+                                         (signature.tobytes(), resume, stored, time.time())).lastrowid
+                self._conn.executemany("INSERT OR IGNORE INTO lsh (band, doc) VALUES (?, ?)",
+                                       [(key, doc) for key in keys])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return doc
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def _band_keys(self, signature, namespace):
+        prefix = namespace.encode("utf-8") + b"\x00"
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(prefix + bytes([band]) + rows, digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+    def _check_params(self, params):
+        # signatures built with other permutations or bands are not comparable
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'params'").fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO meta (name, value) VALUES ('params', ?)", (params,))
+            elif row[0] != params:
+                self._conn.close()
+                raise ValueError(f"{self.path} was built with num_perm:bands:seed:shingle_words {row[0]}, "
+                                 f"not {params}")
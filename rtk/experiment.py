@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# share of traffic per perturbation: p1 truncates, p2 shuffles all but the first lines, p3 drops the head and
+# flattens the text, n leaves it alone. The defaults reproduce the original chained 30% draws.
+DEFAULT_WEIGHTS = {"p1": 0.3, "p2": 0.21, "p3": 0.147, "n": 0.343}
+VARIANTS = ("p1", "p2", "p3", "n")
+P1_OFFSETS = (2000, 3000, 4000)
+
+
+class Experiment:
+    """Deterministic assignment of texts to perturbation variants.
+
+    The variant is a function of the text and `seed` only, so retries and replicas agree, and it is handed
+    back per call instead of living on the parser. With `shadow`, callers get the unperturbed parse and the
+    perturbed variant is parsed on a small background pool; its result goes to `on_shadow_result`.
+    """
+
+    def __init__(self, seed=0, weights=None, shadow=False, shadow_workers=2, max_pending=32,
+                 on_shadow_result=None):
+        weights = dict(weights or DEFAULT_WEIGHTS)
+        unknown = set(weights) - set(VARIANTS)
+        if unknown:
+            raise ValueError(f"Unknown experiment variants: {sorted(unknown)}")
+        total = sum(weights.values())
+        if total <= 0:
+            raise ValueError("Experiment weights must add up to a positive number")
+        self.seed = seed
+        self.weights = weights
+        self._cumulative = []
+        acc = 0.0
+        for variant in VARIANTS:
+            acc += weights.get(variant, 0.0) / total
+            self._cumulative.append((acc, variant))
+        self.shadow = shadow
+        self.shadow_workers = shadow_workers
+        self.on_shadow_result = on_shadow_result
+        self.dropped = 0
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_flag(cls, flag):
+        return cls(seed=flag.get("seed", 0), weights=flag.get("weights"), shadow=flag.get("shadow", False))
+
+    def assign(self, text):
+        draw = self._digest(text)[0]
+        for bound, variant in self._cumulative:
+            if draw < bound:
+                return variant
+        return self._cumulative[-1][1]
+
+    def perturb(self, text, variant=None):
+        """Returns (perturbed text, variant label), e.g. ("...", "p1-3000")."""
+        variant = variant or self.assign(text)
+        rng = random.Random(self._digest(text)[1])
+        if variant == "p1":
+            offset = rng.choice(P1_OFFSETS)
+            return text[:offset], f"p1-{offset}"
+        if variant == "p2":
+            lines = text.split("\n")
+            offset = min(20, int(len(lines) / 4))
+            end = lines[offset:]
+            rng.shuffle(end)
+            return "\n".join(lines[:offset] + end), f"p2-{offset}"
+        if variant == "p3":
+            return text[300:].replace("\n", " "), "p3"
+        return text, "n"
+
+    def submit_shadow(self, fn, *args):
+        # shadow traffic is best effort: beyond max_pending queued calls it is dropped, not queued
+        if not self._pending.acquire(blocking=False):
+            self.dropped += 1
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.shadow_workers, thread_name_prefix="rtk-shadow")
+            executor = self._executor
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self._pending.release())
+        return future
+
+    def acquire_shadow_slot(self):
+        if self._pending.acquire(blocking=False):
+            return True
+        self.dropped += 1
+        return False
+
+    def release_shadow_slot(self):
+        self._pending.release()
+
+    def report(self, response):
+        if self.on_shadow_result is not None:
+            self.on_shadow_result(response)
+        else:
+            logger.info("(Experiment) shadow var: %s, statuscode: %s, generation_time: %s", response.get("var"),
+                        response.get("statuscode"), response.get("generation_time"))
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _digest(self, text):
+        digest = hashlib.sha256(f"{self.seed}\0{text}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64, int.from_bytes(digest[8:16], "big")
@@ -0,0 +1,199 @@
+import logging
+import queue
+import reprlib
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Logging for the rtk.* loggers. The library only emits: levels, handlers and formatting belong to the host
+# application (`configure` below is an opt-in shortcut for those that have no logging setup of their own).
+# Events are logged with `event()`: nothing is formatted unless a handler is going to emit the record, payloads
+# wrapped in `clip()` are cut down to `max_chars`, and warnings and errors are sampled per event name so an
+# error storm costs a bounded number of writes.
+
+DEFAULT_MAX_CHARS = 500
+
+logging.getLogger("rtk").addHandler(logging.NullHandler())
+
+_settings = {"max_chars": DEFAULT_MAX_CHARS}
+_sampler = None
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class Sampler:
+    """Per event name, lets the first `burst` events of every `window` seconds through and then one in `every`;
+    the next event let through reports how many were dropped as `suppressed`."""
+
+    def __init__(self, burst=10, every=100, window=60.0):
+        self.burst = burst
+        self.every = every
+        self.window = window
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """(emit?, events dropped since the last one emitted)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = [now, 0, 0]
+            elif now - state[0] >= self.window:
+                state[0] = now
+                state[1] = 0
+            state[1] += 1
+            if state[1] <= self.burst or (state[1] - self.burst) % self.every == 0:
+                suppressed = state[2]
+                state[2] = 0
+                return True, suppressed
+            state[2] += 1
+            return False, 0
+
+
+class Clipped:
+    """A payload rendered to at most `limit` characters, and only when a record is actually formatted."""
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        value = self.value
+        if not isinstance(value, str):
+            # bounded repr: a huge object is never rendered in full just to be cut
+            value = _repr.repr(value) if isinstance(value, (dict, list, tuple, set)) else str(value)
+        if self.limit is None or len(value) <= self.limit:
+            return value
+        return f"{value[:self.limit]}... [{len(value) - self.limit} more chars]"
+
+    __repr__ = __str__
+
+
+class Lazy:
+    """A field computed only for events that are emitted (after level checks and sampling)."""
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+
+_repr = reprlib.Repr()
+_repr.maxlevel = 3
+_repr.maxdict = _repr.maxlist = _repr.maxtuple = _repr.maxset = 10
+_repr.maxstring = _repr.maxother = 200
+
+
+def clip(value, limit=None):
+    return Clipped(value, _settings["max_chars"] if limit is None else limit)
+
+
+def lazy(fn):
+    return Lazy(fn)
+
+
+def event(logger, level, name, msg, /, **fields):
+    """Logs event `name` with `msg` formatted from `fields` (`%(field)s` placeholders) when the record is
+    emitted; the fields also travel on the record as `record.fields` for structured handlers."""
+    if not logger.isEnabledFor(level):
+        return
+    if level >= logging.WARNING and _sampler is not None:
+        emit, suppressed = _sampler.allow((logger.name, name))
+        if not emit:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed
+            msg += " [%(suppressed)d similar events suppressed]"
+    for key, value in fields.items():
+        if type(value) is Lazy:
+            fields[key] = value.fn()
+    extra = {"event": name, "fields": fields}
+    if fields:
+        logger.log(level, msg, fields, extra=extra, stacklevel=2)
+    else:
+        logger.log(level, msg, extra=extra, stacklevel=2)
+
+
+def configure_sampling(burst=10, every=100, window=60.0, max_chars=DEFAULT_MAX_CHARS):
+    """Sets how warnings and errors are sampled (`burst=None`: not at all) and how far `clip()` cuts payloads
+    (`max_chars=None`: not at all)."""
+    global _sampler
+    _sampler = Sampler(burst, every, window) if burst is not None else None
+    _settings["max_chars"] = max_chars
+
+
+configure_sampling()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Handlers
+# ----------------------------------------------------------------------------------------------------------------------
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, event, message and the event's fields."""
+
+    def format(self, record):
+        from rtk.result import encode
+        entry = {"time": record.created, "level": record.levelname, "logger": record.name,
+                 "event": getattr(record, "event", None), "message": record.getMessage()}
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update((key, value if isinstance(value, _SCALARS) else str(value)) for key, value in fields.items())
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return encode(entry).decode("utf-8")
+
+
+class _Listener(QueueListener):
+
+    def enqueue_sentinel(self):
+        # waits for room: the queue may be full of records when the handler is closed
+        self.queue.put(self._sentinel)
+
+
+class BackgroundHandler(QueueHandler):
+    """Hands records to `handlers` on a background thread so that writes never block the parse path.
+
+    The message (bounded by clipping) is formatted on the calling thread, so payloads are not read after the
+    call returns; when `maxsize` records are already waiting, new ones are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, *handlers, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self._listener = _Listener(self.queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {key: value if isinstance(value, _SCALARS) else str(value) for key, value in fields.items()}
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        super().close()
+
+
+def configure(level=logging.INFO, handler=None, structured=False, background=False, logger_name="rtk"):
+    """Attaches `handler` (default: stderr) to the rtk loggers at `level`, for applications without logging
+    setup of their own. Returns the handler attached; closing a background handler stops its thread."""
+    handler = handler or logging.StreamHandler()
+    if structured:
+        handler.setFormatter(StructuredFormatter())
+    elif handler.formatter is None:
+        handler.setFormatter(logging.Formatter("%(asctime)s: %(levelname)s: %(message)s"))
+    if background:
+        handler = BackgroundHandler(handler)
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    return handler
@@ -0,0 +1,207 @@
+import bisect
+import threading
+import time
+
+# Per-stage instrumentation. Parsers always keep a handful of perf_counter readings per call (they are also
+# returned under response["timings"]); nothing is aggregated or exported unless a sink is configured.
+STAGES = ("perturb", "preprocess", "dedup", "preextract", "admission", "request", "ttfb", "deserialize", "serialize",
+          "validate", "statuscode")
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+RATIO_BUCKETS = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+HELP = {
+    "rtk_stage_seconds": ("histogram", "Time spent per parse stage."),
+    "rtk_parse_seconds": ("histogram", "End-to-end generation time per parse."),
+    "rtk_parse_chars": ("histogram", "Input characters per parse."),
+    "rtk_parse_tokens": ("histogram", "Prompt plus completion tokens per parse."),
+    "rtk_parses_total": ("counter", "Parses by validity."),
+    "rtk_responses_total": ("counter", "OpenAI responses by HTTP status."),
+    "rtk_chars_total": ("counter", "Input characters parsed."),
+    "rtk_prompt_tokens_total": ("counter", "Prompt tokens billed."),
+    "rtk_cached_tokens_total": ("counter", "Prompt tokens served from the provider's prompt cache."),
+    "rtk_prompt_cache_hit_ratio": ("histogram", "Share of each call's prompt tokens served from the prompt cache."),
+    "rtk_completion_tokens_total": ("counter", "Completion tokens billed."),
+    "rtk_prefill_tokens_saved_total": ("counter", "Completion tokens saved by extracting contact details locally."),
+    "rtk_model_answers_total": ("counter", "Parses by the model (and cascade tier) that answered."),
+    "rtk_escalations_total": ("counter", "Answers the model cascade rejected, by model and reason."),
+    "rtk_repaired_sections_total": ("counter", "Sections re-extracted to repair an answer that failed validation."),
+    "rtk_near_duplicates_total": ("counter", "Parses answered from a stored near-duplicate."),
+    "rtk_admission_wait_seconds": ("histogram", "Time requests waited for rate-limit admission."),
+    "rtk_admission_queue_depth": ("gauge", "Requests waiting for rate-limit admission."),
+}
+
+FIRST_BYTE = "rtk_first_byte"
+
+_metrics = None
+
+
+class PrometheusSink:
+    """Aggregates counters, gauges and histograms in memory and renders them in the Prometheus text exposition
+    format; serve `render()` from whatever HTTP endpoint the host application already has."""
+
+    def __init__(self, buckets=None):
+        self.buckets = {"rtk_parse_chars": SIZE_BUCKETS, "rtk_parse_tokens": SIZE_BUCKETS,
+                        "rtk_prompt_cache_hit_ratio": RATIO_BUCKETS}
+        self.buckets.update(buckets or {})
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value, labels):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, labels):
+        with self._lock:
+            self._gauges[(name, labels)] = value
+
+    def observe(self, name, value, labels):
+        key = (name, labels)
+        bounds = self.buckets.get(name, TIME_BUCKETS)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # per-bucket counts, then sum and count
+                histogram = self._histograms[key] = [0] * (len(bounds) + 1) + [0.0, 0]
+            histogram[bisect.bisect_left(bounds, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, list(value)) for key, value in self._histograms.items())
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            self._header(lines, seen, name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), value in gauges:
+            self._header(lines, seen, name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), histogram in histograms:
+            self._header(lines, seen, name, "histogram")
+            bounds = self.buckets.get(name, TIME_BUCKETS)
+            cumulative = 0
+            for bound, count in zip(list(bounds) + ["+Inf"], histogram):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, seen, name, kind):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, text = HELP.get(name, (kind, name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+class CallbackSink:
+    """Forwards every measurement to `callback(kind, name, value, labels)`, with kind "counter", "gauge" or
+    "histogram" and labels a dict."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def inc(self, name, value, labels):
+        self.callback("counter", name, value, dict(labels))
+
+    def set(self, name, value, labels):
+        self.callback("gauge", name, value, dict(labels))
+
+    def observe(self, name, value, labels):
+        self.callback("histogram", name, value, dict(labels))
+
+
+class Metrics:
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def inc(self, name, value=1, **labels):
+        labels = tuple(sorted(labels.items()))
+        for sink in self.sinks:
+            sink.inc(name, value, labels)
+
+    def set(self, name, value, **labels):
+        labels = tuple(sorted(labels.items()))
+        for sink in self.sinks:
+            sink.set(name, value, labels)
+
+    def observe(self, name, value, **labels):
+        labels = tuple(sorted(labels.items()))
+        for sink in self.sinks:
+            sink.observe(name, value, labels)
+
+    def record_stages(self, timings, parser):
+        for stage, seconds in timings.items():
+            self.observe("rtk_stage_seconds", seconds, parser=parser, stage=stage)
+
+    def record_parse(self, response, statuses):
+        parser = response["parser"]
+        self.record_stages(response["timings"], parser)
+        self.observe("rtk_parse_seconds", response["generation_time"], parser=parser)
+        self.observe("rtk_parse_chars", response["num_chars"], parser=parser)
+        self.observe("rtk_parse_tokens", response["num_tokens"], parser=parser)
+        self.inc("rtk_parses_total", parser=parser, valid=str(bool(response["is_valid_jsonresume"])).lower())
+        self.inc("rtk_chars_total", response["num_chars"], parser=parser)
+        self.inc("rtk_prompt_tokens_total", response["prompt_tokens"], parser=parser)
+        self.inc("rtk_cached_tokens_total", response["cached_tokens"], parser=parser)
+        if response["prompt_cache_hit_rate"] is not None:
+            self.observe("rtk_prompt_cache_hit_ratio", response["prompt_cache_hit_rate"], parser=parser)
+        self.inc("rtk_completion_tokens_total", response["num_tokens"] - response["prompt_tokens"], parser=parser)
+        if response.get("prefill_tokens_saved"):
+            self.inc("rtk_prefill_tokens_saved_total", response["prefill_tokens_saved"], parser=parser)
+        if response.get("tier") is not None:
+            self.inc("rtk_model_answers_total", parser=parser, model=response["model"], tier=str(response["tier"]))
+            for escalation in response["escalations"]:
+                self.inc("rtk_escalations_total", parser=parser, model=escalation["model"], reason=escalation["reason"])
+        for section in response.get("repaired") or ():
+            self.inc("rtk_repaired_sections_total", parser=parser, section=section)
+        if response.get("near_duplicate"):
+            patched = "true" if response["near_duplicate"]["patched"] else "false"
+            self.inc("rtk_near_duplicates_total", parser=parser, patched=patched)
+        for status in statuses:
+            self.inc("rtk_responses_total", parser=parser, status=str(status))
+
+
+def configure(*sinks):
+    """Installs the process-wide sinks; with none, instrumentation export is switched off again."""
+    global _metrics
+    _metrics = Metrics(*sinks) if sinks else None
+    return _metrics
+
+
+def get_metrics():
+    return _metrics
+
+
+def stamp_first_byte(response):
+    # httpx response hook: runs once the status line and headers are in, before the body is read
+    response.extensions[FIRST_BYTE] = time.perf_counter()
+
+
+async def astamp_first_byte(response):
+    response.extensions[FIRST_BYTE] = time.perf_counter()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
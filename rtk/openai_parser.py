@@ -1,148 +1,542 @@
-import importlib.metadata
-import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
 from typing import Optional
+import copy
+import hashlib
+import json
 import logging
 import os
 import time
 
-from openai import OpenAI
+from rtk.backends import OpenAIBackend
+from rtk.log import clip, event, lazy
+from rtk.metrics import get_metrics
+from rtk.result import ParseResult
 
-from rtk.resume_dataclass import Resume, ResumeSerializer
-from rtk.validation import Validation
+# openai, pydantic (rtk.resume_dataclass) and jsonschema (rtk.validation) are imported on first use, which
+# keeps `import rtk` cheap for cold starts
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-# create file handler that logs debug and higher level messages
-sh = logging.StreamHandler()
-sh.setLevel(logging.DEBUG)
-formatter = logging.Formatter("%(asctime)s: %(levelname)s: %(message)s")
-sh.setFormatter(formatter)
-logger.addHandler(sh)
+
+
+_SECTION_FAILED = object()
+
+
+# The request path (cache, near-duplicate patch, cascade, section split, pre-extraction, repair) is written once,
+# as generator "flows" that yield the I/O they need rather than doing it: a _Request for one structured-output
+# request, answered with the completion (or its exception thrown back in), and a _Gather for sub-flows to run
+# concurrently, answered with their results in order. OAiParser._run drives a flow on threads and
+# AsyncOAiParser._run on the event loop, so the two only differ in how requests are sent.
+class _Request:
+    __slots__ = ("call", "messages", "response_format")
+
+    def __init__(self, call, messages, response_format):
+        self.call = call
+        self.messages = messages
+        self.response_format = response_format
+
+
+class _Gather:
+    __slots__ = ("flows",)
+
+    def __init__(self, flows):
+        self.flows = list(flows)
+
+
+class _OpenStream:
+    # a streamed answer being read, and what settling it takes; the retry policy's deadline (time.monotonic())
+    # bounds reading it too
+    __slots__ = ("stream", "limiter", "tokens", "t_request", "t_sent", "deadline")
+
+    def __init__(self, stream, limiter, tokens, t_request, t_sent, deadline):
+        self.stream = stream
+        self.limiter = limiter
+        self.tokens = tokens
+        self.t_request = t_request
+        self.t_sent = t_sent
+        self.deadline = deadline
+
+    def check_deadline(self):
+        if time.monotonic() > self.deadline:
+            from rtk.retry import DeadlineExceeded
+            raise DeadlineExceeded("deadline exceeded while streaming")
+
+
+class _Stream(_Request):
+    # a _Request whose answer parse_stream streams when the backend can; `prefill` holds the Basics fields read
+    # locally rather than generated
+    __slots__ = ("prefill",)
+
+    def __init__(self, call, messages, response_format, prefill):
+        super().__init__(call, messages, response_format)
+        self.prefill = prefill
+
+
+class ParseCall:
+    # per-call state threaded through the request path, so one parser instance can serve concurrent calls
+    __slots__ = ("estimated_prompt_tokens", "cache_tier", "from_resume", "attempts", "hedged", "error", "timings",
+                 "statuses", "variant", "cached_tokens", "near_duplicate", "model", "tier", "escalations",
+                 "prefilled", "prefill_tokens_saved", "repaired", "priority", "backend")
+
+    def __init__(self, priority="interactive", backend=None):
+        self.estimated_prompt_tokens = None
+        self.cache_tier = None
+        self.from_resume = False
+        self.attempts = 0
+        self.hedged = False
+        self.error = None
+        self.timings = {}
+        self.statuses = []
+        self.variant = ""
+        self.cached_tokens = 0
+        self.near_duplicate = None
+        # a backend with a model of its own answers with it; otherwise the parser's model (or cascade) is used
+        self.model = getattr(backend, "model", None)
+        self.tier = None
+        self.escalations = []
+        self.prefilled = []
+        self.prefill_tokens_saved = 0
+        self.repaired = []
+        self.priority = priority
+        self.backend = backend
+
+    def add_timing(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def merge(self, other):
+        self.attempts += other.attempts
+        self.cached_tokens += other.cached_tokens
+        self.hedged = self.hedged or other.hedged
+        self.error = self.error or other.error
+        for stage, seconds in other.timings.items():
+            self.add_timing(stage, seconds)
+        self.statuses.extend(other.statuses)
+
+
+def _candidate_name(resume):
+    try:
+        return resume["basics"]["name"]
+    except (KeyError, TypeError):
+        return ""
+
+
+@lru_cache(maxsize=1)
+def package_version():
+    import importlib.metadata
+    try:
+        return importlib.metadata.version("rtk")
+    except importlib.metadata.PackageNotFoundError:
+        return "0.0.0"
+
+
+def cached_prompt_tokens(usage):
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
 
 
 class OAiParser:
     OPENAI_PARSER_NAME = "openai"
     OPENAI_FAIL_NAME = "openai-error"
+    SYSTEM_PROMPT = "Extract the resume information."
+    # the system message, schema and few-shot examples form a byte-identical prefix ahead of the resume text,
+    # which is what the provider's prompt cache matches on
+    SCHEMA_GUIDANCE = ("Copy names, titles and dates as written and never invent details. Use null for details "
+                       "the resume does not give and an empty list for sections it does not have. Write dates as "
+                       "YYYY-MM-DD, YYYY-MM or YYYY.")
+    DEFAULT_WORKERS = 8
+    # section-split extraction only pays off for long texts with at least two headed sections
+    SPLIT_MIN_CHARS = 6000
+    SPLIT_MIN_SECTIONS = 2
+    SECTION_WORKERS = 16
+    # a near-duplicate with more changed sections than this is extracted from scratch
+    PATCH_MAX_SECTIONS = 3
+    # an answer failing validation in more sections than this is not worth repairing section by section
+    REPAIR_MAX_SECTIONS = 4
 
-    def __init__(self, openai_key, config: Optional[dict]):
+    def __init__(self, openai_key=None, config: Optional[dict] = None, cache=None, shared_client=True, base_url=None,
+                 split_sections=False, compact=True, max_prompt_tokens=None, retry_policy=None, metrics=None,
+                 few_shot_examples=None, prompt_cache_key=None, dedup=None, cascade=None, pre_extract=False,
+                 repair=True, rate_limiter=None, backend=None, backends=None):
         self.config = config
+        self.backends = {"openai": OpenAIBackend(), **(backends or {})}
+        if backend is not None and not isinstance(backend, str):
+            self.backends.setdefault(backend.name, backend)
+        self.backend = self._resolve_backend("openai" if backend is None else backend)
+        self.rate_limiter = rate_limiter
+        self.repair = repair
+        self.pre_extract = pre_extract
+        self.dedup = dedup
+        self.few_shot_examples = list(few_shot_examples or [])
+        self.prompt_cache_key = prompt_cache_key
+        self._prefix = None
+        self.retry_policy = retry_policy
+        self.metrics = metrics
+        self.split_sections = split_sections
+        self.compact = compact
+        self.max_prompt_tokens = max_prompt_tokens
+        self.cache = cache
+        self.shared_client = shared_client
+        self.base_url = base_url
         if config:
-            flags = {(f["name"]): {"enabled": f["enabled"], "environment": f.get("environment", None) } for f in config["flags"]}
+            flags = {(f["name"]): {**f, "enabled": f["enabled"], "environment": f.get("environment", None) } for f in config["flags"]}
         else:
             flags = {}
-        logger.debug(f"flags: {flags}")
+        logger.debug("flags: %s", flags)
         experiment = flags.get("experiment", {})
-        logger.debug(f"experiment: {experiment}")
-        current_env = config.get("current_env", "")
-        logger.debug(f"current_env: {current_env}")
+        logger.debug("experiment: %s", experiment)
+        current_env = (config or {}).get("current_env", "")
+        logger.debug("current_env: %s", current_env)
         if not experiment:
             self.test = False
         else:
             enabled = experiment.get("enabled", False)
             environment = experiment.get("environment", None)
-            logger.debug(f"experiment enabled: {enabled}, environment: {environment}   current env: {current_env}")
+            logger.debug("experiment enabled: %s, environment: %s   current env: %s", enabled, environment,
+                         current_env)
             if enabled and environment == current_env:
                 self.test = True
             else:
                 self.test = False
+        self.experiment = None
+        if self.test:
+            from rtk.experiment import Experiment
+            self.experiment = Experiment.from_flag(experiment)
 
-        logger.info(f"(OAiParser) config.test: {self.test}")
-        self.validate = Validation()
+        logger.info("(OAiParser) config.test: %s", self.test)
+        self._validate = None
         self.model = "gpt-4o-2024-08-06"
+        self.cascade = cascade
+        cascade_flag = flags.get("cascade", {})
+        if cascade is None and cascade_flag.get("enabled", False) and cascade_flag.get("environment") == current_env:
+            from rtk.routing import ModelCascade
+            self.cascade = ModelCascade.from_flag(cascade_flag)
+        logger.info("(OAiParser) model cascade: %s", self.cascade.models if self.cascade else None)
         openai_key = openai_key if openai_key else os.environ.get("OPENAI_API_KEY", None)
         self.openai_is_available = True
         if not openai_key:
-            logger.error("(OAiParser) OpenAI API key is not defined as an environment variable")
+            if self.backend.requires_key:
+                logger.error("(OAiParser) OpenAI API key is not defined as an environment variable")
             self.openai_is_available = False
-        self.client = OpenAI(api_key=openai_key)
-        self.serializer = ResumeSerializer()
-        self.var = ""
-        self.version_string = importlib.metadata.version("rtk")
+        self._openai_key = openai_key
+        self._client = None
+        self._serializer = None
+        self.version_string = package_version()
+        self._executor = None
+        self._executor_workers = 0
+        self._retired_executors = []
+        self._section_executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is not None:
+            return self._client
+        if self.shared_client:
+            return self._get_shared_client(self._openai_key)
+        self._client = self._make_client(self._openai_key)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def validate(self):
+        if self._validate is None:
+            from rtk.validation import Validation
+            self._validate = Validation()
+        return self._validate
+
+    @property
+    def serializer(self):
+        if self._serializer is None:
+            from rtk.resume_dataclass import ResumeSerializer
+            self._serializer = ResumeSerializer()
+        return self._serializer
+
+    def parse(self, text, priority="interactive", backend=None):
+        return self._parse(text, ParseCall(priority, self._resolve_backend(backend)))
 
-    def parse(self, text):
-        valid_key = self._validate_key()
+    def _parse(self, text, call):
+        valid_key = self._validate_key(call)
         if not valid_key:
-            return {"parser": self.OPENAI_FAIL_NAME,
-                    "is_valid_json": False,
-                    "is_valid_jsonresume": False,
-                    "jsonresume": {}}
-        head = text[:100].replace("\n", " ")
-        logger.info(f"(OAiParser) Calling OpenAI parser for text: {head}...")
-        resume, prompt_tokens, completion_tokens, generation_time = self._query_openai(text)
+            return self._key_error_response()
+        self._log_request(text)
+        prompt_text = self._prepare_text(text, call)
+        resume, prompt_tokens, completion_tokens, generation_time = self._query_openai(prompt_text, call)
+        return self._build_response(text, resume, prompt_tokens, completion_tokens, generation_time, call)
+
+    def parse_standalone(self, text, priority="interactive", backend=None):
+        call = ParseCall(priority, self._resolve_backend(backend))
+        text = self._perturb_text(text, call)
+        response = self._parse(text, call)
+        return self._finalize_standalone(response, call)
+
+    def parse_stream(self, text, priority="interactive", backend=None):
+        # yields {"event": "section", ...} for each top-level section as soon as its JSON closes, then a single
+        # {"event": "result", "response": ...} carrying the same response as parse() plus time_to_first_section
+        from rtk.streaming import SectionStream
+        call = ParseCall(priority, self._resolve_backend(backend))
+        valid_key = self._validate_key(call)
+        if not valid_key:
+            yield self._result_event(self._key_error_response())
+            return
+        self._log_request(text)
+        sections = SectionStream(self.serializer, self.pre_extract, time.time())
+        flow = self._query_flow(self._prepare_text(text, call), call, stream=True)
+        answer = error = None
+        while True:
+            try:
+                step = flow.send(answer) if error is None else flow.throw(error)
+            except StopIteration as stop:
+                resume, prompt_tokens, completion_tokens, generation_time = stop.value
+                break
+            try:
+                if isinstance(step, _Stream) and self._call_backend(step.call).streams:
+                    opened = self._open_stream(step, sections)
+                    with opened.stream as stream:
+                        for chunk in stream:
+                            yield from sections.feed(chunk)
+                            opened.check_deadline()
+                    answer, error = self._finish_stream(step, sections, opened), None
+                else:
+                    answer, error = self._perform(step), None
+            except Exception as e:
+                answer, error = None, e
+        yield from sections.replay(resume)
+        response = self._build_response(text, resume, prompt_tokens, completion_tokens, generation_time, call)
+        response["time_to_first_section"] = sections.time_to_first_section
+        yield self._result_event(response)
+
+    def parse_batch(self, texts, workers=DEFAULT_WORKERS, standalone=False, priority="batch", backend=None):
+        texts = list(texts)
+        results = [None] * len(texts)
+        for i, response in self.iter_parse(texts, workers=workers, standalone=standalone, priority=priority,
+                                           backend=backend):
+            results[i] = response
+        return results
+
+    def iter_parse(self, texts, workers=DEFAULT_WORKERS, standalone=False, priority="batch", backend=None):
+        # yields (index, response) pairs as calls complete; at most `workers` inputs are pulled from
+        # `texts` ahead of the results, so arbitrarily long generators can be streamed through
+        parse = self.parse_standalone if standalone else self.parse
+        backend = self._resolve_backend(backend)
+        executor = self._get_executor(workers)
+        items = enumerate(texts)
+        pending = {}
+        for i, text in items:
+            pending[executor.submit(parse, text, priority, backend)] = i
+            if len(pending) >= workers:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for j, text in items:
+                    pending[executor.submit(parse, text, priority, backend)] = j
+                    break
+                yield pending.pop(future), future.result()
+
+    def close(self):
+        with self._executor_lock:
+            for executor in self._retired_executors + [self._executor, self._section_executor]:
+                if executor is not None:
+                    executor.shutdown(wait=True)
+            self._executor = None
+            self._section_executor = None
+            self._executor_workers = 0
+            self._retired_executors = []
+        if self.experiment is not None:
+            self.experiment.close()
+
+    def _get_executor(self, workers):
+        # one pool per parser, shared by every batch; the OpenAI client underneath is thread-safe
+        with self._executor_lock:
+            if self._executor is None or self._executor_workers < workers:
+                if self._executor is not None:
+                    # batches still iterating keep submitting to the old pool until they finish
+                    self._retired_executors.append(self._executor)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rtk-parse")
+                self._executor_workers = workers
+            return self._executor
+
+    def _get_section_executor(self):
+        # kept apart from the batch pool: batch workers block on their section calls, so sharing one pool
+        # could starve it
+        with self._executor_lock:
+            if self._section_executor is None:
+                self._section_executor = ThreadPoolExecutor(max_workers=self.SECTION_WORKERS,
+                                                            thread_name_prefix="rtk-section")
+            return self._section_executor
+
+    def _make_client(self, openai_key):
+        from openai import OpenAI
+        return OpenAI(api_key=openai_key, base_url=self.base_url)
+
+    def _get_shared_client(self, openai_key):
+        from rtk.clients import get_client
+        return get_client(openai_key, self.base_url)
+
+    def _key_error_response(self):
+        return ParseResult(parser=self.OPENAI_FAIL_NAME,
+                           is_valid_json=False,
+                           is_valid_jsonresume=False,
+                           jsonresume={})
+
+    def _log_request(self, text):
+        event(logger, logging.INFO, "parse.start", "(OAiParser) Calling OpenAI parser for text: %(head)s...",
+              head=lazy(lambda: text[:100].replace("\n", " ")), num_chars=len(text))
+
+    def _prepare_text(self, text, call):
+        # local pre-request stage: compaction and the prompt token budget, with the resulting prompt size
+        # estimated before paying for the call
+        from rtk.resume_dataclass import Resume
+        from rtk.tokens import count_message_tokens, count_tokens, schema_tokens, truncate_to_tokens
+        t1 = time.perf_counter()
+        num_chars = len(text)
+        if self.compact:
+            from rtk.preprocess import compact_text
+            text = compact_text(text)
+        overhead = count_message_tokens(self._messages(""), self.model) + schema_tokens(Resume, self.model)
+        if self.max_prompt_tokens:
+            text = truncate_to_tokens(text, max(self.max_prompt_tokens - overhead, 0), self.model)
+        call.estimated_prompt_tokens = overhead + count_tokens(text, self.model)
+        call.add_timing("preprocess", time.perf_counter() - t1)
+        event(logger, logging.DEBUG, "parse.prepared",
+              "(OAiParser) Prepared text: %(num_chars)s -> %(prepared_chars)s chars, "
+              "estimated_prompt_tokens: %(estimated_prompt_tokens)s",
+              num_chars=num_chars, prepared_chars=len(text), estimated_prompt_tokens=call.estimated_prompt_tokens)
+        return text
+
+    def _build_response(self, text, resume, prompt_tokens, completion_tokens, generation_time, call):
         num_tokens = prompt_tokens + completion_tokens
         num_chars = len(text)
-        # logger.debug("Validating returned object...")
-        valid_json, valid_json_resume = self.validate.validate_json_w_pydantic(resume)
-        try:
-            name = resume["basics"]["name"]
-        except:
-            name = ""
-        logger.info(
-            f"name: `{name}`,  parser: {self.OPENAI_PARSER_NAME}, valid_json: {valid_json}, valid_jsonresume: {valid_json_resume}, num_chars: {num_chars}, num_tokens: {num_tokens}, generation_time: {generation_time} ")
-
-        return {
-            "parser": self.OPENAI_PARSER_NAME,
-            "is_valid_json": valid_json,
-            "is_valid_jsonresume": valid_json_resume,
-            "generation_time": generation_time,
-            "num_chars": num_chars,
-            "num_tokens": num_tokens,
-            "jsonresume": resume,
-            "sop": f"{self.version_string}{self.var}"
-        }
-
-    def parse_standalone(self, text):
-        text, var = self._perturb_text(text)
-        response = self.parse(text)
+        t1 = time.perf_counter()
+        valid_json, valid_json_resume = self.validate.validate_json_w_pydantic(resume, from_resume=call.from_resume)
+        call.add_timing("validate", time.perf_counter() - t1)
+        event(logger, logging.INFO, "parse.done",
+              "name: `%(name)s`,  parser: %(parser)s, valid_json: %(valid_json)s, valid_jsonresume: "
+              "%(valid_jsonresume)s, num_chars: %(num_chars)s, num_tokens: %(num_tokens)s, generation_time: "
+              "%(generation_time)s, cache: %(cache)s, attempts: %(attempts)s, hedged: %(hedged)s, error: %(error)s",
+              name=lazy(lambda: _candidate_name(resume)), parser=self.OPENAI_PARSER_NAME, valid_json=valid_json,
+              valid_jsonresume=valid_json_resume, num_chars=num_chars, num_tokens=num_tokens,
+              generation_time=generation_time, cache=call.cache_tier, attempts=call.attempts, hedged=call.hedged,
+              error=call.error)
+
+        response = ParseResult(
+            parser=self.OPENAI_PARSER_NAME,
+            is_valid_json=valid_json,
+            is_valid_jsonresume=valid_json_resume,
+            generation_time=generation_time,
+            num_chars=num_chars,
+            num_tokens=num_tokens,
+            prompt_tokens=prompt_tokens,
+            estimated_prompt_tokens=call.estimated_prompt_tokens,
+            cached_tokens=call.cached_tokens,
+            prompt_cache_hit_rate=call.cached_tokens / prompt_tokens if prompt_tokens else None,
+            jsonresume=resume,
+            sop=f"{self.version_string}.{call.variant}" if call.variant else self.version_string,
+            cache=call.cache_tier,
+            near_duplicate=call.near_duplicate,
+            model=call.model or self.model,
+            backend=self._call_backend(call).name,
+            tier=call.tier,
+            escalations=call.escalations,
+            prefilled=call.prefilled,
+            prefill_tokens_saved=call.prefill_tokens_saved,
+            repaired=call.repaired,
+            attempts=call.attempts,
+            hedged=call.hedged,
+            error=call.error,
+            timings=call.timings,
+        )
+        metrics = self.metrics or get_metrics()
+        if metrics is not None:
+            metrics.record_parse(response, call.statuses)
+        return response
+
+    def _finalize_standalone(self, response, call):
+        t1 = time.perf_counter()
         response, statuscode = self.validate.compute_statuscode(response)
         response["statuscode"] = statuscode
-        response["var"] = var
+        response["var"] = call.variant
+        timings = {"statuscode": time.perf_counter() - t1}
+        if "timings" in response:
+            response["timings"].update(timings)
+            metrics = self.metrics or get_metrics()
+            if metrics is not None:
+                metrics.record_stages(timings, response["parser"])
         return response
 
-    def _perturb_text(self, text):
-        var = ""
-        if self.test:
-            time.sleep(3)
-            if random.random() < 0.3:
-                offsets = [2000, 3000, 4000]
-                offset = random.choice(offsets)
-                var = f"p1-{offset}"
-                text = text[:offset]
-            elif random.random() < 0.3:
-                var = "p2"
-                lines = text.split("\n")
-                num_lines = len(lines)
-                offset = min(20, int(num_lines / 4))
-                var = f"p2-{offset}"
-                start = lines[:offset]
-                end = lines[offset:]
-                random.shuffle(end)
-                new_items = start + end
-                text = "\n".join(new_items)
-            elif random.random() < 0.3:
-                var = "p3"
-                text = text[300:].replace("\n", " ")
-            else:
-                var = "n"
-            logger.debug(f"(OAiParser) perturbation: {var}")
-        self.var = f".{var}" if var else ""
-        return text, var
+    def _perturb_text(self, text, call):
+        # the variant is derived from the text, so concurrent calls never share or overwrite it
+        if self.experiment is None:
+            return text
+        t1 = time.perf_counter()
+        variant = self.experiment.assign(text)
+        if self.experiment.shadow:
+            # callers get the unperturbed parse, the perturbed variant runs in the background
+            call.variant = "n"
+            if variant != "n":
+                self.experiment.submit_shadow(self._parse_shadow, text, variant)
+        else:
+            text, call.variant = self.experiment.perturb(text, variant)
+        call.add_timing("perturb", time.perf_counter() - t1)
+        logger.debug("(OAiParser) perturbation: %s", call.variant)
+        return text
 
+    def _parse_shadow(self, text, variant):
+        try:
+            call = ParseCall("batch", self.backend)
+            text, call.variant = self.experiment.perturb(text, variant)
+            self.experiment.report(self._finalize_standalone(self._parse(text, call), call))
+        except Exception as e:
+            event(logger, logging.ERROR, "shadow.failed", "(OAiParser) Shadow parse failed: %(error)s",
+                  error_type=type(e).__name__, error=clip(e))
 
-    def _validate_key(self):
+    def _resolve_backend(self, backend):
+        """The backend for `backend`: a Backend, the name of one in `backends`, or None for the parser's own."""
+        if backend is None:
+            return self.backend
+        if isinstance(backend, str):
+            try:
+                return self.backends[backend]
+            except KeyError:
+                raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(self.backends)}") from None
+        return backend
+
+    def _call_backend(self, call):
+        return self.backend if call.backend is None else call.backend
+
+    def _validate_key(self, call):
+        if not self._call_backend(call).requires_key:
+            return True
         if self.openai_is_available == False:
-            logger.error("(OAiParser) OpenAI Key is not defined")
+            event(logger, logging.ERROR, "parse.no_key", "(OAiParser) OpenAI Key is not defined")
             return False
         return True
 
-    def _query_openai(self, text):
+    def _query_openai(self, text, call):
+        return self._run(self._query_flow(text, call))
+
+    def _query_flow(self, text, call, stream=False):
         t1 = time.time()
         try:
-            resume_obj, prompt_tokens, completion_tokens = self._get_completion(text)
-            logger.debug("(OAiParser) Serializing response...")
-            resume = self.serializer.to_json_resume(resume_obj)
+            resume_obj = self._cache_lookup(text, call)
+            if resume_obj is not None:
+                prompt_tokens = completion_tokens = 0
+            else:
+                resume_obj, prompt_tokens, completion_tokens = yield from self._patched_flow(text, call)
+                if resume_obj is None:
+                    resume_obj, prompt_tokens, completion_tokens = yield from self._routed_flow(text, call, stream)
+                self._cache_store(text, resume_obj, prompt_tokens + completion_tokens, call)
+                self._dedup_store(text, resume_obj, call)
+            resume = self._serialize(resume_obj, call)
+            call.from_resume = self._is_resume(resume_obj)
         except Exception as e:
-            logger.error(f"(OAiParser) Error encountered while parsing OpenAI response: {e}")
+            event(logger, logging.ERROR, "parse.failed",
+                  "(OAiParser) Error encountered while parsing OpenAI response: %(error)s",
+                  error_type=type(e).__name__, error=clip(e))
             resume = {}
             prompt_tokens = 0
             completion_tokens = 0
@@ -150,22 +544,552 @@ class OAiParser:
         generation_time = t2 - t1
         return resume, prompt_tokens, completion_tokens, generation_time
 
-    def _get_completion(self, text):
+    def _serialize(self, resume_obj, call):
+        t1 = time.perf_counter()
+        # with pre_extract the profiles come from the text itself, so they are worth returning
+        resume = self.serializer.to_json_resume(resume_obj, profiles=self.pre_extract)
+        call.add_timing("serialize", time.perf_counter() - t1)
+        return resume
+
+    def _is_resume(self, obj):
+        from rtk.resume_dataclass import Resume
+        return isinstance(obj, Resume)
+
+    def _cache_lookup(self, text, call):
+        if self.cache is None:
+            return None
+        # one key per cascade tier, but one miss per parse
+        for tier, model in self._lookup_tiers(text, call):
+            resume_obj, call.cache_tier = self.cache.get(self._cache_key(text, model), count_miss=False)
+            if call.cache_tier:
+                call.tier, call.model = tier, model
+                event(logger, logging.DEBUG, "cache.hit", "(OAiParser) %(tier)s cache hit", tier=call.cache_tier)
+                return resume_obj
+        self.cache.miss()
+        return None
+
+    def _cache_store(self, text, resume_obj, num_tokens, call):
+        if self.cache is not None and resume_obj is not None:
+            self.cache.set(self._cache_key(text, call.model), resume_obj, num_tokens)
+
+    def _cache_key(self, text, model):
+        from rtk.cache import make_cache_key
+        return make_cache_key(text, model or self.model, self.prompt_prefix_fingerprint, self.version_string)
+
+    def _lookup_tiers(self, text, call):
+        """The (tier, model) pairs a stored answer for `text` may have come from, in the order they are tried.
+
+        Answers are stored under the model that gave them, a cheaper tier's apart from the parser's own, so with a
+        cascade every tier the text would be routed through is looked up.
+        """
+        if self.cascade is None or call.model is not None:
+            return [(call.tier, call.model)]
+        return self._cascade_tiers(text)
+
+    def _dedup_namespace(self, model):
+        from rtk.schema import schema_fingerprint
+        return f"{model or self.model}:{self.prompt_prefix_fingerprint}:{schema_fingerprint()}:{self.version_string}"
+
+    def _plan_patch(self, text, call):
+        """Looks up a parsed near-duplicate of `text`; returns (match, {field: span}) for the sections that differ,
+        span None for a section the text no longer has, or None when the text has to be extracted in full."""
+        if self.dedup is None:
+            return None
+        from rtk.cache import normalize_text
+        from rtk.sections import BASICS, split_sections
+        t1 = time.perf_counter()
         try:
-            completion = self.client.beta.chat.completions.parse(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Extract the resume information."},
-                    {"role": "user", "content": text},
-                ],
-                response_format=Resume,
-            )
-
-            resume_obj = completion.choices[0].message.parsed
-            prompt_tokens = completion.usage.prompt_tokens
-            completion_tokens = completion.usage.completion_tokens
-            logger.info(f"(OAiParser) OpenAI-Usage => prompt_tokens: {prompt_tokens}  completion_tokens: {completion_tokens}")
-            return resume_obj, prompt_tokens, completion_tokens
+            for tier, model in self._lookup_tiers(text, call):
+                match = self.dedup.query(text, namespace=self._dedup_namespace(model))
+                if match is not None:
+                    break
         except Exception as e:
-            logger.error(f"(OAiParser) StructuredOutputs Exception: {e}")
+            event(logger, logging.WARNING, "dedup.lookup_failed", "(OAiParser) Near-duplicate lookup failed: %(error)s",
+                  error_type=type(e).__name__, error=clip(e))
+            return None
+        finally:
+            call.add_timing("dedup", time.perf_counter() - t1)
+        if match is None:
+            return None
+        old, new = split_sections(match.text), split_sections(text)
+        spans = {field: new.get(field) for field in old.keys() | new.keys()
+                 if normalize_text(old.get(field, "")) != normalize_text(new.get(field, ""))}
+        if spans and (len(spans) > self.PATCH_MAX_SECTIONS or not new.keys() - {BASICS}):
+            # without headings every edit lands in the one span, so there is nothing smaller to re-extract
+            event(logger, logging.DEBUG, "dedup.too_different",
+                  "(OAiParser) Near-duplicate %(id)s differs in %(sections)s, extracting in full",
+                  id=match.id, sections=lazy(lambda: sorted(spans)))
+            return None
+        if BASICS in spans and spans[BASICS] is None:
+            # no preamble any more: contact details may sit anywhere
+            spans[BASICS] = text
+        # the changed sections are re-extracted by the model the match was parsed with
+        call.tier, call.model = tier, model
+        return match, spans
+
+    def _patch_resume(self, match, spans, results, call):
+        update = {field: [] for field, span in spans.items() if span is None}
+        prompt_tokens = completion_tokens = 0
+        for field, (value, p_tokens, c_tokens, section_call) in results.items():
+            call.merge(section_call)
+            update[field] = value
+            prompt_tokens += p_tokens
+            completion_tokens += c_tokens
+        if any(value is _SECTION_FAILED for value in update.values()):
+            event(logger, logging.WARNING, "dedup.patch_failed",
+                  "(OAiParser) Near-duplicate patch failed, extracting in full")
+            call.error = None
+            return None, 0, 0
+        event(logger, logging.INFO, "dedup.hit",
+              "(OAiParser) Near-duplicate %(id)s (similarity %(similarity).3f), re-extracted: %(sections)s",
+              id=match.id, similarity=match.similarity, sections=lazy(lambda: sorted(spans)))
+        call.near_duplicate = {"id": match.id, "similarity": match.similarity, "patched": sorted(spans)}
+        return match.resume.model_copy(update=update), prompt_tokens, completion_tokens
+
+    def _patched_flow(self, text, call):
+        routing = call.tier, call.model
+        plan = self._plan_patch(text, call)
+        if plan is None:
             return None, 0, 0
+        match, spans = plan
+        results = yield from self._sections_flow({field: span for field, span in spans.items() if span is not None},
+                                                 call)
+        patched = self._patch_resume(match, spans, results, call)
+        if patched[0] is None:
+            # extracted in full, routed afresh
+            call.tier, call.model = routing
+        return patched
+
+    def _dedup_store(self, text, resume_obj, call):
+        # an unchanged duplicate is already in the index
+        if self.dedup is None or resume_obj is None or (call.near_duplicate and not call.near_duplicate["patched"]):
+            return
+        try:
+            self.dedup.add(text, resume_obj, namespace=self._dedup_namespace(call.model))
+        except Exception as e:
+            event(logger, logging.WARNING, "dedup.store_failed",
+                  "(OAiParser) Could not index parse for near-duplicate lookups: %(error)s",
+                  error_type=type(e).__name__, error=clip(e))
+
+    def _result_event(self, response):
+        from rtk.streaming import RESULT_EVENT
+        return {"event": RESULT_EVENT, "response": response}
+
+    @property
+    def prompt_prefix_fingerprint(self):
+        return self._prefix_messages()[1]
+
+    def _prefix_messages(self):
+        # built once per parser so every request starts with exactly the same bytes
+        if self._prefix is None:
+            messages = [{"role": "system", "content": f"{self.SYSTEM_PROMPT} {self.SCHEMA_GUIDANCE}"}]
+            for text, resume in self.few_shot_examples:
+                if not isinstance(resume, (str, dict)):
+                    resume = resume.model_dump(mode="json")
+                if isinstance(resume, dict):
+                    resume = json.dumps(resume, ensure_ascii=False, separators=(",", ":"))
+                messages += [{"role": "user", "content": text}, {"role": "assistant", "content": resume}]
+            fingerprint = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+            self._prefix = (messages, fingerprint)
+        return self._prefix
+
+    def _cache_params(self):
+        key = self.prompt_cache_key
+        if key is None:
+            # Azure and other OpenAI-compatible gateways reject request fields they do not know
+            key = self._is_openai_api()
+        if key is False:
+            return {}
+        return {"prompt_cache_key": f"rtk-{self.prompt_prefix_fingerprint[:16]}" if key is True else key}
+
+    def _is_openai_api(self):
+        from urllib.parse import urlparse
+        base_url = self.base_url or os.environ.get("OPENAI_BASE_URL")
+        return base_url is None or urlparse(str(base_url)).hostname == "api.openai.com"
+
+    def _messages(self, text):
+        return self._prefix_messages()[0] + [{"role": "user", "content": text}]
+
+    def _read_completion(self, completion):
+        resume_obj = completion.choices[0].message.parsed
+        prompt_tokens = completion.usage.prompt_tokens
+        completion_tokens = completion.usage.completion_tokens
+        event(logger, logging.INFO, "usage",
+              "(OAiParser) OpenAI-Usage => prompt_tokens: %(prompt_tokens)s  completion_tokens: %(completion_tokens)s",
+              prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return resume_obj, prompt_tokens, completion_tokens
+
+    def _plan_sections(self, text):
+        if not self.split_sections or len(text) < self.SPLIT_MIN_CHARS:
+            return None
+        from rtk.sections import BASICS, split_sections
+        sections = split_sections(text)
+        if len(sections.keys() - {BASICS}) < self.SPLIT_MIN_SECTIONS:
+            return None
+        if BASICS not in sections:
+            # no preamble: contact details may sit anywhere, so basics are read from the whole text
+            sections[BASICS] = text
+        event(logger, logging.DEBUG, "sections.split", "(OAiParser) Section-split extraction: %(sections)s",
+              sections=lazy(lambda: list(sections)))
+        return sections
+
+    def _section_messages(self, field, span):
+        return [
+            {"role": "system",
+             "content": f"{self.SYSTEM_PROMPT} {self.SCHEMA_GUIDANCE} Only extract the `{field}` section."},
+            {"role": "user", "content": span},
+        ]
+
+    def _merge_section_results(self, results, call):
+        from rtk.sections import merge_sections
+        parts = {}
+        prompt_tokens = completion_tokens = 0
+        for field, (value, p_tokens, c_tokens, section_call) in results.items():
+            call.merge(section_call)
+        for field, (value, p_tokens, c_tokens, section_call) in results.items():
+            if value is _SECTION_FAILED:
+                return None, 0, 0
+            parts[field] = value
+            prompt_tokens += p_tokens
+            completion_tokens += c_tokens
+        event(logger, logging.INFO, "usage",
+              "(OAiParser) OpenAI-Usage (sections) => prompt_tokens: %(prompt_tokens)s  "
+              "completion_tokens: %(completion_tokens)s",
+              prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, sections=len(parts))
+        return merge_sections(parts), prompt_tokens, completion_tokens
+
+    def _get_completion(self, text, call):
+        return self._run(self._completion_flow(text, call))
+
+    def _completion_flow(self, text, call, stream=False):
+        sections = self._plan_sections(text)
+        if sections:
+            results = yield from self._sections_flow(sections, call)
+            resume_obj, prompt_tokens, completion_tokens = self._merge_section_results(results, call)
+            if resume_obj is not None:
+                return resume_obj, prompt_tokens, completion_tokens
+            event(logger, logging.WARNING, "sections.failed",
+                  "(OAiParser) Section-split extraction failed, falling back to a single call")
+            call.error = None
+        return (yield from self._single_flow(text, call, stream))
+
+    def _routed_flow(self, text, call, stream=False):
+        # a backend with a model of its own is not routed; with a cascade nothing is streamed, as the answer of a
+        # tier may yet be rejected
+        if self.cascade is None or call.model is not None:
+            return (yield from self._completion_flow(text, call, stream))
+        tiers = self._cascade_tiers(text)
+        prompt_tokens = completion_tokens = 0
+        for i, (call.tier, call.model) in enumerate(tiers):
+            resume_obj, p_tokens, c_tokens = yield from self._completion_flow(text, call)
+            prompt_tokens += p_tokens
+            completion_tokens += c_tokens
+            reason = self._cascade_reject_reason(resume_obj)
+            if reason is None or i == len(tiers) - 1:
+                break
+            event(logger, logging.INFO, "cascade.escalate", "(OAiParser) Escalating from %(model)s: %(reason)s",
+                  model=call.model, reason=reason)
+            call.escalations.append({"model": call.model, "reason": reason})
+            call.error = None
+        return resume_obj, prompt_tokens, completion_tokens
+
+    def _cascade_tiers(self, text):
+        from rtk.tokens import count_tokens
+        return self.cascade.tiers(text, count_tokens(text, self.model))
+
+    def _cascade_reject_reason(self, resume_obj):
+        # a Resume that came through structured outputs is what _build_response reports as a valid JSON Resume
+        return self.cascade.reject_reason(resume_obj, self._is_resume(resume_obj))
+
+    def _sections_flow(self, spans, call):
+        """Extracts every {field: span} of `spans` concurrently; {field: (value, prompt_tokens, completion_tokens,
+        section_call)}, value _SECTION_FAILED for a section whose request failed."""
+        fields = list(spans)
+        results = yield _Gather(self._section_flow(field, spans[field], call) for field in fields)
+        return dict(zip(fields, results))
+
+    def _section_flow(self, field, span, parent):
+        from rtk.sections import section_model
+        call = ParseCall(parent.priority, parent.backend)
+        call.model = parent.model
+        try:
+            completion = yield _Request(call, self._section_messages(field, span), section_model(field))
+            parsed = completion.choices[0].message.parsed
+            return getattr(parsed, field), completion.usage.prompt_tokens, completion.usage.completion_tokens, call
+        except Exception as e:
+            event(logger, logging.ERROR, "section.failed",
+                  "(OAiParser) StructuredOutputs Exception for section `%(section)s`: %(error)s",
+                  section=field, error_type=type(e).__name__, error=clip(e))
+            call.error = type(e).__name__
+            return _SECTION_FAILED, 0, 0, call
+
+    def _prefill(self, text, call):
+        """Contact details read locally, and the response format for the rest of the resume."""
+        from rtk.resume_dataclass import Resume
+        if not self.pre_extract:
+            return {}, Resume
+        from rtk import preextract
+        from rtk.tokens import count_tokens
+        t1 = time.perf_counter()
+        prefill = preextract.pre_extract(text)
+        call.prefilled = sorted(prefill)
+        if prefill:
+            # what the model would have generated for these fields
+            generated = {k: [p.model_dump() for p in v] if k == "profiles" else v for k, v in prefill.items()}
+            call.prefill_tokens_saved = count_tokens(json.dumps(generated, ensure_ascii=False), self.model)
+        call.add_timing("preextract", time.perf_counter() - t1)
+        return prefill, preextract.reduced_model(frozenset(prefill)) if prefill else Resume
+
+    def _read_prefilled_completion(self, completion, prefill):
+        resume_obj, prompt_tokens, completion_tokens = self._read_completion(completion)
+        if prefill and resume_obj is not None:
+            from rtk.preextract import merge_prefill
+            resume_obj = merge_prefill(resume_obj, prefill)
+        return resume_obj, prompt_tokens, completion_tokens
+
+    def _plan_repair(self, text, error, prefill, call):
+        """The invalid answer as a dict and the spans of its failing sections, or None when it can not be
+        repaired section by section."""
+        if not self.repair:
+            return None
+        from rtk.sections import split_sections
+        try:
+            data = json.loads(error.content)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        if prefill and isinstance(data.get("basics"), dict):
+            data["basics"].update({k: [p.model_dump() for p in v] if k == "profiles" else v
+                                   for k, v in prefill.items()})
+        failing = self.validate.failing_sections(data)
+        if not failing or len(failing) > self.REPAIR_MAX_SECTIONS:
+            return None
+        event(logger, logging.INFO, "repair.start", "(OAiParser) Repairing sections %(sections)s: %(errors)s",
+              sections=sorted(failing), errors=lazy(lambda: clip("; ".join(e[0] for e in failing.values()))))
+        sections = split_sections(text)
+        usage = error.completion.usage
+        return data, {field: sections.get(field, text) for field in failing}, usage
+
+    def _apply_repair(self, data, usage, results, call):
+        from pydantic import ValidationError
+
+        from rtk.resume_dataclass import Resume
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        for field, (value, p_tokens, c_tokens, section_call) in results.items():
+            call.merge(section_call)
+            prompt_tokens += p_tokens
+            completion_tokens += c_tokens
+            data[field] = value
+        if any(value is _SECTION_FAILED for value, *_ in results.values()):
+            event(logger, logging.WARNING, "repair.failed", "(OAiParser) Section repair failed")
+            return None, 0, 0
+        try:
+            resume_obj = Resume.model_validate(data)
+        except ValidationError as e:
+            event(logger, logging.WARNING, "repair.invalid",
+                  "(OAiParser) Repaired answer still does not validate: %(errors)s errors", errors=e.error_count())
+            return None, 0, 0
+        call.repaired = sorted(results)
+        call.error = None
+        return resume_obj, prompt_tokens, completion_tokens
+
+    def _single_flow(self, text, call, stream=False):
+        from rtk.schema import InvalidCompletion
+        prefill, response_format = self._prefill(text, call)
+        messages = self._messages(text)
+        try:
+            completion = yield (_Stream(call, messages, response_format, prefill) if stream
+                                else _Request(call, messages, response_format))
+            return self._read_prefilled_completion(completion, prefill)
+        except InvalidCompletion as e:
+            event(logger, logging.ERROR, "completion.invalid",
+                  "(OAiParser) StructuredOutputs Exception: %(errors)s validation errors", errors=e.error.error_count())
+            call.error = type(e).__name__
+            plan = self._plan_repair(text, e, prefill, call)
+            if plan is None:
+                return None, 0, 0
+            data, spans, usage = plan
+            results = yield from self._sections_flow(spans, call)
+            return self._apply_repair(data, usage, results, call)
+        except Exception as e:
+            event(logger, logging.ERROR, "completion.failed", "(OAiParser) StructuredOutputs Exception: %(error)s",
+                  error_type=type(e).__name__, error=clip(e))
+            call.error = type(e).__name__
+            return None, 0, 0
+
+    def _run(self, flow):
+        """Drives `flow` to its result: requests are sent from this thread, gathered sub-flows run on the section
+        executor."""
+        answer = error = None
+        while True:
+            try:
+                step = flow.send(answer) if error is None else flow.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                answer, error = self._perform(step), None
+            except Exception as e:
+                answer, error = None, e
+
+    def _perform(self, step):
+        if isinstance(step, _Request):
+            return self._request(step.call, step.messages, step.response_format)
+        executor = self._get_section_executor()
+        futures = [executor.submit(self._run, sub) for sub in step.flows]
+        return [future.result() for future in futures]
+
+    def _request(self, call, messages, response_format):
+        backend = self._call_backend(call)
+        if isinstance(backend, OpenAIBackend):
+            # admission, retries and their timings are accounted for in _request_openai
+            return self._request_openai(call, messages, response_format)
+        attempts = call.attempts
+        t1 = time.perf_counter()
+        try:
+            return backend.complete(self, call, messages, response_format)
+        finally:
+            # a backend that went on to _request_openai (a recording ReplayBackend) has accounted for it already
+            if call.attempts == attempts:
+                call.attempts += 1
+                call.add_timing("request", time.perf_counter() - t1)
+
+    def _request_openai(self, call, messages, response_format):
+        from rtk.retry import call_with_retries
+        client, model, limiter, tokens, request = self._openai_request(call, messages, response_format)
+
+        def send(timeout):
+            if limiter is not None:
+                # every attempt, retries and hedges included, is admitted against the rate limits
+                waited = limiter.acquire(model, tokens, call.priority, timeout)
+                call.add_timing("admission", waited)
+                timeout -= waited
+            t1 = time.perf_counter()
+            try:
+                raw = client.chat.completions.with_raw_response.create(timeout=timeout, **request)
+            except Exception as e:
+                self._request_failed(call, limiter, model, e)
+                raise
+            self._update_limits(limiter, model, raw)
+            return raw, t1
+
+        t1 = time.perf_counter()
+        raw, t_sent = call_with_retries(send, self.retry_policy, call, model)
+        call.add_timing("request", time.perf_counter() - t1)
+        return self._read_openai_response(raw, t_sent, call, response_format, limiter, tokens)
+
+    def _openai_request(self, call, messages, response_format):
+        """The client, model, rate limiter, token budget and create() arguments of one structured-output request."""
+        # retries, backoff and hedging are owned by retry_policy, so the SDK's own retries are turned off
+        from rtk.retry import RetryPolicy
+        from rtk.schema import response_format as prepare_response_format
+        if self.retry_policy is None:
+            self.retry_policy = RetryPolicy()
+        model = call.model or self.model
+        limiter, tokens = self._admission(call, messages, response_format, model)
+        # the prepared payload goes through extra_body, so the SDK neither rebuilds the strict schema nor walks it
+        # through its request transform on every call
+        request = {"model": model, "messages": messages,
+                   "extra_body": {"response_format": prepare_response_format(response_format), **self._cache_params()}}
+        return self.client.with_options(max_retries=0), model, limiter, tokens, request
+
+    def _open_stream(self, step, sections):
+        from rtk.retry import call_with_retries
+        call = step.call
+        client, model, limiter, tokens, request = self._openai_request(call, step.messages, step.response_format)
+        policy = self._stream_policy()
+
+        def send(timeout):
+            if limiter is not None:
+                waited = limiter.acquire(model, tokens, call.priority, timeout)
+                call.add_timing("admission", waited)
+                timeout -= waited
+            t1 = time.perf_counter()
+            try:
+                stream = client.chat.completions.create(stream=True, stream_options={"include_usage": True},
+                                                        timeout=timeout, **request)
+            except Exception as e:
+                self._request_failed(call, limiter, model, e)
+                raise
+            self._update_limits(limiter, model, stream)
+            return stream, t1
+
+        t1 = time.perf_counter()
+        deadline = time.monotonic() + policy.deadline
+        stream, t_sent = call_with_retries(send, policy, call, model)
+        sections.start(step.prefill)
+        return _OpenStream(stream, limiter, tokens, t1, t_sent, deadline)
+
+    def _stream_policy(self):
+        # only opening the stream is retried, once sections have gone out the answer can not be asked for again;
+        # nor is it hedged, as a hedged stream would have to be read to the end as well
+        policy = self.retry_policy
+        if policy.hedge:
+            policy = copy.copy(policy)
+            policy.hedge = False
+        return policy
+
+    def _finish_stream(self, step, sections, opened):
+        from rtk.schema import parse_completion
+        call = step.call
+        call.add_timing("request", time.perf_counter() - opened.t_request)
+        if sections.first_chunk is not None:
+            call.add_timing("ttfb", sections.first_chunk - opened.t_sent)
+        call.statuses.append(opened.stream.response.status_code)
+        completion = sections.completion()
+        call.cached_tokens += cached_prompt_tokens(completion.usage)
+        self._settle(opened.limiter, call.model or self.model, opened.tokens, completion)
+        t1 = time.perf_counter()
+        try:
+            return parse_completion(completion, step.response_format)
+        finally:
+            call.add_timing("deserialize", time.perf_counter() - t1)
+
+    def _request_failed(self, call, limiter, model, error):
+        call.statuses.append(getattr(error, "status_code", None) or type(error).__name__)
+        self._update_limits(limiter, model, error)
+
+    def _read_openai_response(self, raw, t_sent, call, response_format, limiter, tokens):
+        completion = self._read_raw_response(raw, t_sent, call, response_format)
+        self._settle(limiter, call.model or self.model, tokens, completion)
+        return completion
+
+    def _admission(self, call, messages, response_format, model):
+        """The rate limiter requests go through (if any), and the tokens one request is budgeted."""
+        from rtk.ratelimit import get_limiter
+        limiter = self.rate_limiter or get_limiter()
+        if limiter is None:
+            return None, 0
+        prompt_tokens = call.estimated_prompt_tokens
+        if prompt_tokens is None:
+            from rtk.tokens import count_message_tokens, schema_tokens
+            prompt_tokens = count_message_tokens(messages, model) + schema_tokens(response_format, model)
+        return limiter, limiter.estimate(prompt_tokens)
+
+    @staticmethod
+    def _update_limits(limiter, model, response):
+        # a raw response, or an APIStatusError carrying the 429 (or other) response
+        if limiter is None:
+            return
+        headers = getattr(response, "headers", None)
+        if headers is None:
+            headers = getattr(getattr(response, "response", None), "headers", None)
+        limiter.update(model, headers)
+
+    @staticmethod
+    def _settle(limiter, model, tokens, completion):
+        if limiter is not None and completion.usage is not None:
+            limiter.settle(model, tokens, completion.usage.prompt_tokens + completion.usage.completion_tokens)
+
+    def _read_raw_response(self, raw, t_sent, call, response_format):
+        from rtk.metrics import FIRST_BYTE
+        from rtk.schema import parse_completion
+        call.statuses.append(raw.status_code)
+        first_byte = raw.http_response.extensions.get(FIRST_BYTE)
+        if first_byte is not None:
+            call.add_timing("ttfb", first_byte - t_sent)
+        t1 = time.perf_counter()
+        completion = parse_completion(raw.parse(), response_format)
+        call.add_timing("deserialize", time.perf_counter() - t1)
+        call.cached_tokens += cached_prompt_tokens(completion.usage)
+        return completion
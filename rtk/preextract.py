@@ -0,0 +1,132 @@
+import re
+from functools import lru_cache
+
+from rtk.sections import BASICS, split_sections
+
+# Contact details follow rigid patterns, so they are read from the resume head with regular expressions and
+# left out of the schema the model answers in; the model then no longer spends completion tokens copying them.
+# Only what is found locally is omitted, anything else is still extracted by the model.
+
+PREFILL_FIELDS = ("email", "phone", "url", "profiles")
+# without section headings, the head of the text stands in for the preamble
+HEAD_CHARS = 1500
+
+NETWORKS = {
+    "linkedin.com": "LinkedIn",
+    "github.com": "GitHub",
+    "gitlab.com": "GitLab",
+    "bitbucket.org": "Bitbucket",
+    "twitter.com": "Twitter",
+    "x.com": "X",
+    "stackoverflow.com": "Stack Overflow",
+    "kaggle.com": "Kaggle",
+    "medium.com": "Medium",
+    "behance.net": "Behance",
+    "dribbble.com": "Dribbble",
+}
+
+EMAIL_RE = re.compile(r"(?<![\w.+-])[\w.+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+URL_RE = re.compile(r"(?<![@\w.])(?:https?://|www\.|(?:[\w-]+\.)*(?:"
+                    + "|".join(re.escape(domain) for domain in NETWORKS) + r")/)[^\s|,;<>\"'()\[\]]+",
+                    re.IGNORECASE)
+PHONE_RE = re.compile(r"(?<![\w+/.-])\+?\(?\d[\d ().-]{5,18}\d(?![\w/.-])")
+# a bare digit run may be an ID, a street number or a postcode: a phone needs a label before it, a leading +,
+# an area code in parentheses or the 3-3-4 grouping of North American numbers
+PHONE_LABEL_RE = re.compile(r"(?<![A-Za-z])(?:phone|tel(?:ephone)?|mobile|mob|cell|ph|[tm])\.?\s*"
+                            r"(?:no\.?|number|#)?\s*[:.]?\s*$", re.IGNORECASE)
+_PHONE_FORMAT_RE = re.compile(r"^\+|\(\d{1,5}\)|^\d{3}[-. ]\d{3}[-. ]\d{4}$")
+_DATE_LIKE_RE = re.compile(r"\b(?:19|20)\d{2}\s*[-/.]\s*(?:(?:19|20)\d{2}|0?[1-9]|1[0-2])\b")
+_DOMAIN_RE = re.compile(r"^(?:https?://)?(?:www\.)?([^/?#]+)", re.IGNORECASE)
+_TRAILING = ".,:;!?"
+
+
+def head_of(text):
+    sections = split_sections(text)
+    if len(sections) > 1 and BASICS in sections:
+        return sections[BASICS]
+    return text[:HEAD_CHARS]
+
+
+def find_email(head):
+    m = EMAIL_RE.search(head)
+    return m.group(0) if m else None
+
+
+def find_phone(head):
+    for m in PHONE_RE.finditer(head):
+        candidate = m.group(0).strip()
+        digits = sum(c.isdigit() for c in candidate)
+        if not 7 <= digits <= 15 or _DATE_LIKE_RE.search(candidate):
+            continue
+        if _PHONE_FORMAT_RE.search(candidate) or PHONE_LABEL_RE.search(head[max(m.start() - 20, 0):m.start()]):
+            return candidate
+    return None
+
+
+def find_urls(head):
+    return [m.group(0).rstrip(_TRAILING) for m in URL_RE.finditer(head)]
+
+
+def network_of(url):
+    m = _DOMAIN_RE.match(url)
+    domain = m.group(1).lower() if m else ""
+    for known, network in NETWORKS.items():
+        if domain == known or domain.endswith("." + known):
+            return network
+    return None
+
+
+def username_of(url, network):
+    path = [part for part in _DOMAIN_RE.sub("", url).split("?")[0].split("/") if part]
+    if network == "LinkedIn" and len(path) > 1 and path[0].lower() in ("in", "pub"):
+        return path[1]
+    return path[0].lstrip("@") if path else None
+
+
+def pre_extract(text):
+    """{Basics field: value} of the contact details found in the resume head; fields not found are absent."""
+    from rtk.resume_dataclass import Profile
+    head = head_of(text)
+    found = {}
+    email = find_email(head)
+    if email:
+        found["email"] = email
+    phone = find_phone(EMAIL_RE.sub(" ", URL_RE.sub(" ", head)))
+    if phone:
+        found["phone"] = phone
+    profiles = []
+    for url in find_urls(head):
+        network = network_of(url)
+        if network is not None:
+            if all(p.url != url for p in profiles):
+                profiles.append(Profile(url=url, username=username_of(url, network), network=network))
+        elif "url" not in found:
+            found["url"] = url
+    if profiles:
+        found["profiles"] = profiles
+    return found
+
+
+@lru_cache(maxsize=None)
+def reduced_model(omit):
+    """Structured-output Resume without the Basics fields in `omit` (a frozenset of PREFILL_FIELDS)."""
+    from typing import Optional
+
+    from pydantic import ConfigDict, create_model
+
+    from rtk.resume_dataclass import Basics, Resume
+    config = ConfigDict(strict=True)
+    basics = create_model("Basics", __config__=config,
+                          **{name: (f.annotation, f) for name, f in Basics.model_fields.items() if name not in omit})
+    fields = {name: (f.annotation, f) for name, f in Resume.model_fields.items()}
+    fields["basics"] = (Optional[basics], ...)
+    return create_model("Resume", __config__=config, **fields)
+
+
+def merge_prefill(resume_obj, prefill):
+    """Resume from an answer in `reduced_model(frozenset(prefill))` and the locally extracted fields."""
+    from rtk.resume_dataclass import Basics, Resume
+    fields = dict(resume_obj)
+    if resume_obj.basics is not None:
+        fields["basics"] = Basics(**dict(resume_obj.basics), **prefill)
+    return Resume(**fields)
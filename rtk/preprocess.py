@@ -0,0 +1,70 @@
+import re
+from collections import Counter
+
+# noise typical of text extracted from PDF/DOCX resumes; only explicit page markers ("Page 2", "Page 2 of 3",
+# "Page 2/3", "- 2 -") count, as a bare "2" or "05/2019" is as likely to be content
+_PAGE_MARKER_RE = re.compile(r"^\s*(?:page\s+\d+(?:\s*(?:of|/)\s*\d+)?|-\s*\d{1,3}\s*-)\s*$", re.IGNORECASE)
+_SEPARATOR_RE = re.compile(r"^\s*([-=_*•·~.#|])(?:\s*\1){2,}\s*$")
+_SPACES_RE = re.compile(r"[ \t\u00a0\u2000-\u200b\u3000]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# short lines found within this many lines of a page break on this many pages are page headers/footers (name,
+# email, "Curriculum Vitae", ...); the same line elsewhere on a page is content (a job title, a city)
+REPEATED_LINE_MIN_COUNT = 2
+REPEATED_LINE_MAX_CHARS = 80
+PAGE_EDGE_LINES = 2
+
+
+def _split_pages(text):
+    """Lines of each page, pages ending at form feeds and at page markers (which are dropped)."""
+    pages = []
+    for chunk in text.split("\f"):
+        page = []
+        for line in chunk.split("\n"):
+            line = _SPACES_RE.sub(" ", line).strip()
+            if _PAGE_MARKER_RE.match(line):
+                pages.append(page)
+                page = []
+            else:
+                page.append(line)
+        pages.append(page)
+    return pages
+
+
+def _page_edges(page):
+    """Indexes of the first and last PAGE_EDGE_LINES non-empty lines of `page`."""
+    filled = [i for i, line in enumerate(page) if line]
+    return set(filled[:PAGE_EDGE_LINES] + filled[-PAGE_EDGE_LINES:])
+
+
+def compact_text(text):
+    """Shrink extracted resume text without losing content.
+
+    Collapses whitespace runs and blank lines, drops separator rules and page markers, removes consecutive
+    duplicate lines and the repeats of short lines that open or close several pages (headers and footers),
+    keeping the first occurrence.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    pages = [page for page in _split_pages(text) if any(page)]
+    edges = [_page_edges(page) if len(pages) > 1 else set() for page in pages]
+    counts = Counter()
+    for page, page_edges in zip(pages, edges):
+        counts.update({page[i] for i in page_edges if len(page[i]) <= REPEATED_LINE_MAX_CHARS})
+    repeated = {line for line, n in counts.items() if n >= REPEATED_LINE_MIN_COUNT}
+
+    kept = []
+    seen_repeated = set()
+    previous = None
+    for page, page_edges in zip(pages, edges):
+        for i, line in enumerate(page):
+            if line:
+                if _SEPARATOR_RE.match(line) or line == previous:
+                    continue
+                if line in repeated:
+                    if line in seen_repeated and i in page_edges:
+                        continue
+                    seen_repeated.add(line)
+            kept.append(line)
+            previous = line
+        kept.append("")
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(kept)).strip()
@@ -0,0 +1,370 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from rtk.metrics import get_metrics
+from rtk.retry import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Client-side admission against the provider's requests-per-minute and tokens-per-minute limits. Every request
+# (retries and hedges included) takes one request and its estimated tokens out of two token buckets per model
+# before it is sent, so bursts queue here instead of coming back as waves of 429s. Interactive calls are
+# admitted ahead of batch ones.
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+REQUESTS = "requests"
+TOKENS = "tokens"
+# budgeted per request on top of the prompt until the usage of the answer is known
+DEFAULT_COMPLETION_TOKENS = 1500
+
+_limiter = None
+
+
+class AdmissionTimeout(DeadlineExceeded):
+    pass
+
+
+class TokenBucket:
+    """`capacity` units that refill evenly over `period` seconds; the level may go negative when an answer
+    turns out to cost more than was budgeted for it."""
+
+    def __init__(self, capacity, now, period=60.0, level=None):
+        self.capacity = float(capacity)
+        self.period = period
+        self.level = self.capacity if level is None else level
+        self.updated = now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / self.period)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` fits; a request larger than the whole bucket waits for a full one."""
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * self.period / self.capacity
+
+
+class _MemoryStore:
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def buckets(self):
+        with self._lock:
+            yield self._buckets
+
+
+class _SQLiteStore:
+    """Buckets in a SQLite file shared by the processes on one host; `BEGIN IMMEDIATE` takes the file lock for
+    the read-modify-write of each admission."""
+    clock = staticmethod(time.time)
+
+    def __init__(self, path, timeout=30.0):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, capacity REAL NOT NULL, "
+                           "level REAL NOT NULL, updated REAL NOT NULL)")
+
+    @contextmanager
+    def buckets(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT name, capacity, level, updated FROM buckets").fetchall()
+                buckets = {name: TokenBucket(capacity, updated, level=level)
+                           for name, capacity, level, updated in rows}
+                yield buckets
+                self._conn.executemany("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)",
+                                       [(name, b.capacity, b.level, b.updated) for name, b in buckets.items()])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Ticket:
+    __slots__ = ("key", "loop", "event")
+
+    def __init__(self, key, loop=None):
+        self.key = key
+        self.loop = loop
+        self.event = asyncio.Event() if loop is not None else None
+
+
+class RateLimiter:
+    """Admits requests through a requests-per-minute and a tokens-per-minute bucket per model.
+
+    `rpm` and `tpm` are the starting limits of every model (None: unlimited until the provider reports one);
+    the `x-ratelimit-*` headers of each response then set the bucket sizes and cap their levels at what the
+    provider says is left, which also accounts for other clients of the same organization. Only `headroom`
+    of each reported limit is used. Requests wait in one queue per model, interactive before batch and FIFO
+    within a class. With `path`, the buckets live in a SQLite file and are shared by every process using it
+    (priorities are then honoured within each process only).
+    """
+
+    def __init__(self, rpm=None, tpm=None, path=None, headroom=0.95, completion_tokens=DEFAULT_COMPLETION_TOKENS):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.headroom = headroom
+        self.completion_tokens = completion_tokens
+        self._store = _SQLiteStore(path) if path is not None else _MemoryStore()
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._seq = itertools.count()
+        self._admitted = {p: 0 for p in PRIORITIES}
+        self._wait_seconds = {p: 0.0 for p in PRIORITIES}
+        self._max_wait = {p: 0.0 for p in PRIORITIES}
+        self._timeouts = 0
+
+    def estimate(self, prompt_tokens):
+        """Tokens budgeted for a request with `prompt_tokens` prompt tokens."""
+        return prompt_tokens + self.completion_tokens
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------------------------------------------------------
+    def acquire(self, model, tokens, priority=INTERACTIVE, timeout=None):
+        """Blocks until a request of `tokens` tokens to `model` is admitted; returns the seconds waited."""
+        ticket = self._enqueue(model, priority)
+        t1 = time.monotonic()
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_admit(model, ticket, tokens)
+                    if wait == 0:
+                        break
+                    self._cond.wait(self._bounded(wait, t1, timeout))
+        finally:
+            self._dequeue(model, ticket)
+        return self._record(model, priority, time.monotonic() - t1)
+
+    async def aacquire(self, model, tokens, priority=INTERACTIVE, timeout=None):
+        """asyncio counterpart of acquire. With a SQLite store each admission attempt runs on a worker thread,
+        as taking the file lock can block for as long as another process holds it."""
+        ticket = self._enqueue(model, priority, asyncio.get_running_loop())
+        shared = isinstance(self._store, _SQLiteStore)
+        t1 = time.monotonic()
+        try:
+            while True:
+                if shared:
+                    # cleared first, so a wake-up arriving during the attempt is not lost
+                    ticket.event.clear()
+                    wait = await asyncio.to_thread(self._admit, model, ticket, tokens)
+                else:
+                    with self._cond:
+                        wait = self._try_admit(model, ticket, tokens)
+                        ticket.event.clear()
+                if wait == 0:
+                    break
+                try:
+                    await asyncio.wait_for(ticket.event.wait(), self._bounded(wait, t1, timeout))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._dequeue(model, ticket)
+        return self._record(model, priority, time.monotonic() - t1)
+
+    def settle(self, model, estimated, actual):
+        """Returns the tokens budgeted but not used (or takes the excess) once a response reports its usage."""
+        if estimated == actual:
+            return
+        with self._store.buckets() as buckets:
+            bucket = buckets.get(_name(model, TOKENS))
+            if bucket is not None:
+                bucket.refill(self._store.clock())
+                bucket.level = min(bucket.capacity, bucket.level + estimated - actual)
+        self._wake(model)
+
+    def update(self, model, headers):
+        """Adapts the buckets of `model` to the `x-ratelimit-*` headers of a response (or of a 429)."""
+        if not headers:
+            return
+        changed = False
+        with self._store.buckets() as buckets:
+            now = self._store.clock()
+            for kind in (REQUESTS, TOKENS):
+                limit = _number(headers.get(f"x-ratelimit-limit-{kind}"))
+                remaining = _number(headers.get(f"x-ratelimit-remaining-{kind}"))
+                if limit is None and remaining is None:
+                    continue
+                name = _name(model, kind)
+                bucket = buckets.get(name)
+                if limit is not None and limit > 0:
+                    capacity = limit * self.headroom
+                    if bucket is None:
+                        bucket = buckets[name] = TokenBucket(capacity, now)
+                    elif bucket.capacity != capacity:
+                        bucket.refill(now)
+                        bucket.capacity = capacity
+                        bucket.level = min(bucket.level, capacity)
+                if bucket is not None and remaining is not None:
+                    bucket.refill(now)
+                    # what the provider has already counted, ours and other clients', less the headroom
+                    bucket.level = min(bucket.level, remaining - bucket.capacity * (1 / self.headroom - 1))
+                changed = True
+        if changed:
+            self._wake(model)
+
+    def _admit(self, model, ticket, tokens):
+        with self._cond:
+            return self._try_admit(model, ticket, tokens)
+
+    def _try_admit(self, model, ticket, tokens):
+        # called with self._cond held; 0 when admitted, else seconds to wait (None: until woken)
+        if self._queues[model][0] is not ticket:
+            return None
+        with self._store.buckets() as buckets:
+            now = self._store.clock()
+            costs = ((_name(model, REQUESTS), 1, self.rpm), (_name(model, TOKENS), tokens, self.tpm))
+            taken = []
+            wait = 0.0
+            for name, amount, default in costs:
+                bucket = buckets.get(name)
+                if bucket is None:
+                    if default is None:
+                        continue
+                    bucket = buckets[name] = TokenBucket(default, now)
+                wait = max(wait, bucket.wait_time(amount, now))
+                taken.append((bucket, amount))
+            if wait > 0:
+                return wait
+            for bucket, amount in taken:
+                bucket.level -= amount
+        return 0
+
+    def _bounded(self, wait, t1, timeout):
+        if timeout is None:
+            return wait
+        remaining = t1 + timeout - time.monotonic()
+        if remaining <= 0:
+            with self._cond:
+                self._timeouts += 1
+            raise AdmissionTimeout(f"not admitted within {timeout:.2f}s")
+        return remaining if wait is None else min(wait, remaining)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Queues
+    # ------------------------------------------------------------------------------------------------------------------
+    def _enqueue(self, model, priority, loop=None):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        ticket = _Ticket((PRIORITIES.index(priority), next(self._seq)), loop)
+        with self._cond:
+            queue = self._queues.setdefault(model, [])
+            bisect.insort(queue, ticket, key=lambda t: t.key)
+        self._report_depth()
+        return ticket
+
+    def _dequeue(self, model, ticket):
+        with self._cond:
+            queue = self._queues[model]
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[model]
+        self._wake(model)
+        self._report_depth()
+
+    def _wake(self, model):
+        with self._cond:
+            self._cond.notify_all()
+            queue = self._queues.get(model)
+            head = queue[0] if queue else None
+        if head is not None and head.loop is not None:
+            head.loop.call_soon_threadsafe(head.event.set)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Observability
+    # ------------------------------------------------------------------------------------------------------------------
+    def _record(self, model, priority, waited):
+        with self._cond:
+            self._admitted[priority] += 1
+            self._wait_seconds[priority] += waited
+            self._max_wait[priority] = max(self._max_wait[priority], waited)
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.observe("rtk_admission_wait_seconds", waited, model=model, priority=priority)
+        return waited
+
+    def _report_depth(self):
+        metrics = get_metrics()
+        if metrics is not None:
+            for priority, depth in self.queue_depth().items():
+                metrics.set("rtk_admission_queue_depth", depth, priority=priority)
+
+    def queue_depth(self):
+        """Requests waiting for admission, by priority."""
+        depth = {p: 0 for p in PRIORITIES}
+        with self._cond:
+            for queue in self._queues.values():
+                for ticket in queue:
+                    depth[PRIORITIES[ticket.key[0]]] += 1
+        return depth
+
+    def stats(self):
+        """Queue depth, admissions and wait times by priority, and the current limits and levels per bucket."""
+        depth = self.queue_depth()
+        with self._cond:
+            priorities = {p: {"queued": depth[p], "admitted": self._admitted[p],
+                              "wait_seconds": self._wait_seconds[p], "max_wait_seconds": self._max_wait[p],
+                              "mean_wait_seconds": self._wait_seconds[p] / self._admitted[p] if self._admitted[p]
+                              else 0.0}
+                          for p in PRIORITIES}
+            timeouts = self._timeouts
+        with self._store.buckets() as buckets:
+            now = self._store.clock()
+            limits = {}
+            for name, bucket in buckets.items():
+                bucket.refill(now)
+                limits[name] = {"capacity": bucket.capacity, "level": bucket.level}
+        return {"priorities": priorities, "timeouts": timeouts, "buckets": limits}
+
+    def close(self):
+        if isinstance(self._store, _SQLiteStore):
+            self._store.close()
+
+
+def _name(model, kind):
+    return f"{model}:{kind}"
+
+
+def _number(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def configure(*args, **kwargs):
+    """Installs the process-wide RateLimiter (same arguments); with none, admission is switched off again."""
+    global _limiter
+    if _limiter is not None:
+        _limiter.close()
+    _limiter = RateLimiter(*args, **kwargs) if args or kwargs else None
+    return _limiter
+
+
+def get_limiter():
+    return _limiter
@@ -0,0 +1,36 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ParseResult(dict):
+    """Result of one parse: the dict parsers always returned (`json.dumps(result)`, `isinstance(result, dict)`
+    and every dict method work as before), plus `to_bytes()`, the one JSON encoding of a result on its way to an
+    HTTP response or a JSONL file.
+
+    Keys that were never set are absent, exactly as in the old dicts (a key-error result only has `parser`,
+    `is_valid_json`, `is_valid_jsonresume` and `jsonresume`).
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"ParseResult({dict.__repr__(self)})"
+
+    def to_dict(self, **head):
+        """Plain dict of the result, after the `head` items (e.g. a document id)."""
+        head.update(self)
+        return head
+
+    def to_bytes(self, **head):
+        return encode(self.to_dict(**head) if head else self)
+
+
+def encode(record, newline=False):
+    """UTF-8 JSON of a result dict (or ParseResult); orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(record, default=str, option=orjson.OPT_APPEND_NEWLINE if newline else 0)
+    data = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return data + b"\n" if newline else data
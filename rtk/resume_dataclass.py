@@ -1,8 +1,13 @@
-import copy
+import json
 from typing import Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # ----------------------------------------------------------------------------------------------------------------------
 # Awards
@@ -229,32 +234,49 @@ class Resume(BaseModel):
 # Resume Deserializer
 # ----------------------------------------------------------------------------------------------------------------------
 class ResumeSerializer:
-
-    def to_json_resume(self, resume0):
-        resume = copy.deepcopy(resume0)
-        basics = resume.basics
-        j_basics = basics.__dict__
-        if basics.location:
-            j_basics["location"] = basics.location.__dict__
-        else:
-            j_basics["location"] = Location(city='', address='', region='', countryCode='', postalCode='').__dict__
-        j_basics["profiles"] = []
-
-        j_resume = {
-            "basics": j_basics,
-            "work": [self._dictize(x) for x in resume.work],
-            "education": [self._dictize(x) for x in resume.education],
-            "projects": [self._dictize(x) for x in resume.projects],
-            "volunteer": [self._dictize(x) for x in resume.volunteer],
-            "skills": [self._dictize(x) for x in resume.skills],
-            "publications": [self._dictize(x) for x in resume.publications],
-            "languages": [self._dictize(x) for x in resume.languages],
-            "awards": [self._dictize(x) for x in resume.awards],
-            "certificates": [self._dictize(x) for x in resume.certificates],
-            "references": [self._dictize(x) for x in resume.references],
-            "interests": [self._dictize(x) for x in resume.interests]
-        }
+    SECTIONS = ["work", "education", "projects", "volunteer", "skills", "publications", "languages", "awards",
+                "certificates", "references", "interests"]
+
+    def to_json_resume(self, resume, profiles=False):
+        # walks the model once, building fresh dicts/lists; the Resume itself is never copied or mutated
+        j_resume = {"basics": self._basics(resume.basics, profiles)}
+        for section in self.SECTIONS:
+            j_resume[section] = [self._dictize(x) for x in getattr(resume, section)]
         return j_resume
 
+    def to_json_section(self, section, value, profiles=False):
+        """`value`, the basics or one entry of a list section, as to_json_resume writes it."""
+        if section == "basics":
+            return self._basics(value, profiles)
+        return self._dictize(value)
+
+    def _basics(self, basics, profiles):
+        # profiles are left out (as they always were) unless `profiles`, e.g. when they were read locally
+        j_basics = {k: self._jsonify(v) for k, v in basics.__dict__.items() if k != "profiles"}
+        if basics.location is None:
+            j_basics["location"] = dict.fromkeys(Location.model_fields, "")
+        j_basics["profiles"] = self._jsonify(basics.profiles or []) if profiles else []
+        # keep the key order of the original __dict__ based output
+        j_basics["location"] = j_basics.pop("location")
+        return j_basics
+
+    def to_json_bytes(self, resume):
+        j_resume = self.to_json_resume(resume)
+        if orjson is not None:
+            return orjson.dumps(j_resume)
+        return json.dumps(j_resume, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
     def _dictize(self, obj):
-        return obj.__dict__
+        if obj is None:
+            return None
+        # __dict__ holds exactly the declared fields, in declaration order
+        return {k: self._jsonify(v) for k, v in obj.__dict__.items()}
+
+    def _jsonify(self, value):
+        if value is None or type(value) is str:
+            return value
+        if isinstance(value, list):
+            return [v if type(v) is str else self._jsonify(v) for v in value]
+        if isinstance(value, BaseModel):
+            return self._dictize(value)
+        return value
@@ -0,0 +1,287 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from rtk.log import event
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class RetryPolicy:
+    """How one parse call retries: at most `max_attempts` requests (retries and hedges included) within
+    `deadline` seconds, backing off exponentially with full jitter between retries. With `hedge`, a duplicate
+    request is fired once the first has been outstanding longer than the `hedge_quantile` of recent latencies.
+
+    From synchronous code the deadline is not a hard limit on the total time: what is left of it is handed to
+    httpx as the request timeout, which bounds each network operation (connecting, every read) on its own, so a
+    response that keeps trickling in can outlast it; it is checked again before every retry. The losing request
+    of a synchronous hedge is abandoned, not cancelled, and holds its connection until it completes or times out.
+    asyncio calls are cancelled at the deadline, losing hedges included.
+    """
+
+    def __init__(self, max_attempts=3, deadline=120.0, base_delay=0.5, max_delay=20.0, hedge=False,
+                 hedge_quantile=0.95, hedge_min_samples=20):
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class RetryBudget:
+    """Process-wide cap on retries and hedges: every original request deposits `ratio` of a token, every retry
+    or hedge spends a whole one. Under a provider outage retries stop at about `ratio` extra load instead of
+    multiplying it."""
+
+    def __init__(self, ratio=0.2, initial=10.0, max_balance=100.0):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self.balance = initial
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.balance >= 1.0:
+                self.balance -= 1.0
+                return True
+            self.exhausted += 1
+            return False
+
+
+class LatencyTracker:
+    """Sliding window of successful request latencies, for the hedging threshold."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q, min_samples=1):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+DEFAULT_BUDGET = RetryBudget()
+_trackers = {}
+_trackers_lock = threading.Lock()
+_hedge_executor = None
+
+
+def latency_tracker(model):
+    with _trackers_lock:
+        tracker = _trackers.get(model)
+        if tracker is None:
+            tracker = _trackers[model] = LatencyTracker()
+        return tracker
+
+
+def classify(exc):
+    """Returns (retryable, retry_after seconds or None) for an exception raised by the OpenAI client."""
+    import openai
+    if isinstance(exc, DeadlineExceeded):
+        return False, None
+    if isinstance(exc, openai.APIConnectionError):
+        return True, None
+    if isinstance(exc, openai.APIStatusError):
+        if exc.status_code == 429 and getattr(exc, "code", None) == "insufficient_quota":
+            return False, None
+        if exc.status_code in (408, 409, 429) or exc.status_code >= 500:
+            return True, _retry_after(exc.response.headers)
+    return False, None
+
+
+def _retry_after(headers):
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # a malformed header must not replace the error being retried
+        return None
+    return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def _start_thread(fn, *args):
+    """Runs `fn(*args)` on a thread of its own right away; its outcome as a Future."""
+    future = Future()
+
+    def run():
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    threading.Thread(target=run, name="rtk-request", daemon=True).start()
+    return future
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    with _trackers_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="rtk-hedge")
+        return _hedge_executor
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Execution
+# ----------------------------------------------------------------------------------------------------------------------
+def call_with_retries(send, policy, call, model, budget=DEFAULT_BUDGET):
+    """Runs `send(timeout)` under `policy`; attempts and hedging are recorded on `call`."""
+    tracker = latency_tracker(model)
+    budget.deposit()
+    deadline = time.monotonic() + policy.deadline
+    while True:
+        call.attempts += 1
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"deadline of {policy.deadline}s exceeded")
+        t1 = time.monotonic()
+        try:
+            result = _send_hedged(send, policy, call, tracker, budget, remaining)
+            tracker.record(time.monotonic() - t1)
+            return result
+        except Exception as e:
+            retryable, retry_after = classify(e)
+            delay = policy.backoff(call.attempts, retry_after)
+            if (not retryable or call.attempts >= policy.max_attempts
+                    or time.monotonic() + delay >= deadline or not budget.withdraw()):
+                raise
+            event(logger, logging.WARNING, "retry",
+                  "(retry) %(error_type)s on attempt %(attempt)s, retrying in %(delay).2fs",
+                  error_type=type(e).__name__, attempt=call.attempts, delay=delay)
+            time.sleep(delay)
+
+
+def _send_hedged(send, policy, call, tracker, budget, remaining):
+    hedge_after = tracker.quantile(policy.hedge_quantile, policy.hedge_min_samples) if policy.hedge else None
+    if hedge_after is None or hedge_after >= remaining or call.attempts >= policy.max_attempts:
+        return send(remaining)
+    # the primary request is sent at once on a thread of its own, never queued behind the requests of other
+    # calls, so the hedge delay counts from when it went out; only hedges share the bounded pool. It is not sent
+    # from the calling thread, which has to stay free to return a hedge that answers first.
+    t1 = time.monotonic()
+    futures = [_start_thread(send, remaining)]
+    done, _ = wait(futures, timeout=hedge_after)
+    if not done and budget.withdraw():
+        call.attempts += 1
+        call.hedged = True
+        futures.append(_get_hedge_executor().submit(send, remaining - (time.monotonic() - t1)))
+    error = None
+    while futures:
+        done, _ = wait(futures, timeout=max(0.0, remaining - (time.monotonic() - t1)), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded(f"deadline of {policy.deadline}s exceeded")
+        for future in done:
+            futures.remove(future)
+            if future.exception() is None:
+                # a request already on the wire can not be interrupted from here; it is abandoned and its
+                # own timeout bounds it
+                for other in futures:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def acall_with_retries(send, policy, call, model, budget=DEFAULT_BUDGET):
+    """asyncio counterpart of call_with_retries; `send(timeout)` returns an awaitable and losing hedges are
+    cancelled."""
+    tracker = latency_tracker(model)
+    budget.deposit()
+    deadline = time.monotonic() + policy.deadline
+    while True:
+        call.attempts += 1
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"deadline of {policy.deadline}s exceeded")
+        t1 = time.monotonic()
+        try:
+            result = await _asend_hedged(send, policy, call, tracker, budget, remaining)
+            tracker.record(time.monotonic() - t1)
+            return result
+        except Exception as e:
+            retryable, retry_after = classify(e)
+            delay = policy.backoff(call.attempts, retry_after)
+            if (not retryable or call.attempts >= policy.max_attempts
+                    or time.monotonic() + delay >= deadline or not budget.withdraw()):
+                raise
+            event(logger, logging.WARNING, "retry",
+                  "(retry) %(error_type)s on attempt %(attempt)s, retrying in %(delay).2fs",
+                  error_type=type(e).__name__, attempt=call.attempts, delay=delay)
+            await asyncio.sleep(delay)
+
+
+async def _asend_hedged(send, policy, call, tracker, budget, remaining):
+    hedge_after = tracker.quantile(policy.hedge_quantile, policy.hedge_min_samples) if policy.hedge else None
+    if hedge_after is None or hedge_after >= remaining or call.attempts >= policy.max_attempts:
+        try:
+            return await asyncio.wait_for(send(remaining), remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"deadline of {policy.deadline}s exceeded")
+    t1 = time.monotonic()
+    tasks = [asyncio.ensure_future(send(remaining))]
+    done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+    if not done and budget.withdraw():
+        call.attempts += 1
+        call.hedged = True
+        tasks.append(asyncio.ensure_future(send(remaining - (time.monotonic() - t1))))
+    error = None
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=max(0.0, remaining - (time.monotonic() - t1)),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"deadline of {policy.deadline}s exceeded")
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
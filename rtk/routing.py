@@ -0,0 +1,58 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# cheapest first; the last tier is the model OAiParser used before there was a cascade
+DEFAULT_MODELS = ("gpt-4o-mini", "gpt-4o-2024-08-06")
+
+
+class ModelCascade:
+    """Picks the model tier a parse starts on and decides when an answer needs a bigger model.
+
+    Short texts (within `max_chars`, `max_text_tokens` and `max_sections`) start on the first, cheapest
+    model; anything larger goes straight to the last one. An answer is escalated to the next tier when there
+    is none, it is not a valid JSON Resume, `basics.name` is empty or, with `require_work`, `work` is empty.
+    """
+
+    def __init__(self, models=DEFAULT_MODELS, max_chars=8000, max_text_tokens=2500, max_sections=8,
+                 require_work=True):
+        if not models:
+            raise ValueError("A model cascade needs at least one model")
+        self.models = tuple(models)
+        self.max_chars = max_chars
+        self.max_text_tokens = max_text_tokens
+        self.max_sections = max_sections
+        self.require_work = require_work
+
+    @classmethod
+    def from_flag(cls, flag):
+        params = {k: flag[k] for k in ("models", "max_chars", "max_text_tokens", "max_sections", "require_work")
+                  if k in flag}
+        return cls(**params)
+
+    def first_tier(self, text, text_tokens=None):
+        from rtk.sections import BASICS, split_sections
+        if len(text) > self.max_chars:
+            return len(self.models) - 1
+        if text_tokens is not None and text_tokens > self.max_text_tokens:
+            return len(self.models) - 1
+        if len(split_sections(text).keys() - {BASICS}) > self.max_sections:
+            return len(self.models) - 1
+        return 0
+
+    def tiers(self, text, text_tokens=None):
+        """(tier, model) pairs to try in order."""
+        first = self.first_tier(text, text_tokens)
+        return [(tier, self.models[tier]) for tier in range(first, len(self.models))]
+
+    def reject_reason(self, resume_obj, valid_json_resume):
+        """Why an answer should be escalated, or None to accept it."""
+        if resume_obj is None:
+            return "no answer"
+        if not valid_json_resume:
+            return "invalid jsonresume"
+        if resume_obj.basics is None or not resume_obj.basics.name:
+            return "missing basics.name"
+        if self.require_work and not resume_obj.work:
+            return "empty work"
+        return None
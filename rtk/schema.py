@@ -0,0 +1,88 @@
+import hashlib
+import json
+from functools import lru_cache
+
+# The strict response_format payload and the JSON parser for a structured-output model are derived once per
+# (model class, openai SDK version) instead of on every request; the SDK's own `parse` helper rebuilds and
+# strict-ifies the whole schema per call.
+
+
+class InvalidCompletion(Exception):
+    """A structured-output answer that does not validate against its model; keeps the completion so that the
+    failing parts can be repaired instead of asking again for everything."""
+
+    def __init__(self, completion, error):
+        super().__init__(str(error))
+        self.completion = completion
+        self.error = error
+
+    @property
+    def content(self):
+        return self.completion.choices[0].message.content
+
+
+def sdk_version():
+    import openai
+    return openai.__version__
+
+
+def response_format(model_cls):
+    """The `response_format` request payload (strict JSON schema) for `model_cls`; treat it as read-only."""
+    return _response_format(model_cls, sdk_version())
+
+
+def schema_json(model_cls):
+    """Canonical JSON text of the payload, as counted for prompt tokens and hashed for the fingerprint."""
+    return _schema_json(model_cls, sdk_version())
+
+
+def schema_fingerprint(model_cls=None):
+    """Stable hash of the strict schema actually sent for `model_cls` (Resume by default)."""
+    if model_cls is None:
+        from rtk.resume_dataclass import Resume
+        model_cls = Resume
+    return _schema_fingerprint(model_cls, sdk_version())
+
+
+@lru_cache(maxsize=None)
+def type_adapter(model_cls):
+    from pydantic import TypeAdapter
+    return TypeAdapter(model_cls)
+
+
+def parse_content(model_cls, content):
+    return type_adapter(model_cls).validate_json(content)
+
+
+def parse_completion(completion, model_cls):
+    """Fills `message.parsed` of the first choice from its JSON content, with the SDK's semantics for
+    truncated, filtered and refused answers; raises InvalidCompletion when the content does not validate."""
+    from openai import ContentFilterFinishReasonError, LengthFinishReasonError
+    from pydantic import ValidationError
+    choice = completion.choices[0]
+    if choice.finish_reason == "length":
+        raise LengthFinishReasonError(completion=completion)
+    if choice.finish_reason == "content_filter":
+        raise ContentFilterFinishReasonError()
+    message = choice.message
+    try:
+        message.parsed = None if message.refusal or not message.content else parse_content(model_cls, message.content)
+    except ValidationError as e:
+        raise InvalidCompletion(completion, e) from e
+    return completion
+
+
+@lru_cache(maxsize=None)
+def _response_format(model_cls, version):
+    from openai.lib._parsing._completions import type_to_response_format_param
+    return type_to_response_format_param(model_cls)
+
+
+@lru_cache(maxsize=None)
+def _schema_json(model_cls, version):
+    return json.dumps(_response_format(model_cls, version), sort_keys=True, separators=(",", ":"))
+
+
+@lru_cache(maxsize=None)
+def _schema_fingerprint(model_cls, version):
+    return hashlib.sha256(_schema_json(model_cls, version).encode("utf-8")).hexdigest()
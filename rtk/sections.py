@@ -0,0 +1,62 @@
+import re
+from functools import lru_cache
+
+BASICS = "basics"
+
+# heading lines that open a section, mapped to the Resume field the section is extracted into
+HEADINGS = {
+    "work": ["experience", "work experience", "professional experience", "relevant experience", "employment",
+             "employment history", "work history", "career history"],
+    "education": ["education", "academic background", "education and training"],
+    "skills": ["skills", "technical skills", "core competencies", "competencies"],
+    "projects": ["projects", "selected projects", "personal projects"],
+    "publications": ["publications", "selected publications", "papers"],
+    "awards": ["awards", "honors", "honours", "awards and honors", "awards and honours"],
+    "certificates": ["certifications", "certificates", "licenses and certifications"],
+    "volunteer": ["volunteer", "volunteering", "volunteer experience"],
+    "languages": ["languages"],
+    "interests": ["interests", "hobbies", "hobbies and interests"],
+    "references": ["references"],
+}
+
+_HEADING_TO_FIELD = {heading: field for field, headings in HEADINGS.items() for heading in headings}
+_HEADING_RE = re.compile(r"^[ \t]*(" + "|".join(sorted(map(re.escape, _HEADING_TO_FIELD), key=len, reverse=True))
+                         + r")[ \t]*:?[ \t]*$", re.IGNORECASE | re.MULTILINE)
+
+
+def split_sections(text):
+    """Split resume text on its section headings.
+
+    Returns {field: text} where field is a Resume field name; text before the first heading is returned under
+    "basics". Repeated headings for the same field (e.g. "Experience" and "Relevant Experience") are joined.
+    """
+    matches = list(_HEADING_RE.finditer(text))
+    sections = {}
+    preamble = text[:matches[0].start()] if matches else text
+    if preamble.strip():
+        sections[BASICS] = preamble.strip()
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[m.start():end].strip()
+        field = _HEADING_TO_FIELD[m.group(1).lower()]
+        sections[field] = f"{sections[field]}\n\n{body}" if field in sections else body
+    return sections
+
+
+@lru_cache(maxsize=None)
+def section_model(field):
+    """Structured-output model holding only `field` of Resume, e.g. WorkSection(work: list[Optional[Work]])."""
+    from pydantic import ConfigDict, create_model
+
+    from rtk.resume_dataclass import Resume
+    annotation = Resume.model_fields[field].annotation
+    return create_model(f"{field.capitalize()}Section", __config__=ConfigDict(strict=True), **{field: (annotation, ...)})
+
+
+def merge_sections(parts):
+    """Build a Resume from {field: value} extracted section by section; missing list sections are empty."""
+    from rtk.resume_dataclass import Resume
+    fields = {name: [] for name in Resume.model_fields}
+    fields[BASICS] = None
+    fields.update(parts)
+    return Resume(**fields)
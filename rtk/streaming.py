@@ -0,0 +1,184 @@
+import json
+import time
+from functools import lru_cache
+
+SECTION_EVENT = "section"
+RESULT_EVENT = "result"
+_UNSENT = object()
+
+
+class SectionScanner:
+    """Incremental scanner over the streamed Resume JSON.
+
+    `feed` takes the next chunk of generated text and returns the top-level sections completed by it, as
+    (section, index, data) tuples: ("basics", None, {...}) once the basics object closes, and
+    ("work", 0, {...}), ("work", 1, {...}), ... as each entry of a list section closes.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.expect_key = False
+        self.key = None
+        self.value_start = None
+        self.value_depth = None
+        self.index = 0
+
+    def feed(self, chunk):
+        completed = []
+        self.buffer.append(chunk)
+        for c in chunk:
+            pos = self.pos
+            self.pos += 1
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1 and self.expect_key:
+                        self.key = json.loads(self._text(self.string_start, pos + 1))
+                        self.expect_key = False
+                continue
+            if c == '"':
+                self.in_string = True
+                self.string_start = pos
+            elif c in "{[":
+                self.stack.append(c)
+                depth = len(self.stack)
+                if depth == 1:
+                    self.expect_key = True
+                elif depth == 2:
+                    self.index = 0
+                if c == "{" and self.value_start is None and (depth == 2 or (depth == 3 and self.stack[1] == "[")):
+                    # basics-like object sections close at depth 2, entries of list sections at depth 3
+                    self.value_start = pos
+                    self.value_depth = depth
+            elif c in "}]":
+                depth = len(self.stack)
+                if self.value_start is not None and depth == self.value_depth:
+                    data = json.loads(self._text(self.value_start, pos + 1))
+                    completed.append((self.key, self.index if depth == 3 else None, data))
+                    self.value_start = None
+                    self.value_depth = None
+                self.stack.pop()
+            elif c == ",":
+                depth = len(self.stack)
+                if depth == 1:
+                    self.expect_key = True
+                elif depth == 2:
+                    self.index += 1
+        return completed
+
+    def _text(self, start, end):
+        text = "".join(self.buffer)
+        self.buffer = [text]
+        return text[start:end]
+
+
+def iter_sections(j_resume):
+    for section, value in j_resume.items():
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                yield section, index, item
+        else:
+            yield section, None, value
+
+
+@lru_cache(maxsize=None)
+def entry_model(section):
+    """The model of the basics, or of one entry of a list section; None for a key Resume does not have."""
+    from typing import get_args
+
+    from rtk.resume_dataclass import Resume
+    field = Resume.model_fields.get(section)
+    if field is None:
+        return None
+    annotation = field.annotation
+    # list[Optional[Work]] -> Optional[Work] -> Work
+    while get_args(annotation):
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    return annotation
+
+
+class SectionStream:
+    """The section events of one parse_stream call.
+
+    `feed` takes the chunks of a streamed answer and returns events for the sections they complete, shaped as
+    the result shapes them (ResumeSerializer.to_json_section); a section that does not validate is held back.
+    Once the result is known, `replay` sends the sections it has that were not sent, or were sent with other
+    data (a section repaired after the answer failed validation). A cached or one-piece answer is all replay.
+    """
+
+    def __init__(self, serializer, profiles, t1):
+        self.serializer = serializer
+        self.profiles = profiles
+        self.t1 = t1
+        self.time_to_first_section = None
+        self.sent = {}
+        self.start({})
+
+    def start(self, prefill):
+        """Starts reading a streamed answer; `prefill` holds the Basics fields read locally, not generated."""
+        self.prefill = prefill
+        self.scanner = SectionScanner()
+        self.content = []
+        self.usage = None
+        self.finish_reason = None
+        self.first_chunk = None
+
+    def feed(self, chunk):
+        if self.first_chunk is None:
+            self.first_chunk = time.perf_counter()
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        events = []
+        for choice in chunk.choices[:1]:
+            self.finish_reason = choice.finish_reason or self.finish_reason
+            delta = choice.delta.content
+            if not delta:
+                continue
+            self.content.append(delta)
+            for section, index, data in self.scanner.feed(delta):
+                data = self._normalize(section, data)
+                if data is not None:
+                    events.append(self._event(section, index, data))
+        return events
+
+    def completion(self):
+        """The streamed answer as a completion, for rtk.schema.parse_completion."""
+        from rtk.backends import make_completion
+        completion = make_completion("".join(self.content), 0, 0, self.finish_reason or "stop")
+        if self.usage is not None:
+            completion.usage = self.usage
+        return completion
+
+    def replay(self, j_resume):
+        for section, index, data in iter_sections(j_resume):
+            if self.sent.get((section, index), _UNSENT) != data:
+                yield self._event(section, index, data)
+
+    def _normalize(self, section, data):
+        from pydantic import ValidationError
+        model = entry_model(section)
+        if model is None or not isinstance(data, dict):
+            return None
+        if section == "basics":
+            data = {**data, **self.prefill}
+        try:
+            value = model.model_validate(data)
+        except ValidationError:
+            return None
+        return self.serializer.to_json_section(section, value, self.profiles)
+
+    def _event(self, section, index, data):
+        elapsed = time.time() - self.t1
+        if self.time_to_first_section is None:
+            self.time_to_first_section = elapsed
+        self.sent[section, index] = data
+        return {"event": SECTION_EVENT, "section": section, "index": index, "data": data, "elapsed": elapsed}
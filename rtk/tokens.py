@@ -0,0 +1,77 @@
+import logging
+import math
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# per-message framing tokens the chat format adds around each message, and once for the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+FALLBACK_ENCODING = "o200k_base"
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    """tiktoken encoding for `model`, or None when tiktoken (or its BPE files) is not available."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        logger.warning("(tokens) tiktoken encoding unavailable, estimating token counts: %s", e)
+        return None
+
+
+def count_tokens(text, model):
+    encoding = get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def estimate_tokens(text):
+    # BPE vocabularies of the GPT-4 family average close to 4 characters per token for English words,
+    # and punctuation is usually a token of its own
+    return sum(math.ceil(len(piece) / 4) for piece in _PIECE_RE.findall(text))
+
+
+def count_message_tokens(messages, model):
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m["content"], model) for m in messages) + TOKENS_PER_REPLY
+
+
+@lru_cache(maxsize=None)
+def schema_tokens(response_format, model):
+    """Prompt tokens taken by the strict JSON schema sent for a structured-output `response_format` model."""
+    from rtk.schema import schema_json
+    return count_tokens(schema_json(response_format), model)
+
+
+def truncate_to_tokens(text, max_tokens, model, tail_share=0.25):
+    """Cut `text` down to about `max_tokens` tokens on line boundaries.
+
+    The head of a resume holds the contact details and most recent experience, so most of the budget goes to
+    leading lines; the last `tail_share` of it is spent on trailing lines (skills, education, languages), and
+    what is dropped in between is marked with a "..." line.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    lines = text.split("\n")
+    line_tokens = [count_tokens(line, model) + 1 for line in lines]
+    head_budget = int(max_tokens * (1 - tail_share))
+    head, used = 0, 0
+    while head < len(lines) and used + line_tokens[head] <= head_budget:
+        used += line_tokens[head]
+        head += 1
+    tail, used_tail = len(lines), 0
+    while tail > head and used + used_tail + line_tokens[tail - 1] <= max_tokens:
+        used_tail += line_tokens[tail - 1]
+        tail -= 1
+    return "\n".join(lines[:head] + ["..."] + lines[tail:])
@@ -1,32 +1,33 @@
 import json
 import logging
-import os
+from functools import lru_cache
 from json import JSONDecodeError
-from logging import handlers
 from pathlib import Path
 
-import jsonschema
-from jsonschema.exceptions import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+from pydantic import ValidationError
 
+from rtk.log import clip, event, lazy
 from rtk.resume_dataclass import Resume
 
-
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-# create file handler that logs debug and higher level messages
-sh = logging.StreamHandler()
-sh.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s: %(levelname)s: %(message)s")
-sh.setFormatter(formatter)
-
-# file_logger = bool(os.environ.get("FILE_LOGGER", False))
-# if file_logger:
-#     # Set up file handler
-#     LOGFILE = "LOGS/resume_parser.log"
-#     fh = handlers.RotatingFileHandler(LOGFILE, maxBytes=100000, backupCount=10)
-#     fh.setFormatter(formatter)
-#     logger.addHandler(fh)
-logger.addHandler(sh)
+
+
+@lru_cache(maxsize=None)
+def _load_schema(path):
+    with open(path) as fo:
+        return json.loads(fo.read())
+
+
+@lru_cache(maxsize=None)
+def _compiled_validator(path):
+    # checking the schema and building the validator is the expensive part of jsonschema.validate(),
+    # so it is done once per process and shared by every Validation instance
+    schema = _load_schema(path)
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
 
 
 class Validation:
@@ -34,11 +35,13 @@ class Validation:
     RESUME_SCHEMA_PATH = app_dir.joinpath("jsonresume_schema.json")
     VALIDATION_APPROACH =  "jsonschema"  #"pydantic"
 
-    def __init__(self):
+    def __init__(self, log_errors=True, log_schema=False):
+        self.log_errors = log_errors
+        self.log_schema = log_schema
         self.resume_schema = self._load_resume_schema()
+        self.validator = _compiled_validator(self.RESUME_SCHEMA_PATH)
 
     def validate_json(self, obj):
-        print(f"validate_json type(obj) {type(obj)}")
         match self.VALIDATION_APPROACH:
             case "pydantic":
                 return self.validate_json_w_pydantic(obj)
@@ -59,10 +62,16 @@ class Validation:
                 valid_json = True
                 valid_json_resume = self._is_valid_json_resume(d)
             except (JSONDecodeError, TypeError) as e:
-                logger.error(f"JSONValidationError: invalid json for generated object: {obj}")
+                event(logger, logging.ERROR, "validation.invalid_json",
+                      "JSONValidationError: invalid json for generated object: %(object)s", object=clip(obj))
         return valid_json, valid_json_resume
 
-    def validate_json_w_pydantic(self, obj):
+    def validate_json_w_pydantic(self, obj, from_resume=False):
+        # `from_resume` marks a dict serialized from a Resume the SDK already validated: re-validating it
+        # can not fail, so the pydantic round trip is skipped
+        if from_resume and isinstance(obj, dict):
+            return True, True
+
         valid_json = False
         valid_json_resume = False
 
@@ -76,30 +85,54 @@ class Validation:
                 d = json.loads(obj)
                 valid_json = True
             except (JSONDecodeError, TypeError) as e:
-                logger.error(f"JSONValidationError: invalid json for generated object: {obj}")
+                event(logger, logging.ERROR, "validation.invalid_json",
+                      "JSONValidationError: invalid json for generated object: %(object)s", object=clip(obj))
 
         if d:
             try:
                 resume_obj = Resume.model_validate(d)
                 valid_json_resume = True
-            except:
-                logger.error("Response object can not be deserialized to a Resume Pydantic object")
+            except Exception as e:
+                event(logger, logging.ERROR, "validation.invalid_resume",
+                      "Response object can not be deserialized to a Resume Pydantic object: %(error)s",
+                      error_type=type(e).__name__, error=clip(e))
 
         return valid_json, valid_json_resume
 
-    def _is_valid_json_resume(self, d):
+    def failing_sections(self, d):
+        """{Resume field: [error messages]} for the top-level sections of `d` that do not validate against the
+        Resume model, {} when it validates, or None when the errors can not be tied to sections."""
         try:
-            jsonschema.validate(instance=d, schema=self.resume_schema)
-            return True
+            Resume.model_validate(d)
+            return {}
         except ValidationError as e:
-            logger.error \
-                (f"JSONResumeValidationError: json schema does not conform to jsonresume. Error message: {e.message}")
-            logger.error(e.schema)
-            return False
+            sections = {}
+            for error in e.errors():
+                loc = error["loc"]
+                if not loc or loc[0] not in Resume.model_fields:
+                    return None
+                sections.setdefault(loc[0], []).append(f"{'.'.join(map(str, loc))}: {error['msg']}")
+            return sections
+
+    def is_valid_json_resume(self, d):
+        return self.validator.is_valid(d)
+
+    def _is_valid_json_resume(self, d):
+        if self.validator.is_valid(d):
+            return True
+        if self.log_errors:
+            # the best match is only searched for when the event is emitted; its message quotes the offending
+            # value and its schema can be large, so both are clipped
+            event(logger, logging.ERROR, "validation.invalid_jsonresume",
+                  "JSONResumeValidationError: json schema does not conform to jsonresume. Error message: %(message)s",
+                  message=lazy(lambda: clip(best_match(self.validator.iter_errors(d)).message)))
+            if self.log_schema:
+                event(logger, logging.ERROR, "validation.schema", "%(schema)s",
+                      schema=lazy(lambda: clip(best_match(self.validator.iter_errors(d)).schema)))
+        return False
 
     def _load_resume_schema(self):
-        with open(self.RESUME_SCHEMA_PATH) as fo:
-            return json.loads(fo.read())
+        return _load_schema(self.RESUME_SCHEMA_PATH)
 
     def compute_statuscode(self, response):
         valid_json = response["is_valid_json"]
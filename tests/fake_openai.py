@@ -0,0 +1,101 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from rtk.resume_dataclass import Basics, Location, Resume, Work
+
+
+def sample_resume(name="Jane Doe", num_work=2):
+    basics = Basics(name=name, label="Engineer", email="jane@example.com", phone="555-0100", url=None,
+                    summary="Builds things.", profiles=[],
+                    location=Location(address="1 Main St", city="Boston", region="MA", countryCode="US",
+                                      postalCode="02110"))
+    work = [Work(position=f"Engineer {i}", name=f"Company {i}", location="Boston", description="Software",
+                 startDate="2020-01", endDate="2021-01", summary="Built things.", highlights=[f"Shipped {i}"],
+                 url=None)
+            for i in range(num_work)]
+    return Resume(basics=basics, education=[], work=work, projects=[], skills=[], publications=[], awards=[],
+                  certificates=[], volunteer=[], languages=[], interests=[], references=[])
+
+
+def fake_completion(resume, prompt_tokens=100, completion_tokens=50):
+    message = SimpleNamespace(content=resume.model_dump_json(), parsed=resume, refusal=None)
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+
+class FakeRawResponse:
+    status_code = 200
+
+    def __init__(self, completion, headers=None):
+        self.completion = completion
+        self.headers = headers or {}
+        self.http_response = SimpleNamespace(status_code=200, headers=self.headers, extensions={})
+
+    def parse(self):
+        return self.completion
+
+
+class _Completions:
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.with_raw_response = SimpleNamespace(create=self._raw_create)
+
+    def _raw_create(self, **kwargs):
+        return FakeRawResponse(self.create(**kwargs))
+
+    def create(self, model, messages, **kwargs):
+        self.owner.models.append(model)
+        self.owner.calls.append(messages)
+        self.owner.options.append(kwargs)
+        if self.owner.latency:
+            time.sleep(self.owner.latency)
+        return self.owner.completion_for(messages)
+
+
+class _AsyncCompletions(_Completions):
+
+    async def create(self, model, messages, **kwargs):
+        self.owner.models.append(model)
+        self.owner.calls.append(messages)
+        self.owner.options.append(kwargs)
+        self.owner.in_flight += 1
+        self.owner.max_in_flight = max(self.owner.max_in_flight, self.owner.in_flight)
+        try:
+            if self.owner.latency:
+                await asyncio.sleep(self.owner.latency)
+            return self.owner.completion_for(messages)
+        finally:
+            self.owner.in_flight -= 1
+
+    async def _raw_create(self, **kwargs):
+        return FakeRawResponse(await self.create(**kwargs))
+
+
+class FakeOpenAI:
+    """Stand-in for the OpenAI client: echoes the user text back as the candidate name."""
+    completions_cls = _Completions
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self.models = []
+        self.options = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        completions = self.completions_cls(self)
+        self.chat = SimpleNamespace(completions=completions)
+
+    def with_options(self, **options):
+        return self
+
+    def resume_for(self, messages):
+        return sample_resume(name=messages[-1]["content"][:40])
+
+    def completion_for(self, messages):
+        return fake_completion(self.resume_for(messages))
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    completions_cls = _AsyncCompletions
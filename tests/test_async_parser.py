@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from rtk import AsyncOAiParser
+from tests.fake_openai import FakeAsyncOpenAI
+
+
+class TestAsyncOAiParser(unittest.TestCase):
+
+    def _parser(self, latency=0.0):
+        parser = AsyncOAiParser("sk-test", {})
+        parser.client = FakeAsyncOpenAI(latency=latency)
+        return parser
+
+    def test_parse(self):
+        parser = self._parser()
+        response = asyncio.run(parser.parse("Jane Doe"))
+        self.assertEqual(response["parser"], AsyncOAiParser.OPENAI_PARSER_NAME)
+        self.assertTrue(response["is_valid_jsonresume"])
+        self.assertEqual(response["jsonresume"]["basics"]["name"], "Jane Doe")
+        self.assertEqual(response["num_tokens"], 150)
+
+    def test_parse_standalone(self):
+        parser = self._parser()
+        response = asyncio.run(parser.parse_standalone("Jane Doe"))
+        self.assertEqual(response["statuscode"], 200)
+        self.assertEqual(response["var"], "")
+
+    def test_parse_many_bounded_and_ordered(self):
+        parser = self._parser(latency=0.01)
+        texts = [f"Candidate {i}" for i in range(40)]
+        results = asyncio.run(parser.parse_many(texts, max_concurrency=5))
+        self.assertEqual([r["jsonresume"]["basics"]["name"] for r in results], texts)
+        self.assertLessEqual(parser.client.max_in_flight, 5)
+        self.assertGreater(parser.client.max_in_flight, 1)
+
+    def test_sync_batch_methods_point_to_parse_many(self):
+        parser = self._parser()
+        with self.assertRaisesRegex(TypeError, "parse_many"):
+            parser.parse_batch(["Jane Doe"])
+        with self.assertRaisesRegex(TypeError, "parse_many"):
+            parser.iter_parse(["Jane Doe"])
+
+
+if __name__ == "__main__":
+    unittest.main()
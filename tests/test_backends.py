@@ -0,0 +1,248 @@
+import asyncio
+import importlib.util
+import os
+import tempfile
+import threading
+import unittest
+
+from pydantic import BaseModel
+
+from rtk import AsyncOAiParser, OAiParser
+from rtk.backends import Backend, LocalBackend, OpenAIBackend, ReplayBackend, ReplayMiss
+from rtk.constrained import SchemaAutomaton, SchemaLogitsProcessor
+from rtk.resume_dataclass import Resume
+from rtk.routing import ModelCascade
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI, sample_resume
+
+SCHEMA = {
+    "type": "object", "additionalProperties": False, "required": ["name", "years", "score", "tags", "ok"],
+    "properties": {
+        "name": {"type": "string"},
+        "years": {"anyOf": [{"type": "integer"}, {"type": "null"}]},
+        "score": {"type": "number"},
+        "tags": {"type": "array", "items": {"$ref": "#/$defs/Tag"}},
+        "ok": {"type": "boolean"},
+    },
+    "$defs": {"Tag": {"type": "object", "properties": {"label": {"type": "string"}}}},
+}
+
+
+class TestSchemaAutomaton(unittest.TestCase):
+
+    def test_accepts_documents_of_the_schema(self):
+        automaton = SchemaAutomaton(SCHEMA)
+        self.assertTrue(automaton.accepts('{"name":"J\\"o\\u00e9","years":null,"score":-1.5e3,"tags":[],"ok":true}'))
+        self.assertTrue(automaton.accepts('{"name":"","years":12,"score":0,"tags":[{"label":"a"},{"label":"b"}],'
+                                          '"ok":false}'))
+        for text in ('{"name":"J","years":1.5,"score":0,"tags":[],"ok":true}',  # integer
+                     '{"years":null,"name":"J","score":0,"tags":[],"ok":true}',  # key order
+                     '{"name": "J","years":null,"score":0,"tags":[],"ok":true}',  # whitespace
+                     '{"name":"J","years":01,"score":0,"tags":[],"ok":true}',
+                     '{"name":"J\\x","years":null,"score":0,"tags":[],"ok":true}',
+                     '{"name":"J","years":null,"score":0,"tags":[],"ok":true}}'):
+            self.assertFalse(automaton.accepts(text), text)
+
+    def test_prefixes(self):
+        automaton = SchemaAutomaton(SCHEMA)
+        state = automaton.feed(automaton.start(), '{"name":"Jane","years":1')
+        self.assertIsNotNone(state)
+        self.assertFalse(automaton.is_complete(state))
+        # one state, many continuations
+        self.assertIsNotNone(automaton.feed(state, "2"))
+        self.assertIsNotNone(automaton.feed(state, ',"score"'))
+        self.assertIsNone(automaton.feed(state, '"'))
+
+    def test_resume(self):
+        automaton = SchemaAutomaton.for_response_format(Resume)
+        document = sample_resume().model_dump_json()
+        self.assertTrue(automaton.accepts(document))
+        self.assertFalse(automaton.accepts(document[:-1]))
+
+    def test_choose_skips_tokens_that_break_the_document(self):
+        automaton = SchemaAutomaton(SCHEMA)
+        processor = SchemaLogitsProcessor(automaton, ['{"', "name", '{"name":"', "Jane", None], 99, batch_size=1)
+        state = automaton.start()
+        token_id, state = processor.choose(state, [1, 4, 0])
+        self.assertEqual(token_id, 0)
+        token_id, state = processor.choose(state, [3, 1])
+        self.assertEqual(token_id, 1)
+        self.assertEqual(processor.choose(state, [0, 3]), (None, state))
+
+
+class RecordingBackend(LocalBackend):
+    """LocalBackend with `generate` answering from the prompt, as the model would, and recording batch sizes."""
+
+    def __init__(self, **kwargs):
+        super().__init__(model="tiny-local", **kwargs)
+        self.batch_sizes = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def generate(self, batch, response_format):
+        self.release.wait()
+        self.batch_sizes.append(len(batch))
+        return [(sample_resume(name=messages[-1]["content"][:40]).model_dump_json(), 100, 50, "stop")
+                for messages in batch]
+
+
+class TestLocalBackend(unittest.TestCase):
+
+    def test_parse_without_openai(self):
+        backend = RecordingBackend()
+        parser = OAiParser(None, {}, backend=backend, cascade=ModelCascade())
+        response = parser.parse("Jane Doe")
+        backend.close()
+        self.assertEqual(response["jsonresume"]["basics"]["name"], "Jane Doe")
+        self.assertTrue(response["is_valid_jsonresume"])
+        self.assertEqual((response["backend"], response["model"], response["tier"]), ("local", "tiny-local", None))
+        self.assertEqual(response["attempts"], 1)
+        self.assertIn("request", response["timings"])
+
+    def test_concurrent_requests_are_batched(self):
+        backend = RecordingBackend(batch_size=4, max_wait=0.5)
+        parser = OAiParser(None, {}, backend=backend)
+        texts = [f"Candidate {i}" for i in range(8)]
+        responses = parser.parse_batch(texts, workers=8)
+        parser.close()
+        backend.close()
+        self.assertEqual([r["jsonresume"]["basics"]["name"] for r in responses], texts)
+        self.assertEqual(backend.batch_sizes, [4, 4])
+
+    def test_generate_errors_reach_every_request(self):
+        class Broken(RecordingBackend):
+            def generate(self, batch, response_format):
+                raise RuntimeError("out of memory")
+
+        backend = Broken()
+        response = OAiParser(None, {}, backend=backend).parse("Jane Doe")
+        backend.close()
+        self.assertEqual(response["error"], "RuntimeError")
+        self.assertEqual(response["jsonresume"], {})
+
+    def test_truncated_answer(self):
+        class Truncated(RecordingBackend):
+            def generate(self, batch, response_format):
+                return [('{"basics":{"name":"Ja', 100, 2048, "length")] * len(batch)
+
+        backend = Truncated()
+        response = OAiParser(None, {}, backend=backend).parse("Jane Doe")
+        backend.close()
+        self.assertEqual(response["error"], "LengthFinishReasonError")
+
+    def test_async_parse_many(self):
+        backend = RecordingBackend(batch_size=3, max_wait=0.5)
+        parser = AsyncOAiParser(None, {}, backend=backend)
+        responses = asyncio.run(parser.parse_many(["a", "b", "c"]))
+        backend.close()
+        self.assertEqual([r["jsonresume"]["basics"]["name"] for r in responses], ["a", "b", "c"])
+        self.assertEqual(backend.batch_sizes, [3])
+
+    def test_stream_replays_sections(self):
+        backend = RecordingBackend()
+        events = list(OAiParser(None, {}, backend=backend).parse_stream("Jane Doe"))
+        backend.close()
+        sections = [e["section"] for e in events if e["event"] == "section"]
+        self.assertIn("basics", sections)
+        self.assertEqual(events[-1]["response"]["jsonresume"]["basics"]["name"], "Jane Doe")
+
+
+class Contact(BaseModel):
+    name: str
+    years: int
+
+
+@unittest.skipUnless(importlib.util.find_spec("torch"), "needs the local extra (torch)")
+class TestLocalModel(unittest.TestCase):
+    """LocalBackend.generate end to end: a tiny randomly initialized model, decoding constrained to the schema."""
+    MODEL = "trl-internal-testing/tiny-Qwen2ForCausalLM-2.5"
+
+    def test_generate(self):
+        backend = LocalBackend(self.MODEL, quantize=False, max_new_tokens=48)
+        messages = [[{"role": "user", "content": text}] for text in ("Jane Doe, 5 years", "John Roe")]
+        results = backend.generate(messages, Contact)
+        self.assertEqual(len(results), 2)
+        automaton = SchemaAutomaton.for_response_format(Contact)
+        for content, prompt_tokens, completion_tokens, finish_reason in results:
+            self.assertGreater(prompt_tokens, 0)
+            self.assertLessEqual(completion_tokens, 48)
+            # whatever the weights, the output stays a prefix of a document of the schema
+            self.assertIsNotNone(automaton.feed(automaton.start(), content), content)
+            if finish_reason == "stop":
+                self.assertTrue(automaton.accepts(content), content)
+            else:
+                self.assertEqual(finish_reason, "length")
+
+
+class TestBackendSelection(unittest.TestCase):
+
+    def test_backends_implement_complete(self):
+        class Incomplete(Backend):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_per_call_backend(self):
+        backend = RecordingBackend()
+        parser = OAiParser("sk-test", {}, backends={"cpu": backend})
+        parser.client = FakeOpenAI()
+        self.assertEqual(parser.parse("Jane Doe")["backend"], "openai")
+        self.assertEqual(parser.parse("Jane Doe", backend="cpu")["model"], "tiny-local")
+        self.assertEqual(len(parser.client.calls), 1)
+        responses = parser.parse_batch(["a", "b"], backend="cpu")
+        self.assertEqual([r["backend"] for r in responses], ["local", "local"])
+        with self.assertRaises(ValueError):
+            parser.parse("Jane Doe", backend="gpu")
+        parser.close()
+        backend.close()
+
+    def test_answers_are_cached_per_backend_model(self):
+        from rtk.cache import ParseCache
+        backend = RecordingBackend()
+        parser = OAiParser("sk-test", {}, cache=ParseCache(), backends={"cpu": backend})
+        parser.client = FakeOpenAI()
+        parser.parse("Jane Doe", backend="cpu")
+        self.assertIsNone(parser.parse("Jane Doe")["cache"])
+        self.assertEqual(parser.parse("Jane Doe", backend="cpu")["cache"], "memory")
+        backend.close()
+
+
+class TestReplayBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "recording.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_then_replay(self):
+        recorder = ReplayBackend(self.path, record=OpenAIBackend())
+        parser = OAiParser("sk-test", {}, backend=recorder)
+        parser.client = FakeOpenAI()
+        recorded = parser.parse("Jane Doe")
+        self.assertEqual(len(parser.client.calls), 1)
+        self.assertEqual(recorded["attempts"], 1)
+        self.assertEqual(recorder.num_answers, 1)
+
+        # replays need neither the key nor the API
+        replay = OAiParser(None, {}, backend=ReplayBackend(self.path))
+        replayed = replay.parse("Jane Doe")
+        self.assertEqual(replayed["jsonresume"], recorded["jsonresume"])
+        self.assertEqual((replayed["prompt_tokens"], replayed["model"]), (100, replay.model))
+        missed = replay.parse("John Roe")
+        self.assertEqual(missed["error"], ReplayMiss.__name__)
+
+    def test_async_replay(self):
+        recorder = ReplayBackend(self.path, record=OpenAIBackend())
+        parser = AsyncOAiParser("sk-test", {}, backend=recorder)
+        parser.client = FakeAsyncOpenAI()
+        recorded = asyncio.run(parser.parse_many(["a", "b"]))
+        self.assertEqual([r["attempts"] for r in recorded], [1, 1])
+        self.assertEqual(ReplayBackend(self.path).num_answers, 2)
+        replayed = asyncio.run(AsyncOAiParser(None, {}, backend=ReplayBackend(self.path)).parse("b"))
+        self.assertEqual(replayed["jsonresume"]["basics"]["name"], "b")
+
+
+if __name__ == "__main__":
+    unittest.main()
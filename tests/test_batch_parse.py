@@ -0,0 +1,40 @@
+import time
+import unittest
+
+from rtk import OAiParser
+from tests.fake_openai import FakeOpenAI
+
+
+class TestBatchParse(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = OAiParser("sk-test", {})
+        self.parser.client = FakeOpenAI(latency=0.05)
+
+    def tearDown(self):
+        self.parser.close()
+
+    def test_parse_batch_keeps_order_and_usage(self):
+        texts = [f"Candidate {i}" for i in range(16)]
+        t1 = time.time()
+        results = self.parser.parse_batch(texts, workers=8)
+        elapsed = time.time() - t1
+        self.assertEqual([r["jsonresume"]["basics"]["name"] for r in results], texts)
+        for r in results:
+            self.assertEqual(r["num_tokens"], 150)
+            self.assertGreater(r["generation_time"], 0)
+        # 16 calls of 50 ms on 8 workers, rather than 800 ms sequentially
+        self.assertLess(elapsed, 0.5)
+
+    def test_iter_parse_tags_index(self):
+        texts = (f"Candidate {i}" for i in range(10))
+        seen = {i: r["jsonresume"]["basics"]["name"] for i, r in self.parser.iter_parse(texts, workers=3)}
+        self.assertEqual(seen, {i: f"Candidate {i}" for i in range(10)})
+
+    def test_parse_batch_standalone(self):
+        results = self.parser.parse_batch(["a", "b"], workers=2, standalone=True)
+        self.assertEqual([r["statuscode"] for r in results], [200, 200])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from rtk import OAiParser, ParseCache
+from rtk.cache import SQLiteCache, make_cache_key
+from tests.fake_openai import FakeOpenAI, sample_resume
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name).joinpath("cache.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _parser(self, cache):
+        parser = OAiParser("sk-test", {}, cache=cache)
+        parser.client = FakeOpenAI()
+        return parser
+
+    def test_key_normalizes_whitespace(self):
+        k1 = make_cache_key("Jane  Doe\n", "m", "p", "1")
+        self.assertEqual(k1, make_cache_key("Jane Doe", "m", "p", "1"))
+        self.assertNotEqual(k1, make_cache_key("Jane Doe", "other-model", "p", "1"))
+
+    def test_memory_then_disk_hits(self):
+        cache = ParseCache(memory_entries=8, path=self.db_path)
+        parser = self._parser(cache)
+        first = parser.parse("Jane Doe")
+        second = parser.parse("Jane Doe")
+        self.assertIsNone(first["cache"])
+        self.assertEqual(second["cache"], "memory")
+        self.assertEqual(second["jsonresume"], first["jsonresume"])
+        self.assertEqual(second["num_tokens"], 0)
+        self.assertEqual(len(parser.client.calls), 1)
+        cache.close()
+
+        # a fresh process only has the on-disk tier warm
+        cache = ParseCache(memory_entries=8, path=self.db_path)
+        parser = self._parser(cache)
+        third = parser.parse("Jane Doe")
+        fourth = parser.parse("Jane Doe")
+        self.assertEqual(third["cache"], "disk")
+        self.assertEqual(fourth["cache"], "memory")
+        self.assertEqual(third["jsonresume"], first["jsonresume"])
+        self.assertEqual(parser.client.calls, [])
+        self.assertEqual(cache.stats(), {"hits": {"memory": 1, "disk": 1}, "misses": 0,
+                                         "evictions": {"memory": 0, "disk": 0}, "tokens_saved": 300})
+        cache.close()
+
+    def test_memory_lru_eviction(self):
+        cache = ParseCache(memory_entries=2)
+        parser = self._parser(cache)
+        for text in ["a", "b", "c", "a"]:
+            parser.parse(text)
+        self.assertEqual(cache.stats()["misses"], 4)
+        self.assertEqual(cache.stats()["evictions"], {"memory": 2})
+
+    def test_disk_ttl_and_size_eviction(self):
+        disk = SQLiteCache(self.db_path, ttl=0.05, max_entries=3)
+        entry = (sample_resume(), 10)
+        disk.set("k", entry)
+        self.assertIsNotNone(disk.get("k"))
+        time.sleep(0.1)
+        self.assertIsNone(disk.get("k"))
+        for i in range(5):
+            disk.set(f"k{i}", entry)
+        disk.prune()
+        self.assertEqual(len(disk), 3)
+        self.assertEqual(disk.evictions, 3)
+        disk.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from benchmarks.mock_openai import MockOpenAIServer
+from rtk import OAiParser, clients
+from rtk.cli import Progress, iter_inputs, main, run
+from tests.fake_openai import FakeOpenAI
+
+
+def args(input, output, **overrides):
+    values = {"input": input, "output": output, "workers": 4, "id_field": "id", "text_field": "text",
+              "standalone": True, "overwrite": False, "progress_interval": 60.0}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def fake_parser():
+    parser = OAiParser("sk-test", {})
+    parser.client = FakeOpenAI()
+    return parser
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.inputs = os.path.join(self.dir, "inputs.jsonl")
+        with open(self.inputs, "w") as f:
+            for i in range(10):
+                f.write(json.dumps({"uid": f"doc-{i}", "body": f"Candidate {i}"}) + "\n")
+        self.output = os.path.join(self.dir, "out.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, **overrides):
+        progress = Progress(stream=io.StringIO())
+        parser = fake_parser()
+        run(args(self.inputs, self.output, id_field="uid", text_field="body", **overrides), parser, progress)
+        return progress, parser
+
+    def test_inputs(self):
+        texts = os.path.join(self.dir, "texts")
+        os.makedirs(os.path.join(texts, "nested"))
+        for name in ("b.txt", "nested/a.txt", "skip.pdf"):
+            with open(os.path.join(texts, name), "w") as f:
+                f.write(name)
+        self.assertEqual(list(iter_inputs(texts)), [("b.txt", "b.txt"), ("nested/a.txt", "nested/a.txt")])
+        self.assertEqual(next(iter_inputs(self.inputs, "uid", "body")), ("doc-0", "Candidate 0"))
+        self.assertEqual(next(iter_inputs(self.inputs, "missing", "body"))[0], "1")
+
+    def test_run_and_resume(self):
+        progress, _ = self.run_cli()
+        records = read_jsonl(self.output)
+        self.assertEqual(sorted(r["id"] for r in records), [f"doc-{i}" for i in range(10)])
+        self.assertTrue(all(r["statuscode"] == 200 for r in records))
+        self.assertEqual((progress.done, progress.errors, progress.tokens), (10, 0, 1500))
+
+        progress, parser = self.run_cli()
+        self.assertEqual((progress.done, progress.skipped), (0, 10))
+        self.assertEqual(parser.client.calls, [])
+        self.assertEqual(len(read_jsonl(self.output)), 10)
+
+    def test_interrupted_tail_is_dropped(self):
+        self.run_cli()
+        # drop the last three checkpoint entries and leave a torn line, as a crash mid-write would
+        with open(self.output + ".ckpt") as f:
+            entries = f.readlines()
+        with open(self.output + ".ckpt", "w") as f:
+            f.writelines(entries[:7])
+            f.write("123")
+        with open(self.output, "ab") as f:
+            f.write(b'{"id": "doc-')
+        progress, _ = self.run_cli()
+        self.assertEqual((progress.done, progress.skipped), (3, 7))
+        records = read_jsonl(self.output)
+        self.assertEqual(sorted(r["id"] for r in records), [f"doc-{i}" for i in range(10)])
+
+    def test_bad_records_get_error_rows(self):
+        with open(self.inputs, "a") as f:
+            f.write('{"uid": "no-body"}\n{"uid": "torn", "bo\n[1, 2]\n')
+            f.write(json.dumps({"uid": "doc-10", "body": "Candidate 10"}) + "\n")
+        progress, _ = self.run_cli()
+        self.assertEqual((progress.done, progress.errors), (14, 3))
+        errors = {r["id"]: r["error"] for r in read_jsonl(self.output) if r.get("error")}
+        self.assertEqual(sorted(errors), ["12", "13", "no-body"])
+        self.assertIn("'body'", errors["no-body"])
+
+        progress, parser = self.run_cli()
+        self.assertEqual((progress.done, progress.skipped), (0, 14))
+        self.assertEqual(parser.client.calls, [])
+
+    def test_refuses_unknown_output(self):
+        with open(self.output, "w") as f:
+            f.write("{}\n")
+        with self.assertRaises(SystemExit):
+            self.run_cli()
+        self.run_cli(overwrite=True)
+        self.assertEqual(len(read_jsonl(self.output)), 10)
+
+    def test_main_against_mock_server(self):
+        clients.reset()
+        with MockOpenAIServer() as server:
+            code = main([self.inputs, "-o", self.output, "--id-field", "uid", "--text-field", "body",
+                         "--api-key", "sk-mock", "--base-url", server.base_url, "-w", "3"])
+        clients.reset()
+        self.assertEqual(code, 0)
+        self.assertEqual(len(read_jsonl(self.output)), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+
+from benchmarks.mock_openai import MockOpenAIServer
+from rtk import OAiParser
+from rtk import clients
+
+
+class TestSharedClients(unittest.TestCase):
+
+    def setUp(self):
+        clients.reset()
+        self.server = MockOpenAIServer().start()
+
+    def tearDown(self):
+        clients.reset()
+        self.server.stop()
+
+    def test_registry_keys(self):
+        a = clients.get_client("sk-a", self.server.base_url)
+        self.assertIs(a, clients.get_client("sk-a", self.server.base_url))
+        self.assertIsNot(a, clients.get_client("sk-b", self.server.base_url))
+
+    def test_parsers_reuse_connections(self):
+        num_parses = 10
+        for i in range(num_parses):
+            # a new parser per request, as a web service would do
+            parser = OAiParser("sk-mock", {}, base_url=self.server.base_url)
+            response = parser.parse(f"Candidate {i}")
+            self.assertEqual(response["jsonresume"]["basics"]["name"], f"Candidate {i}")
+        self.assertEqual(self.server.requests, num_parses)
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_unshared_parsers_open_new_connections(self):
+        for i in range(3):
+            parser = OAiParser("sk-mock", {}, base_url=self.server.base_url, shared_client=False)
+            parser.parse(f"Candidate {i}")
+        self.assertEqual(self.server.connections, 3)
+
+    def test_reset_closes_async_clients(self):
+        async def get():
+            return clients.get_async_client("sk-a", self.server.base_url)
+
+        loop = asyncio.new_event_loop()
+        idle = loop.run_until_complete(get())
+        clients.reset()
+        self.assertTrue(idle.is_closed())
+
+        async def reset_while_running():
+            client = await get()
+            clients.reset()
+            await asyncio.sleep(0.01)
+            return client
+
+        self.assertTrue(loop.run_until_complete(reset_while_running()).is_closed())
+
+        # an idle loop's client, reset from a coroutine of another loop
+        idle = loop.run_until_complete(get())
+
+        async def reset_from_another_loop():
+            clients.reset()
+
+        asyncio.run(reset_from_another_loop())
+        self.assertTrue(idle.is_closed())
+        loop.close()
+
+    def test_configure(self):
+        clients.configure(max_connections=4, keepalive_expiry=5.0)
+        with self.assertRaises(ValueError):
+            clients.configure(max_conections=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
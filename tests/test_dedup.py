@@ -0,0 +1,138 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.synthetic import render_text, synthetic_resume
+from rtk import AsyncOAiParser, OAiParser
+from rtk.dedup import MinHasher, NearDuplicateIndex, similarity
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI, sample_resume
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.text = render_text(synthetic_resume(num_work=5))
+        self.edited = self.text.replace("+1 555 010 0000", "+1 555 999 1234")
+        self.other = render_text(synthetic_resume(num_work=5, seed=3))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_signature_similarity(self):
+        hasher = MinHasher()
+        sig = hasher.signature(self.text)
+        self.assertEqual(similarity(sig, hasher.signature(" ".join(self.text.split()))), 1.0)
+        self.assertGreater(similarity(sig, hasher.signature(self.edited)), 0.9)
+        self.assertLess(similarity(sig, hasher.signature(self.other)), 0.5)
+
+    def test_query(self):
+        index = NearDuplicateIndex()
+        doc = index.add(self.text, sample_resume())
+        match = index.query(self.edited)
+        self.assertEqual(match.id, doc)
+        self.assertGreater(match.similarity, 0.9)
+        self.assertEqual(match.text, self.text)
+        self.assertEqual(match.resume, sample_resume())
+        self.assertIsNone(index.query(self.other))
+        self.assertIsNone(index.query(self.edited, namespace="other-model"))
+        index.close()
+
+    def test_candidates_sharing_most_bands_come_first(self):
+        index = NearDuplicateIndex()
+        index.MAX_CANDIDATES = 2
+        others = [index.add(render_text(synthetic_resume(num_work=5, seed=seed)), sample_resume())
+                  for seed in range(10, 14)]
+        doc = index.add(self.text, sample_resume())
+        # the other entries share one band with the query, the near-duplicate most of them
+        band = index._band_keys(index.hasher.signature(self.edited), "")[0]
+        index._conn.executemany("INSERT OR IGNORE INTO lsh (band, doc) VALUES (?, ?)", [(band, o) for o in others])
+        self.assertEqual(index.query(self.edited).id, doc)
+        index.close()
+
+    def test_persistent(self):
+        path = Path(self.tmp.name).joinpath("dedup.sqlite")
+        index = NearDuplicateIndex(path)
+        index.add(self.text, sample_resume())
+        index.close()
+        index = NearDuplicateIndex(path)
+        self.assertEqual(len(index), 1)
+        self.assertIsNotNone(index.query(self.edited))
+        index.close()
+        with self.assertRaises(ValueError):
+            NearDuplicateIndex(path, num_perm=128)
+
+
+class TestNearDuplicateParse(unittest.TestCase):
+
+    def setUp(self):
+        self.text = render_text(synthetic_resume(num_work=5))
+
+    def _parser(self, cls=OAiParser, client=None):
+        parser = cls("sk-test", {}, dedup=NearDuplicateIndex())
+        parser.client = client or FakeOpenAI()
+        return parser
+
+    def test_duplicate_skips_the_call(self):
+        parser = self._parser()
+        first = parser.parse(self.text)
+        second = parser.parse(self.text.replace("\n", "\n\n"))
+        self.assertIsNone(first["near_duplicate"])
+        self.assertEqual(second["near_duplicate"]["patched"], [])
+        self.assertEqual(second["near_duplicate"]["similarity"], 1.0)
+        self.assertEqual(second["jsonresume"], first["jsonresume"])
+        self.assertEqual(second["num_tokens"], 0)
+        self.assertEqual(len(parser.client.calls), 1)
+        self.assertEqual(len(parser.dedup), 1)
+        parser.close()
+
+    def test_changed_section_is_patched(self):
+        parser = self._parser()
+        first = parser.parse(self.text)
+        second = parser.parse(self.text.replace("+1 555 010 0000", "+1 555 999 1234"))
+        self.assertEqual(second["near_duplicate"]["patched"], ["basics"])
+        self.assertEqual(len(parser.client.calls), 2)
+        self.assertIn("Only extract the `basics` section.", parser.client.calls[-1][0]["content"])
+        self.assertNotIn("Experience", parser.client.calls[-1][-1]["content"])
+        self.assertEqual(second["jsonresume"]["work"], first["jsonresume"]["work"])
+        self.assertEqual(second["num_tokens"], 150)
+        self.assertIn("dedup", second["timings"])
+        # the patched parse is indexed too
+        self.assertEqual(len(parser.dedup), 2)
+        parser.close()
+
+    def test_dropped_section_is_emptied(self):
+        parser = self._parser()
+        parser.parse(self.text)
+        head, _, tail = self.text.partition("Interests\n")
+        response = parser.parse(head)
+        self.assertEqual(response["near_duplicate"]["patched"], ["interests"])
+        self.assertEqual(response["jsonresume"]["interests"], [])
+        self.assertEqual(len(parser.client.calls), 1)
+        parser.close()
+
+    def test_unrelated_text_is_parsed_in_full(self):
+        parser = self._parser()
+        parser.parse(self.text)
+        response = parser.parse(render_text(synthetic_resume(num_work=5, seed=3)))
+        self.assertIsNone(response["near_duplicate"])
+        self.assertEqual(len(parser.client.calls), 2)
+        self.assertNotIn("Only extract", parser.client.calls[-1][0]["content"])
+        parser.close()
+
+    def test_async(self):
+        parser = self._parser(AsyncOAiParser, FakeAsyncOpenAI())
+
+        async def run():
+            await parser.parse(self.text)
+            return await parser.parse(self.text.replace("+1 555 010 0000", "+1 555 999 1234"))
+
+        response = asyncio.run(run())
+        self.assertEqual(response["near_duplicate"]["patched"], ["basics"])
+        self.assertEqual(len(parser.client.calls), 2)
+        parser.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+import unittest
+from collections import Counter
+
+from rtk import AsyncOAiParser, OAiParser
+from rtk.experiment import Experiment
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI
+
+TEXT = "\n".join(f"Line {i} of a resume with some words on it" for i in range(200))
+
+
+def experiment_config(**options):
+    flag = {"name": "experiment", "enabled": True, "environment": "dev", **options}
+    return {"flags": [flag], "current_env": "dev"}
+
+
+class TestExperiment(unittest.TestCase):
+
+    def test_assignment_is_deterministic(self):
+        a, b = Experiment(seed=1), Experiment(seed=1)
+        texts = [f"resume {i}" for i in range(50)]
+        self.assertEqual([a.assign(t) for t in texts], [b.assign(t) for t in texts])
+        self.assertEqual(a.perturb(TEXT), b.perturb(TEXT))
+        self.assertNotEqual([a.assign(t) for t in texts], [Experiment(seed=2).assign(t) for t in texts])
+
+    def test_weights(self):
+        counts = Counter(Experiment(weights={"p1": 1, "n": 3}).assign(f"resume {i}") for i in range(4000))
+        self.assertEqual(set(counts), {"p1", "n"})
+        self.assertAlmostEqual(counts["p1"] / 4000, 0.25, delta=0.03)
+        with self.assertRaises(ValueError):
+            Experiment(weights={"p9": 1})
+
+    def test_perturbations(self):
+        experiment = Experiment()
+        text, label = experiment.perturb(TEXT, "p1")
+        self.assertEqual(label, f"p1-{len(text)}")
+        text, label = experiment.perturb(TEXT, "p2")
+        self.assertEqual(label, "p2-20")
+        self.assertEqual(sorted(text.split("\n")), sorted(TEXT.split("\n")))
+        self.assertEqual(experiment.perturb(TEXT, "p3"), (TEXT[300:].replace("\n", " "), "p3"))
+        self.assertEqual(experiment.perturb(TEXT, "n"), (TEXT, "n"))
+
+
+class TestParserExperiment(unittest.TestCase):
+
+    def test_no_sleep_and_per_call_variant(self):
+        parser = OAiParser("sk-test", experiment_config(seed=5))
+        parser.client = FakeOpenAI()
+        texts = [f"{i}\n{TEXT}" for i in range(24)]
+        t1 = time.time()
+        responses = parser.parse_batch(texts, workers=8, standalone=True)
+        parser.close()
+        self.assertLess(time.time() - t1, 2.0)
+        for text, response in zip(texts, responses):
+            _, label = parser.experiment.perturb(text)
+            self.assertEqual(response["var"], label)
+            self.assertTrue(response["sop"].endswith(f".{label}"))
+        self.assertFalse(hasattr(parser, "var"))
+
+    def test_disabled(self):
+        parser = OAiParser("sk-test", experiment_config(environment="prod"))
+        parser.client = FakeOpenAI()
+        self.assertIsNone(parser.experiment)
+        response = parser.parse_standalone(TEXT)
+        self.assertEqual(response["var"], "")
+        self.assertNotIn("perturb", response["timings"])
+
+    def test_shadow(self):
+        shadows = []
+        done = threading.Event()
+        parser = OAiParser("sk-test", experiment_config(shadow=True, weights={"p3": 1}))
+        parser.experiment.on_shadow_result = lambda r: (shadows.append(r), done.set())
+        parser.client = FakeOpenAI()
+        response = parser.parse_standalone(TEXT)
+        self.assertEqual(response["var"], "n")
+        self.assertTrue(done.wait(5))
+        parser.close()
+        self.assertEqual(shadows[0]["var"], "p3")
+        self.assertEqual(len(parser.client.calls), 2)
+
+    def test_async_shadow(self):
+        shadows = []
+        parser = AsyncOAiParser("sk-test", experiment_config(shadow=True, weights={"p1": 1}))
+        parser.experiment.on_shadow_result = shadows.append
+        parser.client = FakeAsyncOpenAI()
+
+        async def run():
+            response = await parser.parse_standalone(TEXT)
+            await asyncio.gather(*parser._shadow_tasks)
+            return response
+
+        response = asyncio.run(run())
+        self.assertEqual(response["var"], "n")
+        self.assertTrue(shadows[0]["var"].startswith("p1-"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# cumulative `python -X importtime` budget for importing the parser modules, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get("RTK_IMPORT_BUDGET_MS", "150"))
+HEAVY_MODULES = ["openai", "pydantic", "jsonschema", "httpx", "rtk.resume_dataclass", "rtk.validation"]
+
+
+class TestImportTime(unittest.TestCase):
+
+    def _run(self, code, *args):
+        return subprocess.run([sys.executable, *args, "-c", code], capture_output=True, text=True, check=True)
+
+    def test_import_budget(self):
+        result = self._run("import rtk.openai_parser, rtk.async_parser, rtk.cache", "-X", "importtime")
+        total_us = 0
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].startswith(" rtk"):
+                total_us += int(parts[1])
+        self.assertGreater(total_us, 0)
+        self.assertLess(total_us / 1000, IMPORT_BUDGET_MS)
+
+    def test_exports_are_lazy(self):
+        code = ("import sys\n"
+                "from rtk import OAiParser, AsyncOAiParser, ParseCache\n"
+                "parser = OAiParser('sk-test', {})\n"
+                f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n")
+        result = self._run(code)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
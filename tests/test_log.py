@@ -0,0 +1,136 @@
+import io
+import json
+import logging
+import threading
+import unittest
+
+from rtk import log
+from rtk.log import BackgroundHandler, Sampler, StructuredFormatter, clip, event, lazy
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestEvents(unittest.TestCase):
+
+    def setUp(self):
+        log.configure_sampling()
+        self.logger = logging.getLogger("rtk.test_log")
+        self.logger.setLevel(logging.DEBUG)
+        self.handler = ListHandler()
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.setLevel(logging.NOTSET)
+        log.configure_sampling()
+
+    def test_library_leaves_configuration_to_the_host(self):
+        import rtk.openai_parser
+        import rtk.validation
+        for name in ("rtk.openai_parser", "rtk.validation"):
+            logger = logging.getLogger(name)
+            self.assertEqual(logger.level, logging.NOTSET)
+            self.assertEqual(logger.handlers, [])
+        self.assertTrue(all(isinstance(h, logging.NullHandler) for h in logging.getLogger("rtk").handlers))
+
+    def test_fields_format_the_message(self):
+        event(self.logger, logging.INFO, "usage", "tokens: %(prompt)s + %(completion)s", prompt=10, completion=5)
+        record, = self.handler.records
+        self.assertEqual(record.getMessage(), "tokens: 10 + 5")
+        self.assertEqual(record.event, "usage")
+        self.assertEqual(record.fields, {"prompt": 10, "completion": 5})
+        event(self.logger, logging.INFO, "plain", "no fields, 100%")
+        self.assertEqual(self.handler.records[-1].getMessage(), "no fields, 100%")
+
+    def test_lazy_fields_only_for_emitted_events(self):
+        calls = []
+        self.logger.setLevel(logging.WARNING)
+        event(self.logger, logging.INFO, "skipped", "%(value)s", value=lazy(lambda: calls.append(1)))
+        self.assertEqual(calls, [])
+        event(self.logger, logging.WARNING, "emitted", "%(value)s", value=lazy(lambda: calls.append(1) or "x"))
+        self.assertEqual(calls, [1])
+        self.assertEqual(self.handler.records[-1].getMessage(), "x")
+
+    def test_clip(self):
+        self.assertEqual(str(clip("short", 10)), "short")
+        self.assertEqual(str(clip("x" * 30, 10)), "x" * 10 + "... [20 more chars]")
+        # containers are rendered with a bounded repr, never in full
+        rendered = str(clip({"work": [{"description": "y" * 10 ** 6}] * 1000}, 10 ** 9))
+        self.assertLess(len(rendered), 5000)
+        log.configure_sampling(max_chars=None)
+        self.assertEqual(str(clip("x" * 1000)), "x" * 1000)
+
+    def test_repeated_errors_are_sampled(self):
+        log.configure_sampling(burst=3, every=10)
+        for i in range(25):
+            event(self.logger, logging.ERROR, "failed", "failure %(i)s", i=i)
+        messages = [r.getMessage() for r in self.handler.records]
+        self.assertEqual(messages[:3], ["failure 0", "failure 1", "failure 2"])
+        self.assertEqual(messages[3:], ["failure 12 [9 similar events suppressed]",
+                                        "failure 22 [9 similar events suppressed]"])
+        # info and other events are not affected
+        event(self.logger, logging.ERROR, "other", "other")
+        event(self.logger, logging.INFO, "failed", "info")
+        self.assertEqual(len(self.handler.records), 7)
+
+    def test_sampler_window(self):
+        sampler = Sampler(burst=1, every=100, window=0.0)
+        self.assertEqual([sampler.allow("k") for _ in range(3)], [(True, 0)] * 3)
+
+    def test_structured_formatter(self):
+        event(self.logger, logging.ERROR, "completion.failed", "failed: %(error)s", error=clip("e" * 1000, 20),
+              error_type="BadRequestError")
+        line = StructuredFormatter().format(self.handler.records[0])
+        entry = json.loads(line)
+        self.assertEqual(entry["event"], "completion.failed")
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertEqual(entry["error_type"], "BadRequestError")
+        self.assertEqual(entry["error"], "e" * 20 + "... [980 more chars]")
+
+
+class TestBackgroundHandler(unittest.TestCase):
+
+    def test_records_are_written_by_another_thread(self):
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        threads = []
+        target.emit = lambda record, emit=target.emit: threads.append(threading.current_thread()) or emit(record)
+        handler = log.configure(logging.INFO, handler=target, structured=True, background=True,
+                                logger_name="rtk.test_background")
+        try:
+            payload = {"name": "Jane"}
+            event(logging.getLogger("rtk.test_background"), logging.INFO, "parse.done", "%(name)s", name=clip(payload))
+            payload["name"] = "changed after the call"
+        finally:
+            logging.getLogger("rtk.test_background").removeHandler(handler)
+            handler.close()
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry["name"], "{'name': 'Jane'}")
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_full_queue_drops(self):
+        blocked = threading.Event()
+
+        class Slow(logging.Handler):
+            def emit(self, record):
+                blocked.wait()
+
+        handler = BackgroundHandler(Slow(), maxsize=2)
+        record = logging.LogRecord("rtk", logging.ERROR, __file__, 1, "x", None, None)
+        for _ in range(10):
+            handler.handle(record)
+        self.assertGreaterEqual(handler.dropped, 7)
+        blocked.set()
+        handler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
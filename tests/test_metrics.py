@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+
+from benchmarks.mock_openai import MockOpenAIServer
+from rtk import AsyncOAiParser, OAiParser, clients, metrics
+from rtk.metrics import CallbackSink, Metrics, PrometheusSink
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI
+
+
+class TestSinks(unittest.TestCase):
+
+    def test_prometheus_render(self):
+        sink = PrometheusSink()
+        m = Metrics(sink)
+        m.observe("rtk_stage_seconds", 0.02, stage="request", parser="p")
+        m.observe("rtk_stage_seconds", 3.0, stage="request", parser="p")
+        m.inc("rtk_chars_total", 120, parser="p")
+        text = sink.render()
+        self.assertIn("# TYPE rtk_stage_seconds histogram", text)
+        self.assertIn('rtk_stage_seconds_bucket{parser="p",stage="request",le="0.025"} 1', text)
+        self.assertIn('rtk_stage_seconds_bucket{parser="p",stage="request",le="+Inf"} 2', text)
+        self.assertIn('rtk_stage_seconds_count{parser="p",stage="request"} 2', text)
+        self.assertIn('rtk_chars_total{parser="p"} 120', text)
+
+    def test_callback(self):
+        seen = []
+        Metrics(CallbackSink(lambda *args: seen.append(args))).inc("rtk_chars_total", 5, parser="p")
+        self.assertEqual(seen, [("counter", "rtk_chars_total", 5, {"parser": "p"})])
+
+
+class TestParserMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.seen = []
+        self.sink = PrometheusSink()
+        metrics.configure(self.sink, CallbackSink(lambda *args: self.seen.append(args)))
+
+    def tearDown(self):
+        metrics.configure()
+
+    def stages(self):
+        return {labels["stage"] for kind, name, value, labels in self.seen if name == "rtk_stage_seconds"}
+
+    def test_parse_stages(self):
+        parser = OAiParser("sk-test", {})
+        parser.client = FakeOpenAI()
+        response = parser.parse("Jane Doe")
+        self.assertEqual(set(response["timings"]), {"preprocess", "request", "deserialize", "serialize", "validate"})
+        self.assertEqual(self.stages(), set(response["timings"]))
+        text = self.sink.render()
+        self.assertIn('rtk_responses_total{parser="openai",status="200"} 1', text)
+        self.assertIn('rtk_parses_total{parser="openai",valid="true"} 1', text)
+        self.assertIn('rtk_prompt_tokens_total{parser="openai"} 100', text)
+
+    def test_standalone_stages(self):
+        config = {"flags": [{"name": "experiment", "enabled": True, "environment": "dev"}], "current_env": "dev"}
+        parser = OAiParser("sk-test", config)
+        parser.client = FakeOpenAI()
+        response = parser.parse_standalone("Jane Doe")
+        self.assertIn("perturb", response["timings"])
+        self.assertIn("statuscode", response["timings"])
+        self.assertIn("statuscode", self.stages())
+
+    def test_async_parse_stages(self):
+        parser = AsyncOAiParser("sk-test", {})
+        parser.client = FakeAsyncOpenAI()
+        response = asyncio.run(parser.parse("Jane Doe"))
+        self.assertIn("request", response["timings"])
+        self.assertEqual(self.stages(), set(response["timings"]))
+
+    def test_disabled(self):
+        metrics.configure()
+        parser = OAiParser("sk-test", {})
+        parser.client = FakeOpenAI()
+        parser.parse("Jane Doe")
+        self.assertEqual(self.seen, [])
+
+    def test_time_to_first_byte(self):
+        clients.reset()
+        with MockOpenAIServer(latency=0.05) as server:
+            parser = OAiParser("sk-test", {}, base_url=server.base_url)
+            response = parser.parse("Jane Doe")
+        clients.reset()
+        self.assertTrue(response["is_valid_jsonresume"])
+        self.assertGreaterEqual(response["timings"]["ttfb"], 0.05)
+        self.assertLessEqual(response["timings"]["ttfb"], response["timings"]["request"])
+
+
+if __name__ == "__main__":
+    unittest.main()
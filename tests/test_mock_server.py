@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from benchmarks import bench_parse
+from benchmarks.mock_openai import MockOpenAIServer
+from benchmarks.synthetic import synthetic_corpus, synthetic_resume
+
+
+def chat(server, text="Jane Doe"):
+    return httpx.post(f"{server.base_url}/chat/completions",
+                      json={"model": "mock", "messages": [{"role": "user", "content": text}]})
+
+
+class TestMockServer(unittest.TestCase):
+
+    def test_error_rate(self):
+        with MockOpenAIServer(error_rate=1.0, error_statuses=(429,), retry_after=0.5) as server:
+            response = chat(server)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "0.5")
+        self.assertEqual(server.errors, 1)
+
+    def test_canned_payloads(self):
+        payload = synthetic_resume(num_work=3, seed=7)
+        with MockOpenAIServer(payloads=[payload]) as server:
+            response = chat(server, "Ada Lovelace")
+        content = json.loads(response.json()["choices"][0]["message"]["content"])
+        self.assertEqual(content["basics"]["name"], "Ada Lovelace")
+        self.assertEqual(len(content["work"]), 3)
+
+    def test_corpus_is_deterministic(self):
+        a = [text for text, _ in synthetic_corpus(5, seed=3)]
+        self.assertEqual(a, [text for text, _ in synthetic_corpus(5, seed=3)])
+        self.assertEqual(len(set(a)), 5)
+
+
+class TestBenchParse(unittest.TestCase):
+
+    def test_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "bench.json")
+            bench_parse.main(["--size", "4", "--latency", "0", "--paths", "parse,batch", "--output", output])
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(set(report["results"]), {"parse", "batch"})
+        for result in report["results"].values():
+            self.assertEqual(result["resumes"], 4)
+            self.assertEqual(result["invalid"], 0)
+            self.assertLessEqual(result["p50"], result["p99"])
+            self.assertGreater(result["peak_rss_mb"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import unittest
+
+from rtk import OAiParser
+from rtk.preextract import merge_prefill, pre_extract, reduced_model
+from rtk.schema import schema_json
+from tests.fake_openai import FakeOpenAI, sample_resume
+
+TEXT = """Jane Doe
+Senior Engineer | jane.doe@mail.co.uk | (617) 555-0100
+linkedin.com/in/janedoe, https://github.com/jdoe. www.janedoe.dev
+Boston, MA
+
+Experience
+Engineer, Acme (Boston)
+2019-01 - 2021-06
+Built things at https://acme.example.com
+"""
+
+
+class TestPreExtract(unittest.TestCase):
+
+    def test_contact_details(self):
+        found = pre_extract(TEXT)
+        self.assertEqual(found["email"], "jane.doe@mail.co.uk")
+        self.assertEqual(found["phone"], "(617) 555-0100")
+        self.assertEqual(found["url"], "www.janedoe.dev")
+        self.assertEqual([(p.network, p.username, p.url) for p in found["profiles"]],
+                         [("LinkedIn", "janedoe", "linkedin.com/in/janedoe"),
+                          ("GitHub", "jdoe", "https://github.com/jdoe")])
+
+    def test_dates_are_not_phones(self):
+        self.assertEqual(pre_extract("Bob Roe\n2015 - 2019\n2019-01 - 2021-06\n"), {})
+        self.assertEqual(pre_extract("Bob Roe\n+44 20 7946 0958\n")["phone"], "+44 20 7946 0958")
+
+    def test_numbers_need_phone_formatting_or_a_label(self):
+        for text in ("Bob Roe\nID 123456789\n", "Bob Roe\n12 345 678 Main Street\n", "Bob Roe\nRoom 12 345 678\n"):
+            self.assertNotIn("phone", pre_extract(text), text)
+        for text, phone in (("Bob Roe\nPhone: 020 7946 0958", "020 7946 0958"),
+                            ("Bob Roe\nM: 0412345678", "0412345678"), ("Bob Roe | 617.555.0100", "617.555.0100")):
+            self.assertEqual(pre_extract(text)["phone"], phone)
+
+    def test_reduced_model(self):
+        model = reduced_model(frozenset({"email", "phone"}))
+        self.assertIs(model, reduced_model(frozenset({"phone", "email"})))
+        basics = json.loads(schema_json(model))["json_schema"]["schema"]["$defs"]["Basics"]
+        self.assertNotIn("email", basics["properties"])
+        self.assertIn("url", basics["properties"])
+
+    def test_merge(self):
+        model = reduced_model(frozenset({"email", "phone"}))
+        answer = model.model_validate_json(sample_resume().model_dump_json())
+        merged = merge_prefill(answer, {"email": "x@example.com", "phone": "555"})
+        self.assertEqual(merged, sample_resume().model_copy(
+            update={"basics": sample_resume().basics.model_copy(update={"email": "x@example.com", "phone": "555"})}))
+
+
+class TestPreExtractParse(unittest.TestCase):
+
+    def test_parse(self):
+        parser = OAiParser("sk-test", {}, pre_extract=True)
+        parser.client = FakeOpenAI()
+        response = parser.parse(TEXT)
+        sent = parser.client.options[0]["extra_body"]["response_format"]["json_schema"]["schema"]
+        self.assertNotIn("email", sent["$defs"]["Basics"]["properties"])
+        self.assertEqual(response["prefilled"], ["email", "phone", "profiles", "url"])
+        self.assertGreater(response["prefill_tokens_saved"], 20)
+        basics = response["jsonresume"]["basics"]
+        # the fake answers with jane@example.com, which is no longer asked for
+        self.assertEqual((basics["email"], basics["phone"], basics["url"]),
+                         ("jane.doe@mail.co.uk", "(617) 555-0100", "www.janedoe.dev"))
+        self.assertEqual(basics["location"]["city"], "Boston")
+        self.assertEqual([(p["network"], p["username"]) for p in basics["profiles"]],
+                         [("LinkedIn", "janedoe"), ("GitHub", "jdoe")])
+        self.assertTrue(response["is_valid_jsonresume"])
+        self.assertIn("preextract", response["timings"])
+
+    def test_off_by_default(self):
+        parser = OAiParser("sk-test", {})
+        parser.client = FakeOpenAI()
+        response = parser.parse(TEXT)
+        self.assertEqual((response["prefilled"], response["prefill_tokens_saved"]), ([], 0))
+        self.assertEqual(response["jsonresume"]["basics"]["email"], "jane@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from rtk import OAiParser
+from rtk.openai_parser import ParseCall
+from rtk.preprocess import compact_text
+from rtk.tokens import count_tokens, truncate_to_tokens
+from tests.fake_openai import FakeOpenAI
+
+MODEL = "gpt-4o-2024-08-06"
+
+EXTRACTED = """Jane Doe  |  jane@example.com
+Experience
+--------------------
+Acme\t\t Corp, Engineer
+Acme\t\t Corp, Engineer
+
+
+
+Page 1 of 2
+\fJane Doe  |  jane@example.com
+Skills
+Python,   Go
+- 2 -
+Jane Doe  |  jane@example.com
+"""
+
+
+class TestPreprocess(unittest.TestCase):
+
+    def test_compact_text(self):
+        self.assertEqual(compact_text(EXTRACTED),
+                         "Jane Doe | jane@example.com\nExperience\nAcme Corp, Engineer\n\nSkills\nPython, Go")
+
+    def test_dates_and_repeated_titles_are_content(self):
+        jobs = "".join(f"Software Engineer\nBoston, MA\nCompany {i}\n0{i + 1}/2019\n0{i + 2}/2020\n" for i in range(3))
+        self.assertEqual(compact_text(jobs), jobs.strip())
+        self.assertEqual(compact_text("Experience\n12/2021\n3 / 4\n2"), "Experience\n12/2021\n3 / 4\n2")
+
+    def test_headers_only_at_page_breaks(self):
+        page = "Jane Doe\njane@example.com\nSoftware Engineer\nAcme {0}\nBuilt things.\nSoftware Engineer\n" \
+               "Globex {0}\nBuilt more things.\nPage {0} of 3"
+        text = "\n".join(page.format(i) for i in range(1, 4))
+        compacted = compact_text(text)
+        self.assertEqual(compacted.count("Jane Doe"), 1)
+        self.assertEqual(compacted.count("jane@example.com"), 1)
+        self.assertEqual(compacted.count("Software Engineer"), 6)
+        self.assertNotIn("Page", compacted)
+
+    def test_truncate_keeps_head_and_tail(self):
+        text = "\n".join(f"line {i} of the resume" for i in range(200))
+        truncated = truncate_to_tokens(text, 100, MODEL)
+        self.assertLessEqual(count_tokens(truncated, MODEL), 100)
+        lines = truncated.split("\n")
+        self.assertEqual(lines[0], "line 0 of the resume")
+        self.assertEqual(lines[-1], "line 199 of the resume")
+        self.assertIn("...", lines)
+        self.assertEqual(truncate_to_tokens("short", 100, MODEL), "short")
+
+    def test_parse_reports_estimate_and_sends_compacted_text(self):
+        parser = OAiParser("sk-test", {})
+        parser.client = FakeOpenAI()
+        response = parser.parse(EXTRACTED)
+        self.assertEqual(parser.client.calls[0][-1]["content"], compact_text(EXTRACTED))
+        self.assertEqual(response["num_chars"], len(EXTRACTED))
+        self.assertGreater(response["estimated_prompt_tokens"], 0)
+        self.assertEqual(response["prompt_tokens"], 100)
+
+    def test_prompt_budget(self):
+        parser = OAiParser("sk-test", {})
+        long_text = "\n".join(f"Worked on project {i}" for i in range(500))
+        call = ParseCall()
+        parser._prepare_text("", call)
+        parser.max_prompt_tokens = call.estimated_prompt_tokens + 200
+        prompt_text = parser._prepare_text(long_text, call)
+        self.assertLessEqual(call.estimated_prompt_tokens, parser.max_prompt_tokens)
+        self.assertLess(len(prompt_text), len(long_text))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from benchmarks.mock_openai import MockOpenAIServer
+from rtk import OAiParser, clients, metrics
+from rtk.metrics import PrometheusSink
+from tests.fake_openai import FakeOpenAI, sample_resume
+
+
+class TestPromptPrefix(unittest.TestCase):
+
+    def test_stable_prefix(self):
+        parser = OAiParser("sk-test", {})
+        parser.client = FakeOpenAI()
+        parser.parse("Jane Doe")
+        parser.parse("John Smith, Engineer")
+        first, second = parser.client.calls
+        self.assertEqual(first[:-1], second[:-1])
+        self.assertIn(parser.SCHEMA_GUIDANCE, first[0]["content"])
+        key = parser.client.options[0]["extra_body"]["prompt_cache_key"]
+        self.assertEqual(key, f"rtk-{parser.prompt_prefix_fingerprint[:16]}")
+        self.assertEqual(key, parser.client.options[1]["extra_body"]["prompt_cache_key"])
+
+    def test_few_shot_examples(self):
+        example = sample_resume(name="Ada Lovelace")
+        parser = OAiParser("sk-test", {}, few_shot_examples=[("Ada Lovelace\nAnalyst", example)])
+        parser.client = FakeOpenAI()
+        parser.parse("Jane Doe")
+        messages = parser.client.calls[0]
+        self.assertEqual([m["role"] for m in messages], ["system", "user", "assistant", "user"])
+        self.assertEqual(type(example).model_validate_json(messages[2]["content"]), example)
+        self.assertNotEqual(parser.prompt_prefix_fingerprint, OAiParser("sk-test", {}).prompt_prefix_fingerprint)
+
+    def test_cache_key_only_sent_to_the_openai_api(self):
+        for base_url, prompt_cache_key, sent in [("https://api.openai.com/v1", None, True),
+                                                 ("https://rtk.openai.azure.com/openai/v1", None, False),
+                                                 ("http://localhost:4000/v1", None, False),
+                                                 ("http://localhost:4000/v1", True, True),
+                                                 ("http://localhost:4000/v1", "resumes", True)]:
+            parser = OAiParser("sk-test", {}, base_url=base_url, prompt_cache_key=prompt_cache_key)
+            parser.client = FakeOpenAI()
+            parser.parse("Jane Doe")
+            self.assertEqual("prompt_cache_key" in parser.client.options[0]["extra_body"], sent, base_url)
+
+    def test_cache_key_can_be_disabled(self):
+        parser = OAiParser("sk-test", {}, prompt_cache_key=False)
+        parser.client = FakeOpenAI()
+        parser.parse("Jane Doe")
+        self.assertNotIn("prompt_cache_key", parser.client.options[0]["extra_body"])
+
+
+class TestCachedTokens(unittest.TestCase):
+
+    def setUp(self):
+        clients.reset()
+        self.sink = PrometheusSink()
+        metrics.configure(self.sink)
+
+    def tearDown(self):
+        metrics.configure()
+        clients.reset()
+
+    def test_cached_tokens_reported(self):
+        with MockOpenAIServer() as server:
+            parser = OAiParser("sk-test", {}, base_url=server.base_url)
+            cold = parser.parse("Jane Doe")
+            warm = parser.parse("John Smith")
+        self.assertEqual(cold["cached_tokens"], 0)
+        self.assertEqual(cold["prompt_cache_hit_rate"], 0)
+        self.assertGreater(warm["cached_tokens"], 0)
+        self.assertGreater(warm["prompt_cache_hit_rate"], 0.5)
+        self.assertLessEqual(warm["prompt_cache_hit_rate"], 1.0)
+        self.assertIn(f'rtk_cached_tokens_total{{parser="openai"}} {warm["cached_tokens"]}', self.sink.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
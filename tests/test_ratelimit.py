@@ -0,0 +1,224 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from rtk import AsyncOAiParser, OAiParser, metrics, ratelimit
+from rtk.ratelimit import AdmissionTimeout, RateLimiter, TokenBucket
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI, FakeRawResponse, _Completions
+
+HEADERS = {"x-ratelimit-limit-requests": "5000", "x-ratelimit-limit-tokens": "1000",
+           "x-ratelimit-remaining-requests": "4999", "x-ratelimit-remaining-tokens": "0",
+           "x-ratelimit-reset-requests": "12ms", "x-ratelimit-reset-tokens": "6m0s"}
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_refill_and_wait(self):
+        bucket = TokenBucket(600, now=0.0)
+        self.assertEqual(bucket.wait_time(600, 0.0), 0.0)
+        bucket.level = 0.0
+        # 600 per minute refill at 10 per second
+        self.assertAlmostEqual(bucket.wait_time(20, 0.0), 2.0)
+        self.assertAlmostEqual(bucket.wait_time(20, 1.0), 1.0)
+        self.assertEqual(bucket.wait_time(20, 2.0), 0.0)
+        bucket.refill(1000.0)
+        self.assertEqual(bucket.level, 600)
+
+    def test_oversized_request_waits_for_full_bucket(self):
+        bucket = TokenBucket(600, now=0.0, level=0.0)
+        self.assertAlmostEqual(bucket.wait_time(10000, 0.0), 60.0)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_unlimited_until_known(self):
+        limiter = RateLimiter()
+        for _ in range(100):
+            self.assertLess(limiter.acquire("m", 10 ** 6), 0.01)
+        self.assertEqual(limiter.stats()["buckets"], {})
+
+    def test_waits_for_tokens(self):
+        limiter = RateLimiter(tpm=6000)
+        limiter.acquire("m", 6000)
+        waited = limiter.acquire("m", 10)
+        self.assertGreater(waited, 0.05)
+        self.assertLess(waited, 1.0)
+        stats = limiter.stats()["priorities"]["interactive"]
+        self.assertEqual(stats["admitted"], 2)
+        self.assertAlmostEqual(stats["max_wait_seconds"], waited)
+
+    def test_timeout(self):
+        limiter = RateLimiter(rpm=1)
+        limiter.acquire("m", 0)
+        with self.assertRaises(AdmissionTimeout):
+            limiter.acquire("m", 0, timeout=0.05)
+        self.assertEqual(limiter.stats()["timeouts"], 1)
+        self.assertEqual(limiter.queue_depth(), {"interactive": 0, "batch": 0})
+        # buckets are per model
+        self.assertLess(limiter.acquire("other", 0, timeout=0.05), 0.01)
+
+    def test_interactive_before_batch(self):
+        limiter = RateLimiter(tpm=6000)
+        limiter.acquire("m", 6000)
+        order = []
+
+        def admit(priority):
+            limiter.acquire("m", 10, priority)
+            order.append(priority)
+
+        batch = threading.Thread(target=admit, args=("batch",))
+        batch.start()
+        time.sleep(0.02)
+        self.assertEqual(limiter.queue_depth()["batch"], 1)
+        interactive = threading.Thread(target=admit, args=("interactive",))
+        interactive.start()
+        batch.join()
+        interactive.join()
+        self.assertEqual(order, ["interactive", "batch"])
+
+    def test_unknown_priority(self):
+        with self.assertRaises(ValueError):
+            RateLimiter().acquire("m", 1, "urgent")
+
+    def test_headers_set_limits(self):
+        limiter = RateLimiter(headroom=0.9)
+        limiter.update("m", HEADERS)
+        buckets = limiter.stats()["buckets"]
+        self.assertEqual(buckets["m:requests"]["capacity"], 4500)
+        self.assertEqual(buckets["m:tokens"]["capacity"], 900)
+        # nothing is left at the provider, so the bucket starts below zero by the headroom
+        self.assertLess(buckets["m:tokens"]["level"], 0)
+        with self.assertRaises(AdmissionTimeout):
+            limiter.acquire("m", 100, timeout=0.05)
+        limiter.update("m", {"x-ratelimit-limit-tokens": "not a number"})
+        limiter.update("m", None)
+
+    def test_settle_refunds_unused_tokens(self):
+        limiter = RateLimiter(tpm=6000)
+        limiter.acquire("m", 6000)
+        limiter.settle("m", 6000, 3000)
+        self.assertGreaterEqual(limiter.stats()["buckets"]["m:tokens"]["level"], 3000)
+        self.assertLess(limiter.acquire("m", 3000), 0.01)
+
+    def test_async(self):
+        limiter = RateLimiter(tpm=6000)
+        limiter.acquire("m", 6000)
+        order = []
+
+        async def admit(priority, delay):
+            await asyncio.sleep(delay)
+            await limiter.aacquire("m", 10, priority)
+            order.append(priority)
+
+        async def main():
+            await asyncio.gather(admit("batch", 0), admit("batch", 0), admit("interactive", 0.02))
+
+        asyncio.run(main())
+        self.assertEqual(order, ["interactive", "batch", "batch"])
+        self.assertEqual(limiter.stats()["priorities"]["batch"]["admitted"], 2)
+
+    def test_shared_between_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "limits.sqlite")
+            first, second = RateLimiter(tpm=6000, path=path), RateLimiter(tpm=6000, path=path)
+            first.acquire("m", 6000)
+            with self.assertRaises(AdmissionTimeout):
+                second.acquire("m", 1000, timeout=0.05)
+            second.update("m", {"x-ratelimit-limit-tokens": "100000"})
+            self.assertEqual(first.stats()["buckets"]["m:tokens"]["capacity"], 95000)
+            first.close()
+            second.close()
+
+    def test_async_shared_store_keeps_the_loop_running(self):
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main(limiter, holder):
+            ticker = asyncio.create_task(tick())
+            # another process holds the file lock for a while
+            asyncio.get_running_loop().call_later(0.2, holder.execute, "COMMIT")
+            waited = await limiter.aacquire("m", 10)
+            ticker.cancel()
+            return waited
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "limits.sqlite")
+            limiter = RateLimiter(tpm=6000, path=path)
+            holder = sqlite3.connect(path, isolation_level=None)
+            holder.execute("BEGIN IMMEDIATE")
+            waited = asyncio.run(main(limiter, holder))
+            holder.close()
+            limiter.close()
+        self.assertGreater(waited, 0.15)
+        self.assertGreater(len(ticks), 10)
+
+    def test_queue_depth_gauge(self):
+        sink = metrics.PrometheusSink()
+        metrics.configure(sink)
+        try:
+            limiter = RateLimiter(rpm=600)
+            limiter.acquire("m", 1, "batch")
+        finally:
+            metrics.configure()
+        text = sink.render()
+        self.assertIn("# TYPE rtk_admission_queue_depth gauge", text)
+        self.assertIn('rtk_admission_queue_depth{priority="batch"} 0', text)
+        self.assertIn('rtk_admission_wait_seconds_count{model="m",priority="batch"} 1', text)
+
+
+class RateLimitedCompletions(_Completions):
+
+    def _raw_create(self, **kwargs):
+        return FakeRawResponse(self.create(**kwargs), headers=HEADERS)
+
+
+class RateLimitedOpenAI(FakeOpenAI):
+    completions_cls = RateLimitedCompletions
+
+
+class TestParserAdmission(unittest.TestCase):
+
+    def test_parse_is_admitted(self):
+        limiter = RateLimiter(rpm=600, tpm=10 ** 6)
+        parser = OAiParser("sk-test", {}, rate_limiter=limiter)
+        parser.client = FakeOpenAI()
+        response = parser.parse("Jane Doe\nEngineer")
+        self.assertIn("admission", response["timings"])
+        parser.parse_batch(["a", "b", "c"], workers=2)
+        parser.close()
+        stats = limiter.stats()
+        self.assertEqual(stats["priorities"]["interactive"]["admitted"], 1)
+        self.assertEqual(stats["priorities"]["batch"]["admitted"], 3)
+        # the fake usage (150 tokens) is settled against the estimate
+        self.assertGreater(stats["buckets"][f"{parser.model}:tokens"]["level"], 10 ** 6 - 1000)
+
+    def test_process_wide_limiter_learns_from_headers(self):
+        limiter = ratelimit.configure(headroom=0.5)
+        try:
+            parser = OAiParser("sk-test", {})
+            parser.client = RateLimitedOpenAI()
+            parser.parse("Jane Doe\nEngineer")
+            self.assertEqual(limiter.stats()["buckets"][f"{parser.model}:tokens"]["capacity"], 500)
+        finally:
+            ratelimit.configure()
+        self.assertIsNone(ratelimit.get_limiter())
+
+    def test_async_parse_is_admitted(self):
+        limiter = RateLimiter(rpm=600)
+        parser = AsyncOAiParser("sk-test", {}, rate_limiter=limiter)
+        parser.client = FakeAsyncOpenAI()
+        responses = asyncio.run(parser.parse_many(["a", "b"]))
+        self.assertTrue(all("admission" in r["timings"] for r in responses))
+        self.assertEqual(limiter.stats()["priorities"]["batch"]["admitted"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import unittest
+
+from benchmarks.synthetic import render_text, synthetic_resume
+from rtk import AsyncOAiParser, OAiParser
+from rtk.validation import Validation
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI, fake_completion
+
+
+def broken(resume, **paths):
+    """The resume as JSON with the given fields nulled, e.g. education=(0, "institution")."""
+    data = json.loads(resume.model_dump_json())
+    for section, path in paths.items():
+        target = data[section]
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = None
+    return data
+
+
+class BrokenAnswers(FakeOpenAI):
+    """Whole-resume calls get an answer with invalid sections; section calls get the valid resume."""
+
+    def __init__(self, resume, **paths):
+        super().__init__()
+        self.resume = resume
+        self.paths = paths
+
+    def completion_for(self, messages):
+        completion = fake_completion(self.resume)
+        if "Only extract" not in messages[0]["content"]:
+            completion.choices[0].message.content = json.dumps(broken(self.resume, **self.paths))
+        return completion
+
+
+class AsyncBrokenAnswers(BrokenAnswers, FakeAsyncOpenAI):
+    pass
+
+
+class TestRepair(unittest.TestCase):
+
+    def setUp(self):
+        self.resume = synthetic_resume(num_work=3)
+        self.text = render_text(self.resume)
+
+    def _parser(self, client, cls=OAiParser, **kwargs):
+        parser = cls("sk-test", {}, **kwargs)
+        parser.client = client
+        return parser
+
+    def test_failing_sections(self):
+        validation = Validation()
+        self.assertEqual(validation.failing_sections(json.loads(self.resume.model_dump_json())), {})
+        failing = validation.failing_sections(broken(self.resume, education=(0, "institution"),
+                                                     basics=("location", "city")))
+        self.assertEqual(failing, {"basics": ["basics.location.city: Input should be a valid string"],
+                                   "education": ["education.0.institution: Input should be a valid string"]})
+        self.assertIsNone(validation.failing_sections([]))
+
+    def test_repairs_only_failing_sections(self):
+        client = BrokenAnswers(self.resume, education=(0, "institution"))
+        parser = self._parser(client)
+        response = parser.parse_standalone(self.text)
+        self.assertEqual(response["statuscode"], 200)
+        self.assertEqual(response["repaired"], ["education"])
+        self.assertIsNone(response["error"])
+        self.assertEqual(len(client.calls), 2)
+        self.assertIn("Only extract the `education` section.", client.calls[1][0]["content"])
+        self.assertTrue(client.calls[1][1]["content"].startswith("Education"))
+        self.assertEqual(response["jsonresume"]["education"][0]["institution"], self.resume.education[0].institution)
+        self.assertEqual(response["num_tokens"], 300)
+
+    def test_without_repair(self):
+        client = BrokenAnswers(self.resume, education=(0, "institution"))
+        response = self._parser(client, repair=False).parse_standalone(self.text)
+        self.assertEqual(response["statuscode"], 500)
+        self.assertEqual(response["error"], "InvalidCompletion")
+        self.assertEqual(len(client.calls), 1)
+
+    def test_async(self):
+        client = AsyncBrokenAnswers(self.resume, basics=("location", "city"))
+        parser = self._parser(client, cls=AsyncOAiParser)
+        response = asyncio.run(parser.parse(self.text))
+        self.assertEqual(response["repaired"], ["basics"])
+        self.assertTrue(response["is_valid_jsonresume"])
+
+
+if __name__ == "__main__":
+    unittest.main()
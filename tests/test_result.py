@@ -0,0 +1,63 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from rtk import OAiParser
+from rtk.result import ParseResult, encode
+from tests.fake_openai import FakeOpenAI
+
+
+class TestParseResult(unittest.TestCase):
+
+    def test_mapping(self):
+        result = ParseResult(parser="openai", is_valid_json=True, jsonresume={"basics": {}})
+        self.assertEqual(result["parser"], "openai")
+        self.assertEqual(list(result), ["parser", "is_valid_json", "jsonresume"])
+        self.assertEqual(len(result), 3)
+        self.assertNotIn("statuscode", result)
+        self.assertIsNone(result.get("statuscode"))
+        with self.assertRaises(KeyError):
+            result["statuscode"]
+        result["statuscode"] = 200
+        result["request_id"] = "abc"
+        self.assertEqual(result, {"parser": "openai", "is_valid_json": True, "jsonresume": {"basics": {}},
+                                  "statuscode": 200, "request_id": "abc"})
+        del result["request_id"]
+        del result["statuscode"]
+        self.assertEqual(dict(result), {"parser": "openai", "is_valid_json": True, "jsonresume": {"basics": {}}})
+        with self.assertRaises(KeyError):
+            del result["statuscode"]
+
+    def test_encode(self):
+        result = ParseResult(parser="openai", error=None, timings={"request": 0.5}, note="é")
+        data = result.to_bytes(id="doc-1")
+        self.assertEqual(list(json.loads(data)), ["id", "parser", "error", "timings", "note"])
+        self.assertEqual(json.loads(data)["note"], "é")
+        self.assertEqual(encode(result), encode(result.to_dict()))
+        self.assertTrue(encode(result, newline=True).endswith(b"}\n"))
+
+    def test_parser_results(self):
+        parser = OAiParser("sk-test", {})
+        parser.client = FakeOpenAI()
+        response = parser.parse_standalone("Jane Doe")
+        self.assertIsInstance(response, ParseResult)
+        self.assertIsInstance(response, dict)
+        self.assertEqual(response["statuscode"], 200)
+        self.assertEqual(json.loads(json.dumps(response)), json.loads(response.to_bytes()))
+        self.assertEqual(json.loads(response.to_bytes())["jsonresume"], response["jsonresume"])
+        missing_key = OAiParser(None, {})
+        missing_key.openai_is_available = False
+        self.assertEqual(dict(missing_key.parse("x")), {"parser": "openai-error", "is_valid_json": False,
+                                                          "is_valid_jsonresume": False, "jsonresume": {}})
+
+    def test_parser_defaults(self):
+        # the README example: the key from the environment, no config
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "sk-env"}):
+            parser = OAiParser()
+        parser.client = FakeOpenAI()
+        self.assertEqual(parser.parse_standalone("Jane Doe")["statuscode"], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
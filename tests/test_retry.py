@@ -0,0 +1,260 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import httpx
+import openai
+
+from rtk import AsyncOAiParser, OAiParser
+from rtk.openai_parser import ParseCall
+from rtk.retry import (DeadlineExceeded, LatencyTracker, RetryBudget, RetryPolicy, acall_with_retries,
+                       call_with_retries, classify, latency_tracker)
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI, _AsyncCompletions, _Completions
+
+
+def status_error(status, headers=None, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    body = {"code": code} if code else None
+    return openai.APIStatusError("error", response=response, body=body)
+
+
+class Flaky:
+    """send(timeout) that raises the queued errors before succeeding."""
+
+    def __init__(self, *errors, latency=0.0):
+        self.errors = list(errors)
+        self.latency = latency
+        self.timeouts = []
+        self.lock = threading.Lock()
+
+    def __call__(self, timeout):
+        with self.lock:
+            self.timeouts.append(timeout)
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        if self.latency:
+            time.sleep(self.latency)
+        return "ok"
+
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(max_attempts=3, deadline=5.0, base_delay=0.001, max_delay=0.01)
+        self.budget = RetryBudget()
+
+    def test_classify(self):
+        self.assertEqual(classify(status_error(503)), (True, None))
+        self.assertEqual(classify(status_error(429, {"retry-after": "2"})), (True, 2.0))
+        self.assertEqual(classify(status_error(429, {"retry-after-ms": "250"})), (True, 0.25))
+        self.assertEqual(classify(status_error(429, code="insufficient_quota")), (False, None))
+        self.assertEqual(classify(status_error(400)), (False, None))
+        self.assertEqual(classify(ValueError()), (False, None))
+
+    def test_backoff_honours_retry_after(self):
+        for attempt in range(1, 10):
+            self.assertLessEqual(self.policy.backoff(attempt), self.policy.max_delay)
+        self.assertGreaterEqual(self.policy.backoff(1, retry_after=0.3), 0.3)
+
+    def test_retries_transient_errors(self):
+        call = ParseCall()
+        send = Flaky(status_error(503), status_error(429))
+        self.assertEqual(call_with_retries(send, self.policy, call, "test-retry", self.budget), "ok")
+        self.assertEqual(call.attempts, 3)
+        # every attempt gets what is left of the deadline as its timeout
+        self.assertTrue(all(t <= self.policy.deadline for t in send.timeouts))
+
+    def test_gives_up(self):
+        call = ParseCall()
+        with self.assertRaises(openai.APIStatusError):
+            call_with_retries(Flaky(status_error(400)), self.policy, call, "test-retry", self.budget)
+        self.assertEqual(call.attempts, 1)
+        call = ParseCall()
+        with self.assertRaises(openai.APIStatusError):
+            call_with_retries(Flaky(*[status_error(500)] * 5), self.policy, call, "test-retry", self.budget)
+        self.assertEqual(call.attempts, self.policy.max_attempts)
+
+    def test_budget_exhausted(self):
+        budget = RetryBudget(ratio=0.0, initial=1.0)
+        call = ParseCall()
+        call_with_retries(Flaky(status_error(500)), self.policy, call, "test-retry", budget)
+        self.assertEqual(call.attempts, 2)
+        call = ParseCall()
+        with self.assertRaises(openai.APIStatusError):
+            call_with_retries(Flaky(status_error(500)), self.policy, call, "test-retry", budget)
+        self.assertEqual(call.attempts, 1)
+        self.assertEqual(budget.exhausted, 1)
+
+    def test_deadline(self):
+        policy = RetryPolicy(max_attempts=5, deadline=0.05, base_delay=0.001)
+        call = ParseCall()
+        with self.assertRaises(openai.APIStatusError):
+            call_with_retries(Flaky(status_error(429, {"retry-after": "1"})), policy, call, "test-retry",
+                              self.budget)
+        self.assertEqual(call.attempts, 1)
+
+    def test_latency_tracker(self):
+        tracker = LatencyTracker(window=10)
+        self.assertIsNone(tracker.quantile(0.95, min_samples=1))
+        for i in range(20):
+            tracker.record(i)
+        self.assertEqual(len(tracker), 10)
+        self.assertEqual(tracker.quantile(0.5), 15)
+
+    def test_hedge(self):
+        policy = RetryPolicy(deadline=5.0, hedge=True, hedge_min_samples=5)
+        tracker = latency_tracker("test-hedge")
+        for _ in range(10):
+            tracker.record(0.02)
+        calls = []
+
+        def send(timeout):
+            calls.append(timeout)
+            # the first request stalls, the hedge answers quickly
+            time.sleep(1.0 if len(calls) == 1 else 0.01)
+            return len(calls)
+
+        call = ParseCall()
+        t1 = time.monotonic()
+        self.assertEqual(call_with_retries(send, policy, call, "test-hedge", self.budget), 2)
+        self.assertLess(time.monotonic() - t1, 0.5)
+        self.assertTrue(call.hedged)
+        self.assertEqual(call.attempts, 2)
+
+    def test_hedge_timer_starts_when_the_request_is_sent(self):
+        # far more concurrent calls than the hedge pool has threads: none of them may wait for a thread
+        policy = RetryPolicy(deadline=5.0, hedge=True, hedge_min_samples=5)
+        tracker = latency_tracker("test-hedge-wide")
+        for _ in range(10):
+            tracker.record(0.15)
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def send(timeout):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            time.sleep(0.1)
+            with lock:
+                in_flight[0] -= 1
+            return "ok"
+
+        calls = [ParseCall() for _ in range(64)]
+        threads = [threading.Thread(target=call_with_retries, args=(send, policy, call, "test-hedge-wide", self.budget))
+                   for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(in_flight[1], 64)
+        self.assertFalse(any(call.hedged for call in calls))
+
+    def test_malformed_retry_after(self):
+        self.assertEqual(classify(status_error(429, {"retry-after": "soon"})), (True, None))
+        call = ParseCall()
+        send = Flaky(status_error(429, {"retry-after": "soon"}))
+        self.assertEqual(call_with_retries(send, self.policy, call, "test-retry", self.budget), "ok")
+        self.assertEqual(call.attempts, 2)
+
+    def test_async_hedge_cancels_loser(self):
+        policy = RetryPolicy(deadline=5.0, hedge=True, hedge_min_samples=5)
+        tracker = latency_tracker("test-ahedge")
+        for _ in range(10):
+            tracker.record(0.02)
+        started, cancelled = [], []
+
+        async def send(timeout):
+            started.append(timeout)
+            try:
+                await asyncio.sleep(1.0 if len(started) == 1 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return len(started)
+
+        async def run():
+            call = ParseCall()
+            result = await acall_with_retries(send, policy, call, "test-ahedge", self.budget)
+            await asyncio.sleep(0)
+            return result, call
+
+        result, call = asyncio.run(run())
+        self.assertEqual(result, 2)
+        self.assertTrue(call.hedged)
+        self.assertEqual(cancelled, [True])
+
+    def test_async_deadline(self):
+        policy = RetryPolicy(deadline=0.05)
+
+        async def send(timeout):
+            await asyncio.sleep(1.0)
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(acall_with_retries(send, policy, ParseCall(), "test-retry", self.budget))
+
+
+class _FlakyCompletions(_Completions):
+
+    def create(self, model, messages, **kwargs):
+        if self.owner.errors:
+            raise self.owner.errors.pop(0)
+        return super().create(model, messages, **kwargs)
+
+
+class _AsyncFlakyCompletions(_AsyncCompletions):
+
+    async def create(self, model, messages, **kwargs):
+        if self.owner.errors:
+            raise self.owner.errors.pop(0)
+        return await super().create(model, messages, **kwargs)
+
+
+class FlakyOpenAI(FakeOpenAI):
+    completions_cls = _FlakyCompletions
+
+    def __init__(self, *errors):
+        super().__init__()
+        self.errors = list(errors)
+
+
+class AsyncFlakyOpenAI(FakeAsyncOpenAI):
+    completions_cls = _AsyncFlakyCompletions
+
+    def __init__(self, *errors):
+        super().__init__()
+        self.errors = list(errors)
+
+
+class TestParserRetry(unittest.TestCase):
+    policy = RetryPolicy(base_delay=0.001, max_delay=0.01)
+
+    def test_parse_reports_attempts(self):
+        parser = OAiParser("sk-test", {}, retry_policy=self.policy)
+        parser.client = FlakyOpenAI(status_error(502))
+        response = parser.parse("Jane Doe")
+        self.assertTrue(response["is_valid_jsonresume"])
+        self.assertEqual(response["attempts"], 2)
+        self.assertFalse(response["hedged"])
+        self.assertIsNone(response["error"])
+
+    def test_parse_reports_error_class(self):
+        parser = OAiParser("sk-test", {}, retry_policy=self.policy)
+        parser.client = FlakyOpenAI(status_error(400))
+        response = parser.parse("Jane Doe")
+        self.assertFalse(response["is_valid_jsonresume"])
+        self.assertEqual(response["attempts"], 1)
+        self.assertEqual(response["error"], "APIStatusError")
+
+    def test_async_parse_reports_attempts(self):
+        parser = AsyncOAiParser("sk-test", {}, retry_policy=self.policy)
+        parser.client = AsyncFlakyOpenAI(status_error(500), status_error(503))
+        response = asyncio.run(parser.parse("Jane Doe"))
+        self.assertTrue(response["is_valid_jsonresume"])
+        self.assertEqual(response["attempts"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
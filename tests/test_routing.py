@@ -0,0 +1,123 @@
+import asyncio
+import unittest
+
+from benchmarks.synthetic import render_text, synthetic_resume
+from rtk import AsyncOAiParser, OAiParser
+from rtk.routing import DEFAULT_MODELS, ModelCascade
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI, sample_resume
+
+CONFIG = {"current_env": "dev",
+          "flags": [{"name": "cascade", "enabled": True, "environment": "dev",
+                     "models": ["small", "large"], "max_chars": 5000}]}
+
+
+class CheapModelMissesName(FakeOpenAI):
+    """The small model drops the name for texts starting with "hard"."""
+
+    def resume_for(self, messages):
+        text = messages[-1]["content"]
+        if self.models[-1] == "small" and text.startswith("hard"):
+            return sample_resume(name="")
+        return sample_resume(name=text[:40])
+
+
+class AsyncCheapModelMissesName(CheapModelMissesName, FakeAsyncOpenAI):
+    pass
+
+
+class TestModelCascade(unittest.TestCase):
+
+    def test_first_tier(self):
+        cascade = ModelCascade(models=["small", "medium", "large"], max_chars=100, max_text_tokens=50,
+                               max_sections=1)
+        self.assertEqual(cascade.tiers("Jane Doe"), [(0, "small"), (1, "medium"), (2, "large")])
+        self.assertEqual(cascade.first_tier("x" * 101), 2)
+        self.assertEqual(cascade.first_tier("Jane Doe", text_tokens=51), 2)
+        self.assertEqual(cascade.first_tier("Jane\nExperience\nAcme\nEducation\nMIT"), 2)
+
+    def test_reject_reason(self):
+        cascade = ModelCascade()
+        self.assertIsNone(cascade.reject_reason(sample_resume(), True))
+        self.assertEqual(cascade.reject_reason(None, False), "no answer")
+        self.assertEqual(cascade.reject_reason(sample_resume(), False), "invalid jsonresume")
+        self.assertEqual(cascade.reject_reason(sample_resume(name=""), True), "missing basics.name")
+        self.assertEqual(cascade.reject_reason(sample_resume(num_work=0), True), "empty work")
+        self.assertIsNone(ModelCascade(require_work=False).reject_reason(sample_resume(num_work=0), True))
+
+    def test_from_flag(self):
+        cascade = ModelCascade.from_flag({"name": "cascade", "enabled": True, "max_chars": 100})
+        self.assertEqual(cascade.models, DEFAULT_MODELS)
+        self.assertEqual(cascade.max_chars, 100)
+
+
+class TestCascadeParse(unittest.TestCase):
+
+    def _parser(self, config=CONFIG, cls=OAiParser, client=None):
+        parser = cls("sk-test", config)
+        parser.client = client or CheapModelMissesName()
+        return parser
+
+    def test_cheap_model_answers(self):
+        parser = self._parser()
+        response = parser.parse("Jane Doe")
+        self.assertEqual(parser.client.models, ["small"])
+        self.assertEqual((response["model"], response["tier"], response["escalations"]), ("small", 0, []))
+
+    def test_escalates_on_missing_name(self):
+        parser = self._parser()
+        response = parser.parse("hard to read resume")
+        self.assertEqual(parser.client.models, ["small", "large"])
+        self.assertEqual((response["model"], response["tier"]), ("large", 1))
+        self.assertEqual(response["escalations"], [{"model": "small", "reason": "missing basics.name"}])
+        self.assertEqual(response["jsonresume"]["basics"]["name"], "hard to read resume")
+        self.assertEqual(response["num_tokens"], 300)
+        self.assertEqual(response["attempts"], 2)
+
+    def test_long_text_starts_on_large_model(self):
+        parser = self._parser()
+        response = parser.parse(render_text(synthetic_resume(num_work=30)))
+        self.assertEqual(parser.client.models, ["large"])
+        self.assertEqual(response["tier"], 1)
+
+    def test_disabled_flag(self):
+        config = {"current_env": "prod", "flags": CONFIG["flags"]}
+        parser = self._parser(config)
+        self.assertIsNone(parser.cascade)
+        response = parser.parse("hard to read resume")
+        self.assertEqual(parser.client.models, [parser.model])
+        self.assertEqual((response["model"], response["tier"]), (parser.model, None))
+
+    def test_answers_are_stored_under_the_tier_that_gave_them(self):
+        from rtk.cache import ParseCache
+        from rtk.dedup import NearDuplicateIndex
+        cache = ParseCache()
+        parser = self._parser()
+        parser.cache = cache
+        parser.parse("Jane Doe")
+        # one parse is one miss, however many tiers it looked up
+        self.assertEqual(cache.stats()["misses"], 1)
+        response = parser.parse("Jane Doe")
+        self.assertEqual((response["cache"], response["model"], response["tier"]), ("memory", "small", 0))
+        # the small model's answer is not served as the large model's
+        single = self._parser({"current_env": "prod", "flags": CONFIG["flags"]})
+        single.cache = cache
+        self.assertIsNone(single.parse("Jane Doe")["cache"])
+        self.assertEqual(single.client.models, [single.model])
+
+        parser = self._parser()
+        parser.dedup = NearDuplicateIndex()
+        parser.parse("Jane Doe")
+        response = parser.parse("Jane Doe")
+        self.assertEqual(parser.client.models, ["small"])
+        self.assertEqual((response["model"], response["tier"]), ("small", 0))
+        self.assertEqual(response["near_duplicate"]["patched"], [])
+
+    def test_async(self):
+        parser = self._parser(cls=AsyncOAiParser, client=AsyncCheapModelMissesName())
+        response = asyncio.run(parser.parse("hard to read resume"))
+        self.assertEqual(parser.client.models, ["small", "large"])
+        self.assertEqual(response["model"], "large")
+
+
+if __name__ == "__main__":
+    unittest.main()
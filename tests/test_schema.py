@@ -0,0 +1,45 @@
+import unittest
+from types import SimpleNamespace
+
+from openai import LengthFinishReasonError
+from openai.lib._parsing._completions import type_to_response_format_param
+
+from rtk.cache import schema_fingerprint as cache_fingerprint
+from rtk.resume_dataclass import Resume
+from rtk.schema import parse_completion, response_format, schema_fingerprint, type_adapter
+from rtk.sections import section_model
+from tests.fake_openai import fake_completion, sample_resume
+
+
+class TestSchema(unittest.TestCase):
+
+    def test_payload_is_cached_and_strict(self):
+        payload = response_format(Resume)
+        self.assertIs(payload, response_format(Resume))
+        self.assertEqual(payload, type_to_response_format_param(Resume))
+        self.assertTrue(payload["json_schema"]["strict"])
+        self.assertIs(type_adapter(Resume), type_adapter(Resume))
+
+    def test_fingerprint(self):
+        self.assertEqual(schema_fingerprint(), schema_fingerprint(Resume))
+        self.assertEqual(cache_fingerprint(), schema_fingerprint())
+        self.assertNotEqual(schema_fingerprint(section_model("work")), schema_fingerprint())
+        self.assertEqual(len(schema_fingerprint()), 64)
+
+    def test_parse_completion(self):
+        resume = sample_resume()
+        completion = fake_completion(resume)
+        completion.choices[0].message.parsed = None
+        self.assertEqual(parse_completion(completion, Resume).choices[0].message.parsed, resume)
+
+        completion.choices[0].message.refusal = "I can't help with that."
+        self.assertIsNone(parse_completion(completion, Resume).choices[0].message.parsed)
+
+        completion.choices[0].finish_reason = "length"
+        completion.usage = SimpleNamespace(prompt_tokens=1, completion_tokens=1)
+        with self.assertRaises(LengthFinishReasonError):
+            parse_completion(completion, Resume)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+
+from benchmarks.mock_openai import MockOpenAIServer
+from benchmarks.synthetic import render_text, synthetic_resume
+from rtk import AsyncOAiParser, OAiParser
+from rtk import clients
+from rtk.sections import section_model, split_sections
+
+
+class TestSectionSplit(unittest.TestCase):
+
+    def setUp(self):
+        clients.reset()
+        self.resume = synthetic_resume(num_work=20, num_publications=20)
+        expected = self.resume.model_dump()
+        self.server = MockOpenAIServer(resume_factory=lambda text: expected).start()
+        self.text = render_text(self.resume)
+
+    def tearDown(self):
+        clients.reset()
+        self.server.stop()
+
+    def test_split_sections(self):
+        sections = split_sections(self.text)
+        self.assertEqual(list(sections)[:3], ["basics", "work", "education"])
+        self.assertTrue(sections["work"].startswith("Experience"))
+        self.assertNotIn("Education", sections["work"])
+
+    def test_section_model(self):
+        model = section_model("work")
+        self.assertEqual(list(model.model_fields), ["work"])
+        self.assertIs(model, section_model("work"))
+
+    def test_split_parse_merges_sections(self):
+        parser = OAiParser("sk-mock", {}, base_url=self.server.base_url, split_sections=True)
+        response = parser.parse(self.text)
+        sections = split_sections(self.text)
+        self.assertEqual(self.server.requests, len(sections))
+        self.assertTrue(response["is_valid_jsonresume"])
+        jsonresume = response["jsonresume"]
+        self.assertEqual(jsonresume["basics"]["name"], self.resume.basics.name)
+        self.assertEqual(len(jsonresume["work"]), 20)
+        self.assertEqual(len(jsonresume["publications"]), 20)
+        # sections without a heading in the text are left empty
+        self.assertEqual(jsonresume["volunteer"], [])
+        parser.close()
+
+    def test_async_split_parse_matches_sync(self):
+        parser = OAiParser("sk-mock", {}, base_url=self.server.base_url, split_sections=True)
+        expected = parser.parse(self.text)
+        parser.close()
+        async_parser = AsyncOAiParser("sk-mock", {}, base_url=self.server.base_url, split_sections=True)
+        response = asyncio.run(async_parser.parse(self.text))
+        self.assertEqual(self.server.requests, 2 * len(split_sections(self.text)))
+        self.assertEqual(response["jsonresume"], expected["jsonresume"])
+        self.assertEqual((response["num_tokens"], response["attempts"]), (expected["num_tokens"], expected["attempts"]))
+
+    def test_short_text_uses_single_call(self):
+        parser = OAiParser("sk-mock", {}, base_url=self.server.base_url, split_sections=True)
+        parser.parse(self.text[:2000])
+        self.assertEqual(self.server.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
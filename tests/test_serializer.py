@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from rtk.resume_dataclass import ResumeSerializer
+from tests.fake_openai import sample_resume
+
+
+class TestResumeSerializer(unittest.TestCase):
+    serializer = ResumeSerializer()
+
+    def test_shape(self):
+        resume = sample_resume(num_work=3)
+        j_resume = self.serializer.to_json_resume(resume)
+        self.assertEqual(list(j_resume), ["basics", "work", "education", "projects", "volunteer", "skills",
+                                          "publications", "languages", "awards", "certificates", "references",
+                                          "interests"])
+        self.assertEqual(list(j_resume["basics"]), ["name", "label", "email", "phone", "url", "summary", "profiles",
+                                                    "location"])
+        expected = resume.model_dump()
+        expected["basics"]["profiles"] = []
+        self.assertEqual(j_resume, expected)
+
+    def test_location_placeholder(self):
+        resume = sample_resume()
+        resume.basics.location = None
+        j_basics = self.serializer.to_json_resume(resume)["basics"]
+        self.assertEqual(j_basics["location"], {"address": "", "city": "", "region": "", "countryCode": "",
+                                                "postalCode": ""})
+
+    def test_does_not_mutate_or_share(self):
+        resume = sample_resume()
+        before = resume.model_dump()
+        j_resume = self.serializer.to_json_resume(resume)
+        j_resume["work"][0]["highlights"].append("extra")
+        j_resume["basics"]["location"]["city"] = "Paris"
+        self.assertEqual(resume.model_dump(), before)
+
+    def test_bytes(self):
+        resume = sample_resume()
+        self.assertEqual(json.loads(self.serializer.to_json_bytes(resume)), self.serializer.to_json_resume(resume))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+
+from benchmarks.mock_openai import MockOpenAIServer
+from rtk import AsyncOAiParser, OAiParser, ParseCache
+from rtk import clients
+from rtk.retry import RetryPolicy
+
+
+class FlakyServer(MockOpenAIServer):
+    """Fails the first request with a 503."""
+
+    def respond(self, path, request):
+        status, body, headers = super().respond(path, request)
+        if self.requests == 1:
+            return 503, {"error": {"message": "Mock failure", "type": "server_error", "code": None}}, {}
+        return status, body, headers
+
+
+def section_data(response, event):
+    value = response["jsonresume"][event["section"]]
+    return value if event["index"] is None else value[event["index"]]
+
+
+class TestParseStream(unittest.TestCase):
+
+    def setUp(self):
+        clients.reset()
+        self.server = MockOpenAIServer(stream_chunk_chars=32, stream_chunk_delay=0.001).start()
+
+    def tearDown(self):
+        clients.reset()
+        self.server.stop()
+
+    def test_sections_then_result(self):
+        parser = OAiParser("sk-mock", {}, base_url=self.server.base_url)
+        events = list(parser.parse_stream("Jane Doe"))
+        sections = [(e["section"], e["index"]) for e in events if e["event"] == "section"]
+        self.assertEqual(sections[0], ("basics", None))
+        self.assertIn(("work", 0), sections)
+        self.assertEqual(events[0]["data"]["name"], "Jane Doe")
+
+        result = events[-1]
+        self.assertEqual(result["event"], "result")
+        response = result["response"]
+        self.assertGreater(response["time_to_first_section"], 0)
+        self.assertLess(response["time_to_first_section"], response["generation_time"])
+
+        expected = parser.parse("Jane Doe")
+        for field in ("is_valid_json", "is_valid_jsonresume", "jsonresume", "num_tokens", "num_chars"):
+            self.assertEqual(response[field], expected[field])
+
+    def test_sections_are_shaped_like_the_result(self):
+        parser = OAiParser("sk-mock", {}, base_url=self.server.base_url, pre_extract=True)
+        events = list(parser.parse_stream("Jane Doe\njane@example.com\nhttps://github.com/jane"))
+        response = events[-1]["response"]
+        self.assertEqual(response["prefilled"], ["email", "profiles"])
+        sent = [e for e in events if e["event"] == "section"]
+        self.assertEqual(len(sent), len({(e["section"], e["index"]) for e in sent}))
+        for event in sent:
+            self.assertEqual(event["data"], section_data(response, event))
+        self.assertEqual(sent[0]["data"]["email"], "jane@example.com")
+
+    def test_stream_is_retried_and_bounded_by_the_deadline(self):
+        with FlakyServer(stream_chunk_chars=32) as server:
+            policy = RetryPolicy(base_delay=0.01)
+            parser = OAiParser("sk-mock", {}, base_url=server.base_url, retry_policy=policy)
+            response = list(parser.parse_stream("Jane Doe"))[-1]["response"]
+        self.assertTrue(response["is_valid_jsonresume"])
+        self.assertEqual(response["attempts"], 2)
+
+        policy = RetryPolicy(deadline=0.05)
+        with MockOpenAIServer(stream_chunk_chars=8, stream_chunk_delay=0.01) as server:
+            parser = OAiParser("sk-mock", {}, base_url=server.base_url, retry_policy=policy)
+            response = list(parser.parse_stream("Jane Doe"))[-1]["response"]
+        self.assertEqual(response["error"], "DeadlineExceeded")
+        self.assertEqual(response["jsonresume"], {})
+
+    def test_cache_hit_replays_sections(self):
+        parser = OAiParser("sk-mock", {}, base_url=self.server.base_url, cache=ParseCache())
+        first = list(parser.parse_stream("Jane Doe"))
+        second = list(parser.parse_stream("Jane Doe"))
+        self.assertEqual(second[-1]["response"]["cache"], "memory")
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(len(second), len(first))
+
+    def test_async_stream(self):
+        parser = AsyncOAiParser("sk-mock", {}, base_url=self.server.base_url)
+
+        async def run():
+            return [event async for event in parser.parse_stream("Jane Doe")]
+
+        events = asyncio.run(run())
+        self.assertEqual(events[0]["section"], "basics")
+        response = events[-1]["response"]
+        self.assertTrue(response["is_valid_jsonresume"])
+        for event in events[:-1]:
+            self.assertEqual(event["data"], section_data(response, event))
+
+
+if __name__ == "__main__":
+    unittest.main()
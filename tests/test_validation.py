@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from rtk import log
+from rtk.resume_dataclass import ResumeSerializer
+from rtk.validation import Validation
+from tests.fake_openai import sample_resume
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.resume = ResumeSerializer().to_json_resume(sample_resume(num_work=1))
+
+    def test_validator_is_shared(self):
+        self.assertIs(Validation().validator, Validation().validator)
+
+    def test_boolean_path(self):
+        validation = Validation()
+        self.assertTrue(validation.is_valid_json_resume(self.resume))
+        self.assertFalse(validation.is_valid_json_resume({"basics": {}}))
+
+    def test_invalid_resume_logs_message_not_schema(self):
+        log.configure_sampling()
+        validation = Validation()
+        with self.assertLogs("rtk.validation", "ERROR") as logs:
+            self.assertEqual(validation.validate_json_w_jsonschema({"basics": {}}), (True, False))
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].event, "validation.invalid_jsonresume")
+        self.assertIn("Error message:", logs.output[0])
+
+        validation = Validation(log_errors=False)
+        with self.assertNoLogs("rtk.validation", "ERROR"):
+            self.assertEqual(validation.validate_json_w_jsonschema({"basics": {}}), (True, False))
+
+    def test_invalid_json_is_clipped(self):
+        log.configure_sampling(max_chars=100)
+        try:
+            with self.assertLogs("rtk.validation", "ERROR") as logs:
+                self.assertEqual(Validation().validate_json_w_pydantic("{" + "x" * 10 ** 6), (False, False))
+        finally:
+            log.configure_sampling()
+        self.assertLess(len(logs.records[0].getMessage()), 300)
+        self.assertIn("more chars]", logs.records[0].getMessage())
+
+    def test_from_resume_skips_pydantic(self):
+        validation = Validation()
+        with mock.patch("rtk.validation.Resume.model_validate") as model_validate:
+            self.assertEqual(validation.validate_json_w_pydantic(self.resume, from_resume=True), (True, True))
+        model_validate.assert_not_called()
+        self.assertEqual(validation.validate_json_w_pydantic(self.resume), (True, True))
+        self.assertEqual(validation.validate_json_w_pydantic({"basics": None}), (True, False))
+
+
+if __name__ == "__main__":
+    unittest.main()